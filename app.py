@@ -27,7 +27,7 @@ from utils.logger import app_logger
 from utils.ui_helper import ChainlitHelper as ui
 from utils.error_handler import ErrorHandler as error_handler
 from utils.config import config_manager
-from utils.responses_handler import responses_handler
+from utils.responses_handler import responses_handler, StreamChunk
 from utils.tools_config import tools_config
 from utils.persona_manager import persona_manager
 from utils.vector_store_handler import vector_store_handler
@@ -405,37 +405,38 @@ async def settings_update(settings):
             responses_handler.update_model(settings["Model"])
             app_logger.info("モデル変更", model=settings["Model"])
         
-        # 2. Tools設定更新
-        if "Tools_Enabled" in settings:
-            tools_config.update_enabled(settings["Tools_Enabled"])
-        if "Web_Search" in settings:
-            tools_config.update_tool_status("web_search", settings["Web_Search"])
-        if "File_Search" in settings:
-            tools_config.update_tool_status("file_search", settings["File_Search"])
-        
-        # 3. ベクトルストア3層設定更新
-        vs_ids = ui.get_session("vector_store_ids", {})
-        
-        # 会社全体層
-        if "VS_Layer_Company" in settings:
-            tools_config.set_layer_enabled("company", settings["VS_Layer_Company"])
-        if "VS_ID_Company" in settings:
-            company_id = settings["VS_ID_Company"].strip() if settings["VS_ID_Company"] else ""
-            vs_ids["company"] = company_id
-            ui.set_session("company_vs_id", company_id)
-            # 注意: 会社全体のベクトルストアIDは.envファイルから読み取り専用
+        # 2. Tools設定更新（3.の層設定とまとめて1回だけ保存）
+        with tools_config.batch():
+            if "Tools_Enabled" in settings:
+                tools_config.update_enabled(settings["Tools_Enabled"])
+            if "Web_Search" in settings:
+                tools_config.update_tool_status("web_search", settings["Web_Search"])
+            if "File_Search" in settings:
+                tools_config.update_tool_status("file_search", settings["File_Search"])
+        
+            # 3. ベクトルストア3層設定更新
+            vs_ids = ui.get_session("vector_store_ids", {})
+        
+            # 会社全体層
+            if "VS_Layer_Company" in settings:
+                tools_config.set_layer_enabled("company", settings["VS_Layer_Company"])
+            if "VS_ID_Company" in settings:
+                company_id = settings["VS_ID_Company"].strip() if settings["VS_ID_Company"] else ""
+                vs_ids["company"] = company_id
+                ui.set_session("company_vs_id", company_id)
+                # 注意: 会社全体のベクトルストアIDは.envファイルから読み取り専用
             
-        # 個人ユーザー層
-        if "VS_Layer_Personal" in settings:
-            tools_config.set_layer_enabled("personal", settings["VS_Layer_Personal"])
-        if "VS_ID_Personal" in settings:
-            personal_id = settings["VS_ID_Personal"].strip() if settings["VS_ID_Personal"] else ""
-            vs_ids["personal"] = personal_id
-            ui.set_session("personal_vs_id", personal_id)
+            # 個人ユーザー層
+            if "VS_Layer_Personal" in settings:
+                tools_config.set_layer_enabled("personal", settings["VS_Layer_Personal"])
+            if "VS_ID_Personal" in settings:
+                personal_id = settings["VS_ID_Personal"].strip() if settings["VS_ID_Personal"] else ""
+                vs_ids["personal"] = personal_id
+                ui.set_session("personal_vs_id", personal_id)
             
-        # チャット単位層
-        if "VS_Layer_Thread" in settings:
-            tools_config.set_layer_enabled("thread", settings["VS_Layer_Thread"])
+            # チャット単位層
+            if "VS_Layer_Thread" in settings:
+                tools_config.set_layer_enabled("thread", settings["VS_Layer_Thread"])
         
         ui.set_session("vector_store_ids", vs_ids)
         
@@ -472,6 +473,8 @@ async def settings_update(settings):
 @cl.on_message  
 async def message_handler(message: cl.Message):
     """メッセージ処理のメインハンドラー"""
+    # ユーザーID・スレッドIDのキャッシュはこのメッセージの処理中だけ使う
+    ui.reset_request_cache()
     try:
         user_input = message.content.strip()
         app_logger.info("メッセージ受信", content_length=len(user_input))
@@ -542,6 +545,7 @@ async def _process_conversation(user_input: str):
             use_tools=True,  # Tools機能を有効化
             stream=settings.get("stream", True),
             previous_response_id=previous_response_id,  # 会話継続のためのID
+            thread_id=ui.get_session("thread_id"),
             instructions=current_system_prompt  # システムプロンプトをinstructionsで渡す
         )
         
@@ -555,14 +559,22 @@ async def _process_conversation(user_input: str):
         assistant_message = ""
         try:
             async for chunk in response_generator:
-                if chunk and chunk.get("content"):
-                    chunk_content = chunk.get("content", "")
-                    assistant_message += chunk_content
-                    # Chainlitの標準ストリーミング方式
-                    await msg.stream_token(chunk_content)
+                if not chunk:
+                    continue
+                if chunk.__class__ is StreamChunk:
+                    if chunk.content:
+                        assistant_message += chunk.content
+                        # Chainlitの標準ストリーミング方式
+                        await msg.stream_token(chunk.content)
+                    continue
+                
+                # 差分が届かなかった応答（キャッシュ済みの非ストリーミング応答など）は全文を表示
+                if not assistant_message and chunk.get("output_text"):
+                    assistant_message = chunk["output_text"]
+                    await msg.stream_token(assistant_message)
                 
                 # レスポンスIDを保存（会話の継続性）
-                if chunk and chunk.get("response_id"):
+                if chunk.get("response_id"):
                     response_id = chunk["response_id"]
                     ui.set_session("previous_response_id", response_id)
                     
@@ -17,6 +17,87 @@ from chainlit.user import User
 import aiosqlite
 import uuid
 import asyncio
+from contextlib import asynccontextmanager
+from utils import json_helper
+
+
+# BEGIN IMMEDIATEがロック競合した際の再試行間隔（秒）
+_BUSY_RETRY_DELAYS = (0.001, 0.002, 0.004, 0.008, 0.016)
+
+# 空のステップメタデータ（BLOB形式と従来のTEXT形式）
+_EMPTY_METADATA = (b"{}", "{}")
+
+# ステップ取得時に読み出すカラム（_step_from_rowのアンパック順と一致させること）
+_STEP_COLUMNS = (
+    "id, thread_id, name, type, generation, input, output, metadata, "
+    "parent_id, start_time, end_time, created_at"
+)
+
+
+def _step_from_row(row) -> StepDict:
+    """_STEP_COLUMNS順のタプルからStepDictを構築"""
+    (step_id, thread_id, name, step_type, generation, step_input, output, metadata,
+     parent_id, start_time, end_time, created_at) = row
+    return {
+        "id": step_id,
+        "threadId": thread_id,
+        "name": name,
+        "type": step_type,
+        "generation": generation or None,
+        "input": step_input or "",
+        "output": output or "",
+        # 大半のステップは空のメタデータなのでデコードを省略する
+        "metadata": json_helper.loads_blob(metadata) if metadata and metadata not in _EMPTY_METADATA else {},
+        "parentId": parent_id,
+        "startTime": start_time,
+        "endTime": end_time,
+        "createdAt": created_at,
+        "start": start_time,
+        "end": end_time
+    }
+
+
+# スレッド一覧で読み出すカラム（_thread_summary_from_rowのアンパック順と一致させること）
+_THREAD_LIST_KEYS = ("id", "name", "user_id", "user_identifier", "tags", "metadata", "created_at")
+_THREAD_LIST_COLUMNS = ", ".join(_THREAD_LIST_KEYS)
+
+
+def _thread_summary_from_row(row) -> Dict:
+    """_THREAD_LIST_KEYS順のタプルから一覧表示用のスレッド辞書を構築（ステップは含めない）"""
+    thread_id, name, user_id, user_identifier, tags, metadata, created_at = row
+    return {
+        "id": thread_id,
+        "name": name,
+        "user_id": user_id,
+        "userId": user_id,  # Chainlitが期待する形式
+        "user_identifier": user_identifier,
+        "tags": json_helper.loads(tags) if tags else [],
+        "metadata": json_helper.loads(metadata) if metadata else {},
+        "createdAt": created_at,
+        "steps": []
+    }
+
+
+# ペルソナ取得時に読み出すカラム（キー名とカラム名は同一）
+_PERSONA_KEYS = (
+    "id", "name", "system_prompt", "model", "temperature", "max_tokens",
+    "description", "tags", "is_active", "created_at", "updated_at"
+)
+_PERSONA_COLUMNS = ", ".join(_PERSONA_KEYS)
+_PERSONA_TAGS_INDEX = _PERSONA_KEYS.index("tags")
+
+
+def _normalize_tags(tags) -> List[str]:
+    """thread_tagsに保存するタグの正規化（文字列化し、Noneと空のタグは除く）"""
+    return [str(tag) for tag in tags if tag is not None and str(tag) != ""]
+
+
+def _persona_from_row(row) -> Dict:
+    """_PERSONA_KEYS順のタプルからペルソナ辞書を構築"""
+    persona = dict(zip(_PERSONA_KEYS, row, strict=True))
+    tags = row[_PERSONA_TAGS_INDEX]
+    persona["tags"] = json.loads(tags) if tags else []
+    return persona
 
 
 class SQLitePaginatedResponse:
@@ -39,13 +120,36 @@ class SQLiteDataLayer(BaseDataLayer):
     """
     
     def __init__(self, db_path: str = ".chainlit/chainlit.db"):
-        """データベースを初期化"""
+        """
+        データレイヤーを初期化
+        スキーマ作成はモジュールインポート時に行わず、最初のDBアクセス時まで遅延する
+        """
         self.db_path = db_path
         self._thread_creation_lock = asyncio.Lock()  # スレッド作成の競合状態を防ぐ
-        
+        self._init_lock = asyncio.Lock()
+        self._initialized = False
+        self._fts_enabled = False
+
+    async def ensure_initialized(self) -> None:
+        """スキーマ未作成なら、イベントループを塞がないよう別スレッドで作成"""
+        if self._initialized:
+            return
+        async with self._init_lock:
+            if not self._initialized:
+                await asyncio.to_thread(self._init_db_sync)
+                self._initialized = True
+
+    @asynccontextmanager
+    async def _connect(self):
+        """スキーマ初期化を保証したうえでDB接続を開く"""
+        await self.ensure_initialized()
+        async with aiosqlite.connect(self.db_path) as db:
+            yield db
+
+    def _init_db_sync(self) -> None:
+        """テーブル・インデックス・トリガーを同期的に作成"""
         # ディレクトリを作成
-        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
-        # 同期的にテーブルを作成
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
         import sqlite3
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
@@ -81,7 +185,7 @@ class SQLiteDataLayer(BaseDataLayer):
                 generation TEXT,
                 input TEXT,
                 output TEXT,
-                metadata TEXT,
+                metadata BLOB,
                 parent_id TEXT,
                 start_time TIMESTAMP,
                 end_time TIMESTAMP,
@@ -89,7 +193,27 @@ class SQLiteDataLayer(BaseDataLayer):
                 FOREIGN KEY (thread_id) REFERENCES threads(id)
             )
         """)
-        
+
+        # get_thread/get_thread_stepsの「thread_id絞り込み＋作成日時順」をソートなしで返すための複合インデックス
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_steps_thread_created
+            ON steps(thread_id, created_at, id)
+        """)
+        # list_threadsの「user_id絞り込み＋作成日時の降順」用
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_threads_user_created
+            ON threads(user_id, created_at DESC)
+        """)
+
+        # スレッドのタグ（threads.tagsのJSONを正規化した検索用テーブル）
+        self._init_thread_tags(cursor)
+
+        # スレッドごとのステップ数（COUNT(*)を避けるための非正規化カウンタ）
+        self._init_step_count(cursor)
+
+        # ステップ本文の全文検索インデックス（FTS5、stepsと同期する外部コンテンツ方式）
+        self._fts_enabled = self._init_steps_fts(cursor)
+
         # フィードバックテーブル
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS feedbacks (
@@ -159,7 +283,116 @@ class SQLiteDataLayer(BaseDataLayer):
         
         conn.commit()
         conn.close()
-    
+
+    @staticmethod
+    def _init_thread_tags(cursor) -> None:
+        """thread_tagsテーブルを作成し、初回のみthreads.tagsから移行"""
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'thread_tags'"
+        )
+        is_new = cursor.fetchone() is None
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS thread_tags (
+                thread_id TEXT NOT NULL,
+                tag TEXT NOT NULL,
+                PRIMARY KEY (thread_id, tag),
+                FOREIGN KEY (thread_id) REFERENCES threads(id) ON DELETE CASCADE
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_thread_tags_tag ON thread_tags(tag)")
+
+        if is_new:
+            cursor.execute("SELECT id, tags FROM threads WHERE tags IS NOT NULL AND tags != '[]'")
+            rows = []
+            for thread_id, tags_raw in cursor.fetchall():
+                try:
+                    tags = json_helper.loads(tags_raw)
+                except json_helper.JSONDecodeError:
+                    continue
+                if isinstance(tags, list):
+                    rows.extend((thread_id, tag) for tag in _normalize_tags(tags))
+            cursor.executemany(
+                "INSERT OR IGNORE INTO thread_tags (thread_id, tag) VALUES (?, ?)", rows
+            )
+
+    @staticmethod
+    def _init_step_count(cursor) -> None:
+        """threads.step_countカラムと、stepsの増減に追従するトリガーを作成"""
+        cursor.execute("PRAGMA table_info(threads)")
+        columns = {row[1] for row in cursor.fetchall()}
+        if "step_count" not in columns:
+            cursor.execute("ALTER TABLE threads ADD COLUMN step_count INTEGER DEFAULT 0")
+            # 既存DBのカウントを初期化
+            cursor.execute("""
+                UPDATE threads
+                SET step_count = (SELECT COUNT(*) FROM steps WHERE steps.thread_id = threads.id)
+            """)
+
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS steps_count_insert AFTER INSERT ON steps BEGIN
+                UPDATE threads SET step_count = step_count + 1 WHERE id = new.thread_id;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS steps_count_delete AFTER DELETE ON steps BEGIN
+                UPDATE threads SET step_count = step_count - 1 WHERE id = old.thread_id;
+            END
+        """)
+        # create_stepの上書き保存でthread_idが変わる場合
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS steps_count_move AFTER UPDATE OF thread_id ON steps
+            WHEN old.thread_id IS NOT new.thread_id BEGIN
+                UPDATE threads SET step_count = step_count - 1 WHERE id = old.thread_id;
+                UPDATE threads SET step_count = step_count + 1 WHERE id = new.thread_id;
+            END
+        """)
+
+    @staticmethod
+    def _init_steps_fts(cursor) -> bool:
+        """
+        steps.outputのFTS5インデックスと同期トリガーを作成
+        FTS5が利用できないSQLiteビルドではFalseを返す
+        """
+        import sqlite3
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'steps_fts'"
+        )
+        is_new = cursor.fetchone() is None
+        try:
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS steps_fts USING fts5(
+                    output,
+                    content='steps',
+                    content_rowid='rowid',
+                    tokenize="unicode61 remove_diacritics 2"
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ FTS5が利用できないため全文検索を無効化します: {e}")
+            return False
+
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS steps_fts_insert AFTER INSERT ON steps BEGIN
+                INSERT INTO steps_fts(rowid, output) VALUES (new.rowid, new.output);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS steps_fts_delete AFTER DELETE ON steps BEGIN
+                INSERT INTO steps_fts(steps_fts, rowid, output) VALUES ('delete', old.rowid, old.output);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS steps_fts_update AFTER UPDATE ON steps BEGIN
+                INSERT INTO steps_fts(steps_fts, rowid, output) VALUES ('delete', old.rowid, old.output);
+                INSERT INTO steps_fts(rowid, output) VALUES (new.rowid, new.output);
+            END
+        """)
+
+        # 既存DBに後から追加した場合は既存ステップをインデックスに取り込む
+        if is_new:
+            cursor.execute("INSERT INTO steps_fts(steps_fts) VALUES ('rebuild')")
+        return True
+
     async def get_user(self, identifier: str) -> Optional[User]:
         """ユーザー情報を取得"""
         user = User(identifier=identifier)
@@ -188,24 +421,28 @@ class SQLiteDataLayer(BaseDataLayer):
                 # 既存スレッドを返す（通常の動作）
                 return existing
             
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 # user_idを取得（userIdまたはuser_idから）
                 user_id_value = thread.get("userId") or thread.get("user_id")
                 try:
+                    await self._begin_immediate(db)
                     await db.execute("""
-                        INSERT INTO threads (id, name, user_id, user_identifier, tags, metadata)
-                        VALUES (?, ?, ?, ?, ?, ?)
+                        INSERT INTO threads (id, name, user_id, user_identifier, tags, metadata, step_count)
+                        VALUES (?, ?, ?, ?, ?, ?, (SELECT COUNT(*) FROM steps WHERE thread_id = ?))
                     """, (
                         thread.get("id"),
                         thread.get("name"),
                         user_id_value,
                         thread.get("user_identifier"),
-                        json.dumps(thread.get("tags", [])),
-                        json.dumps(thread.get("metadata", {}))
+                        json_helper.dumps(thread.get("tags", [])),
+                        json_helper.dumps(thread.get("metadata", {})),
+                        thread.get("id")  # スレッドより先に保存されたステップも数える
                     ))
+                    await self._replace_thread_tags(db, thread.get("id"), thread.get("tags") or [])
                     await db.commit()
                     print(f"   ✅ スレッドをSQLiteに保存しました")
                 except Exception as e:
+                    await db.rollback()
                     if "UNIQUE constraint failed" in str(e):
                         # 重複エラーは正常・・・既存スレッドを返す
                         return await self.get_thread(thread.get("id"))
@@ -226,7 +463,7 @@ class SQLiteDataLayer(BaseDataLayer):
         vector_store_id: Optional[str] = None,
     ) -> None:
         """スレッドを更新"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             updates = []
             values = []
             
@@ -238,10 +475,10 @@ class SQLiteDataLayer(BaseDataLayer):
                 values.append(user_id)
             if metadata is not None:
                 updates.append("metadata = ?")
-                values.append(json.dumps(metadata))
+                values.append(json_helper.dumps(metadata))
             if tags is not None:
                 updates.append("tags = ?")
-                values.append(json.dumps(tags))
+                values.append(json_helper.dumps(tags))
             if vector_store_id is not None:
                 updates.append("vector_store_id = ?")
                 values.append(vector_store_id)
@@ -251,13 +488,86 @@ class SQLiteDataLayer(BaseDataLayer):
                 values.append(thread_id)
                 
                 query = f"UPDATE threads SET {', '.join(updates)} WHERE id = ?"
+                # タグの同期と合わせて1トランザクションにまとめ、書き込みロックを先に確保
+                await self._begin_immediate(db)
                 await db.execute(query, values)
+                if tags is not None:
+                    await self._replace_thread_tags(db, thread_id, tags)
                 await db.commit()
+
+    @staticmethod
+    async def _begin_immediate(db: aiosqlite.Connection) -> None:
+        """
+        書き込みロックを先に確保してトランザクションを開始
+        他の接続がロック中の場合は指数バックオフ（1, 2, 4, 8, 16ms）で再試行する
+        """
+        for delay in _BUSY_RETRY_DELAYS:
+            try:
+                await db.execute("BEGIN IMMEDIATE")
+                return
+            except aiosqlite.OperationalError as e:
+                if "database is locked" not in str(e):
+                    raise
+                await asyncio.sleep(delay)
+        await db.execute("BEGIN IMMEDIATE")
+
+    @staticmethod
+    async def _replace_thread_tags(db: aiosqlite.Connection, thread_id: str, tags: List[str]) -> None:
+        """thread_tagsテーブルをスレッドのタグで置き換え（呼び出し側のトランザクション内で実行）"""
+        await db.execute("DELETE FROM thread_tags WHERE thread_id = ?", (thread_id,))
+        rows = [(thread_id, tag) for tag in _normalize_tags(tags)]
+        if rows:
+            await db.executemany(
+                "INSERT OR IGNORE INTO thread_tags (thread_id, tag) VALUES (?, ?)", rows
+            )
+
+    async def list_threads_by_tag(
+        self,
+        tag: str,
+        user_id: Optional[str] = None,
+        limit: int = 20
+    ) -> List[Dict]:
+        """
+        指定タグを持つスレッドを作成日時の降順で取得
+
+        Args:
+            tag: 完全一致で絞り込むタグ
+            user_id: 指定時はそのユーザーのスレッドに限定
+            limit: 取得する最大件数
+        """
+        # (thread_id, tag)は主キーなので重複行は出ない。idx_thread_tags_tagから引く
+        where_clauses = ["tt.tag = ?"]
+        params: List[Any] = [tag]
+        if user_id:
+            where_clauses.append("t.user_id = ?")
+            params.append(user_id)
+
+        columns = ", ".join(f"t.{column}" for column in _THREAD_LIST_KEYS)
+        async with self._connect() as db:
+            cursor = await db.execute(
+                f"""
+                SELECT {columns} FROM thread_tags tt
+                JOIN threads t ON t.id = tt.thread_id
+                WHERE {' AND '.join(where_clauses)}
+                ORDER BY t.created_at DESC
+                LIMIT ?
+                """,
+                params + [limit]
+            )
+            return [_thread_summary_from_row(row) for row in await cursor.fetchall()]
     
+    async def _thread_exists(self, thread_id: str) -> bool:
+        """スレッドが存在するかどうか"""
+        async with self._connect() as db:
+            cursor = await db.execute(
+                "SELECT 1 FROM threads WHERE id = ?", (thread_id,)
+            )
+            return await cursor.fetchone() is not None
+
     async def get_thread(self, thread_id: str) -> Optional[ThreadDict]:
         """スレッドを取得"""
         print(f"🔧 SQLite: get_threadが呼ばれました - ID: {thread_id}")
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute(
                 "SELECT * FROM threads WHERE id = ?", (thread_id,)
@@ -266,29 +576,7 @@ class SQLiteDataLayer(BaseDataLayer):
             
             if row:
                 # ステップを取得（作成日時とIDで並び替え）
-                step_cursor = await db.execute(
-                    "SELECT * FROM steps WHERE thread_id = ? ORDER BY created_at ASC, id ASC",
-                    (thread_id,)
-                )
-                steps = []
-                for step_row in await step_cursor.fetchall():
-                    step_dict = {
-                        "id": step_row["id"],
-                        "threadId": step_row["thread_id"],
-                        "name": step_row["name"],
-                        "type": step_row["type"],
-                        "generation": step_row["generation"] if step_row["generation"] else None,
-                        "input": step_row["input"] if step_row["input"] else "",
-                        "output": step_row["output"] if step_row["output"] else "",
-                        "metadata": json.loads(step_row["metadata"]) if step_row["metadata"] else {},
-                        "parentId": step_row["parent_id"],
-                        "startTime": step_row["start_time"],
-                        "endTime": step_row["end_time"],
-                        "createdAt": step_row["created_at"],
-                        "start": step_row["start_time"],
-                        "end": step_row["end_time"]
-                    }
-                    steps.append(step_dict)
+                steps = await self._fetch_thread_steps(db, thread_id)
                 
                 thread_dict = {
                     "id": row["id"],
@@ -297,8 +585,8 @@ class SQLiteDataLayer(BaseDataLayer):
                     "userId": row["user_id"],  # Chainlitが期待する形式
                     "userIdentifier": row["user_identifier"],  # 両方の形式で提供
                     "user_identifier": row["user_identifier"],
-                    "tags": json.loads(row["tags"]) if row["tags"] else [],
-                    "metadata": json.loads(row["metadata"]) if row["metadata"] else {},
+                    "tags": json_helper.loads(row["tags"]) if row["tags"] else [],
+                    "metadata": json_helper.loads(row["metadata"]) if row["metadata"] else {},
                     "vector_store_id": row["vector_store_id"],  # ベクトルストアIDを追加
                     "createdAt": row["created_at"],
                     "steps": steps  # ステップを含める
@@ -316,9 +604,7 @@ class SQLiteDataLayer(BaseDataLayer):
         print(f"🔧 SQLite: list_threadsが呼ばれました")
         print(f"   Filters: userId={getattr(filters, 'userId', None)}")
         
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            
+        async with self._connect() as db:
             # フィルタを構築
             where_clauses = []
             params = []
@@ -331,10 +617,9 @@ class SQLiteDataLayer(BaseDataLayer):
             
             # 総数を取得
             cursor = await db.execute(
-                f"SELECT COUNT(*) as count FROM threads{where_clause}", params
+                f"SELECT COUNT(*) FROM threads{where_clause}", params
             )
-            count_row = await cursor.fetchone()
-            total = count_row["count"]
+            (total,) = await cursor.fetchone()
             print(f"   スレッド総数: {total}")
             
             # スレッドを取得
@@ -343,28 +628,14 @@ class SQLiteDataLayer(BaseDataLayer):
             
             cursor = await db.execute(
                 f"""
-                SELECT * FROM threads{where_clause}
+                SELECT {_THREAD_LIST_COLUMNS} FROM threads{where_clause}
                 ORDER BY created_at DESC
                 LIMIT ? OFFSET ?
                 """,
                 params + [limit, offset]
             )
             
-            rows = await cursor.fetchall()
-            threads = []
-            
-            for row in rows:
-                threads.append({
-                    "id": row["id"],
-                    "name": row["name"],
-                    "user_id": row["user_id"],
-                    "userId": row["user_id"],  # Chainlitが期待する形式
-                    "user_identifier": row["user_identifier"],
-                    "tags": json.loads(row["tags"]) if row["tags"] else [],
-                    "metadata": json.loads(row["metadata"]) if row["metadata"] else {},
-                    "createdAt": row["created_at"],
-                    "steps": []
-                })
+            threads = [_thread_summary_from_row(row) for row in await cursor.fetchall()]
             print(f"   取得したスレッド数: {len(threads)}")
         
         return SQLitePaginatedResponse(
@@ -379,7 +650,7 @@ class SQLiteDataLayer(BaseDataLayer):
     async def get_thread_author(self, thread_id: str) -> Optional[str]:
         """スレッドの作成者を取得"""
         print(f"🔧 SQLite: get_thread_authorが呼ばれました - ID: {thread_id}")
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute(
                 "SELECT user_identifier FROM threads WHERE id = ?", (thread_id,)
@@ -392,34 +663,65 @@ class SQLiteDataLayer(BaseDataLayer):
     async def get_thread_steps(self, thread_id: str) -> List[StepDict]:
         """スレッドのステップを取得"""
         print(f"🔧 SQLite: get_thread_stepsが呼ばれました - ID: {thread_id}")
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute(
-                "SELECT * FROM steps WHERE thread_id = ? ORDER BY created_at ASC, id ASC",
-                (thread_id,)
-            )
-            steps = []
-            for row in await cursor.fetchall():
-                step_dict = {
-                    "id": row["id"],
-                    "threadId": row["thread_id"],
-                    "name": row["name"],
-                    "type": row["type"],
-                    "generation": row["generation"] if row["generation"] else None,
-                    "input": row["input"] if row["input"] else "",
-                    "output": row["output"] if row["output"] else "",
-                    "metadata": json.loads(row["metadata"]) if row["metadata"] else {},
-                    "parentId": row["parent_id"],
-                    "startTime": row["start_time"],
-                    "endTime": row["end_time"],
-                    "createdAt": row["created_at"],
-                    "start": row["start_time"],
-                    "end": row["end_time"]
-                }
-                steps.append(step_dict)
+        async with self._connect() as db:
+            steps = await self._fetch_thread_steps(db, thread_id)
             print(f"   ✅ {len(steps)}個のステップを取得しました")
             return steps
-    
+
+    @staticmethod
+    async def _fetch_thread_steps(db: aiosqlite.Connection, thread_id: str) -> List[StepDict]:
+        """スレッドのステップを作成日時順に取得（Row生成を避けてタプルから直接変換）"""
+        cursor = await db.execute(
+            f"SELECT {_STEP_COLUMNS} FROM steps WHERE thread_id = ? ORDER BY created_at ASC, id ASC",
+            (thread_id,)
+        )
+        cursor.row_factory = None
+        return [_step_from_row(row) for row in await cursor.fetchall()]
+
+    async def get_thread_step_count(self, thread_id: str) -> int:
+        """スレッドのステップ数を取得（threads.step_countを参照）"""
+        async with self._connect() as db:
+            cursor = await db.execute(
+                "SELECT step_count FROM threads WHERE id = ?", (thread_id,)
+            )
+            row = await cursor.fetchone()
+            return (row[0] or 0) if row else 0
+
+    async def search_steps(self, query: str, limit: int = 50) -> List[StepDict]:
+        """
+        ステップ本文を全文検索（BM25の関連度順）
+
+        Args:
+            query: FTS5のMATCH構文で解釈される検索クエリ
+            limit: 取得する最大件数
+
+        Returns:
+            マッチしたステップのリスト（FTS5が無効な場合は空リスト）
+        """
+        await self.ensure_initialized()
+        if not self._fts_enabled or not query.strip():
+            return []
+
+        async with self._connect() as db:
+            try:
+                cursor = await db.execute(
+                    f"""
+                    SELECT {_STEP_COLUMNS} FROM steps
+                    JOIN steps_fts f ON f.rowid = steps.rowid
+                    WHERE steps_fts MATCH ?
+                    ORDER BY bm25(steps_fts)
+                    LIMIT ?
+                    """,
+                    (query, limit)
+                )
+                rows = await cursor.fetchall()
+            except aiosqlite.OperationalError as e:
+                # クエリ構文エラーなど
+                print(f"⚠️ 全文検索エラー: {e}")
+                return []
+
+            return [_step_from_row(row) for row in rows]
+
     async def create_step(self, step: StepDict) -> None:
         """ステップを作成"""
         print(f"🔧 SQLite: create_stepが呼ばれました - ID: {step.get('id')}, ThreadID: {step.get('threadId')}, Type: {step.get('type')}")
@@ -493,9 +795,8 @@ class SQLiteDataLayer(BaseDataLayer):
         # ユーザーメッセージの場合のみスレッドを自動作成
         thread_id = step.get("threadId")
         if thread_id and step.get("type") == "user_message":
-            # スレッドが存在しない場合は作成
-            existing_thread = await self.get_thread(thread_id)
-            if not existing_thread:
+            # スレッドが存在しない場合は作成（存在確認のみなのでステップは読み込まない）
+            if not await self._thread_exists(thread_id):
                 print(f"   ℹ️ 新規スレッドを自動作成: {thread_id}")
                 
                 # 現在のユーザー情報を取得
@@ -523,7 +824,7 @@ class SQLiteDataLayer(BaseDataLayer):
                 await self.create_thread(thread)
         
         # ステップを保存
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             try:
                 # まず既存のステップがあるか確認
                 cursor = await db.execute(
@@ -548,7 +849,7 @@ class SQLiteDataLayer(BaseDataLayer):
                         step.get("generation"),
                         step.get("input"),
                         step.get("output"),
-                        json.dumps(step.get("metadata", {})),
+                        json_helper.dumps_blob(step.get("metadata", {})),
                         step.get("parentId"),
                         step.get("startTime"),
                         step.get("endTime"),
@@ -569,7 +870,7 @@ class SQLiteDataLayer(BaseDataLayer):
                         step.get("generation"),
                         step.get("input"),
                         step.get("output"),
-                        json.dumps(step.get("metadata", {})),
+                        json_helper.dumps_blob(step.get("metadata", {})),
                         step.get("parentId"),
                         step.get("startTime"),
                         step.get("endTime")
@@ -582,7 +883,7 @@ class SQLiteDataLayer(BaseDataLayer):
     
     async def update_step(self, step: StepDict) -> None:
         """ステップを更新"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute("""
                 UPDATE steps 
                 SET name = ?, type = ?, generation = ?, input = ?, output = ?, 
@@ -594,7 +895,7 @@ class SQLiteDataLayer(BaseDataLayer):
                 step.get("generation"),
                 step.get("input"),
                 step.get("output"),
-                json.dumps(step.get("metadata", {})),
+                json_helper.dumps_blob(step.get("metadata", {})),
                 step.get("parentId"),
                 step.get("startTime"),
                 step.get("endTime"),
@@ -604,7 +905,7 @@ class SQLiteDataLayer(BaseDataLayer):
     
     async def delete_step(self, step_id: str) -> None:
         """ステップを削除"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute("DELETE FROM steps WHERE id = ?", (step_id,))
             await db.commit()
     
@@ -627,7 +928,7 @@ class SQLiteDataLayer(BaseDataLayer):
         else:
             element_dict = element
         
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute("""
                 INSERT INTO elements 
                 (id, thread_id, for_id, type, name, display, mime, path, url, content)
@@ -648,7 +949,7 @@ class SQLiteDataLayer(BaseDataLayer):
     
     async def get_element(self, element_id: str, thread_id: str = None) -> Optional[ElementDict]:
         """エレメントを取得"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             db.row_factory = aiosqlite.Row
             if thread_id:
                 cursor = await db.execute(
@@ -679,7 +980,7 @@ class SQLiteDataLayer(BaseDataLayer):
     
     async def delete_element(self, element_id: str, thread_id: str = None) -> None:
         """エレメントを削除"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             if thread_id:
                 await db.execute(
                     "DELETE FROM elements WHERE id = ? AND thread_id = ?",
@@ -696,7 +997,7 @@ class SQLiteDataLayer(BaseDataLayer):
         """フィードバックを作成または更新"""
         feedback_id = feedback.get("id") or str(uuid.uuid4())
         
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             # 既存のフィードバックがあるか確認
             cursor = await db.execute(
                 "SELECT id FROM feedbacks WHERE for_id = ?", 
@@ -733,7 +1034,7 @@ class SQLiteDataLayer(BaseDataLayer):
     
     async def delete_feedback(self, feedback_id: str) -> None:
         """フィードバックを削除"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute("DELETE FROM feedbacks WHERE id = ?", (feedback_id,))
             await db.commit()
     
@@ -745,111 +1046,44 @@ class SQLiteDataLayer(BaseDataLayer):
     
     async def get_persona(self, persona_id: str) -> Optional[Dict]:
         """ペルソナを取得"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self._connect() as db:
             cursor = await db.execute(
-                "SELECT * FROM personas WHERE id = ?", (persona_id,)
+                f"SELECT {_PERSONA_COLUMNS} FROM personas WHERE id = ?", (persona_id,)
             )
             row = await cursor.fetchone()
-            
-            if row:
-                return {
-                    "id": row["id"],
-                    "name": row["name"],
-                    "system_prompt": row["system_prompt"],
-                    "model": row["model"],
-                    "temperature": row["temperature"],
-                    "max_tokens": row["max_tokens"],
-                    "description": row["description"],
-                    "tags": json.loads(row["tags"]) if row["tags"] else [],
-                    "is_active": row["is_active"],
-                    "created_at": row["created_at"],
-                    "updated_at": row["updated_at"]
-                }
-        return None
+        return _persona_from_row(row) if row else None
     
     async def get_persona_by_name(self, name: str) -> Optional[Dict]:
         """名前からペルソナを取得"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self._connect() as db:
             cursor = await db.execute(
-                "SELECT * FROM personas WHERE name = ?", (name,)
+                f"SELECT {_PERSONA_COLUMNS} FROM personas WHERE name = ?", (name,)
             )
             row = await cursor.fetchone()
-            
-            if row:
-                return {
-                    "id": row["id"],
-                    "name": row["name"],
-                    "system_prompt": row["system_prompt"],
-                    "model": row["model"],
-                    "temperature": row["temperature"],
-                    "max_tokens": row["max_tokens"],
-                    "description": row["description"],
-                    "tags": json.loads(row["tags"]) if row["tags"] else [],
-                    "is_active": row["is_active"],
-                    "created_at": row["created_at"],
-                    "updated_at": row["updated_at"]
-                }
-        return None
+        return _persona_from_row(row) if row else None
     
     async def list_personas(self) -> List[Dict]:
         """全てのペルソナを取得"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self._connect() as db:
             cursor = await db.execute(
-                "SELECT * FROM personas ORDER BY name ASC"
+                f"SELECT {_PERSONA_COLUMNS} FROM personas ORDER BY name ASC"
             )
-            rows = await cursor.fetchall()
-            
-            personas = []
-            for row in rows:
-                personas.append({
-                    "id": row["id"],
-                    "name": row["name"],
-                    "system_prompt": row["system_prompt"],
-                    "model": row["model"],
-                    "temperature": row["temperature"],
-                    "max_tokens": row["max_tokens"],
-                    "description": row["description"],
-                    "tags": json.loads(row["tags"]) if row["tags"] else [],
-                    "is_active": row["is_active"],
-                    "created_at": row["created_at"],
-                    "updated_at": row["updated_at"]
-                })
-            
-            return personas
+            return [_persona_from_row(row) for row in await cursor.fetchall()]
     
     async def get_active_persona(self) -> Optional[Dict]:
         """アクティブなペルソナを取得"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self._connect() as db:
             cursor = await db.execute(
-                "SELECT * FROM personas WHERE is_active = 1 LIMIT 1"
+                f"SELECT {_PERSONA_COLUMNS} FROM personas WHERE is_active = 1 LIMIT 1"
             )
             row = await cursor.fetchone()
-            
-            if row:
-                return {
-                    "id": row["id"],
-                    "name": row["name"],
-                    "system_prompt": row["system_prompt"],
-                    "model": row["model"],
-                    "temperature": row["temperature"],
-                    "max_tokens": row["max_tokens"],
-                    "description": row["description"],
-                    "tags": json.loads(row["tags"]) if row["tags"] else [],
-                    "is_active": row["is_active"],
-                    "created_at": row["created_at"],
-                    "updated_at": row["updated_at"]
-                }
-        return None
+        return _persona_from_row(row) if row else None
     
     async def create_persona(self, persona: Dict) -> str:
         """新しいペルソナを作成"""
         persona_id = persona.get("id") or str(uuid.uuid4())
         
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute("""
                 INSERT INTO personas 
                 (id, name, system_prompt, model, temperature, max_tokens, description, tags, is_active)
@@ -871,7 +1105,7 @@ class SQLiteDataLayer(BaseDataLayer):
     
     async def update_persona(self, persona_id: str, updates: Dict) -> None:
         """ペルソナを更新"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             update_fields = []
             values = []
             
@@ -910,7 +1144,8 @@ class SQLiteDataLayer(BaseDataLayer):
     
     async def set_active_persona(self, persona_id: str) -> None:
         """ペルソナをアクティブに設定"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
+            await self._begin_immediate(db)
             # 全てのペルソナを非アクティブにする
             await db.execute("UPDATE personas SET is_active = 0")
             # 指定のペルソナをアクティブにする
@@ -922,7 +1157,7 @@ class SQLiteDataLayer(BaseDataLayer):
     
     async def delete_persona(self, persona_id: str) -> None:
         """ペルソナを削除"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute("DELETE FROM personas WHERE id = ?", (persona_id,))
             await db.commit()
     
@@ -930,7 +1165,7 @@ class SQLiteDataLayer(BaseDataLayer):
     
     async def get_user_vector_store_id(self, user_id: str) -> Optional[str]:
         """ユーザーのベクトルストアIDを取得"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute(
                 "SELECT vector_store_id FROM user_vector_stores WHERE user_id = ?",
@@ -941,7 +1176,7 @@ class SQLiteDataLayer(BaseDataLayer):
     
     async def set_user_vector_store_id(self, user_id: str, vector_store_id: str) -> None:
         """ユーザーのベクトルストアIDを設定"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             # UPSERT操作（存在すれば更新、なければ挿入）
             await db.execute("""
                 INSERT OR REPLACE INTO user_vector_stores 
@@ -952,7 +1187,7 @@ class SQLiteDataLayer(BaseDataLayer):
     
     async def delete_user_vector_store(self, user_id: str) -> None:
         """ユーザーのベクトルストア情報を削除"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute(
                 "DELETE FROM user_vector_stores WHERE user_id = ?",
                 (user_id,)
@@ -961,7 +1196,7 @@ class SQLiteDataLayer(BaseDataLayer):
     
     async def update_thread_vector_store(self, thread_id: str, vector_store_id: str) -> None:
         """スレッドのベクトルストアIDを更新"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute("""
                 UPDATE threads 
                 SET vector_store_id = ?, updated_at = CURRENT_TIMESTAMP
@@ -977,7 +1212,7 @@ class SQLiteDataLayer(BaseDataLayer):
         print(f"🔧 [DEBUG] delete_threadメソッド開始: thread_id={thread_id}")
         try:
             # まず、スレッドに関連付けられたベクトルストアIDを取得
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 db.row_factory = aiosqlite.Row
                 cursor = await db.execute(
                     "SELECT * FROM threads WHERE id = ?",
@@ -1064,8 +1299,18 @@ class SQLiteDataLayer(BaseDataLayer):
                 else:
                     print(f"ℹ️ [DEBUG] ベクトルストアIDが設定されていません（NULL）")
                 
-                # スレッドに関連するすべてのデータを削除
+                # スレッドに関連するすべてのデータを削除（1トランザクションで実行）
                 print(f"🗑️ [DEBUG] データベースからスレッドと関連データを削除中...")
+                await self._begin_immediate(db)
+                
+                # フィードバックを削除（ステップIDに関連付けられている場合。ステップ削除より先に行う）
+                result = await db.execute("""
+                    DELETE FROM feedbacks 
+                    WHERE for_id IN (
+                        SELECT id FROM steps WHERE thread_id = ?
+                    )
+                """, (thread_id,))
+                print(f"   - フィードバック削除: {result.rowcount}件")
                 
                 # ステップを削除
                 result = await db.execute(
@@ -1081,14 +1326,11 @@ class SQLiteDataLayer(BaseDataLayer):
                 )
                 print(f"   - エレメント削除: {result.rowcount}件")
                 
-                # フィードバックを削除（ステップIDに関連付けられている場合）
-                result = await db.execute("""
-                    DELETE FROM feedbacks 
-                    WHERE for_id IN (
-                        SELECT id FROM steps WHERE thread_id = ?
-                    )
-                """, (thread_id,))
-                print(f"   - フィードバック削除: {result.rowcount}件")
+                # タグを削除（外部キー制約は有効化していないため明示的に削除）
+                await db.execute(
+                    "DELETE FROM thread_tags WHERE thread_id = ?",
+                    (thread_id,)
+                )
                 
                 # 最後にスレッド自体を削除
                 result = await db.execute(
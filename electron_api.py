@@ -82,6 +82,16 @@ app = FastAPI(
     version="1.0.0"
 )
 
+@app.on_event("startup")
+async def _ensure_chainlit_db_schema():
+    """Chainlit DBのスキーマを保証（data_layerは初回アクセスまで作成を遅延するため）"""
+    if SQLiteDataLayer is None:
+        return
+    try:
+        await SQLiteDataLayer().ensure_initialized()
+    except Exception as e:
+        print(f"Warning: Chainlit DB schema init failed: {e}")
+
 # 内部ユーティリティ: Vector Store Handlerの初期化保証
 def _ensure_vector_store_ready() -> bool:
     try:
@@ -342,6 +352,34 @@ def get_analytics_db_connection():
             pass
         return None
 
+# DB件数の短期キャッシュ（UIのポーリングで毎回集計しないため）
+_DB_COUNTS_TTL = 5.0
+_db_counts_cache: Dict[str, Any] = {"expires_at": 0.0, "value": None}
+
+def _get_db_counts():
+    """threads/personas/user_vector_storesの件数を1クエリで取得（5秒キャッシュ）"""
+    now = time.monotonic()
+    if _db_counts_cache["value"] is not None and now < _db_counts_cache["expires_at"]:
+        return _db_counts_cache["value"]
+
+    conn = get_db_connection()
+    try:
+        row = conn.execute(
+            """
+            SELECT
+                (SELECT COUNT(*) FROM threads),
+                (SELECT COUNT(*) FROM personas),
+                (SELECT COUNT(*) FROM user_vector_stores)
+            """
+        ).fetchone()
+    finally:
+        conn.close()
+
+    counts = tuple(row)
+    _db_counts_cache["value"] = counts
+    _db_counts_cache["expires_at"] = now + _DB_COUNTS_TTL
+    return counts
+
 # ヘルスチェックエンドポイント
 @app.get("/api/health")
 async def health_check():
@@ -375,16 +413,8 @@ async def get_system_status():
         persona_count = 0
         vector_store_count = 0
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) as count FROM threads")
-            thread_count = cursor.fetchone()['count']
-            cursor.execute("SELECT COUNT(*) as count FROM personas")
-            persona_count = cursor.fetchone()['count']
-            cursor.execute("SELECT COUNT(*) as count FROM user_vector_stores")
-            vector_store_count = cursor.fetchone()['count']
+            thread_count, persona_count, vector_store_count = _get_db_counts()
             database_status = 'healthy'
-            conn.close()
         except Exception:
             database_status = 'unhealthy'
 
@@ -762,23 +792,16 @@ async def get_analytics_dashboard(user_id: str):
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        # 概要合計
-        cursor.execute(
-            "SELECT COUNT(*) as cnt FROM threads WHERE user_id = ? OR user_identifier = ?",
-            (user_id, user_id),
-        )
-        total_chats = cursor.fetchone()[0]
-
+        # 概要合計（メッセージ数はthreads.step_countの合計でstepsの走査を避ける）
         cursor.execute(
             """
-            SELECT COUNT(s.id) as cnt
-            FROM steps s
-            JOIN threads t ON s.thread_id = t.id
-            WHERE (t.user_id = ? OR t.user_identifier = ?)
+            SELECT COUNT(*) as cnt, COALESCE(SUM(step_count), 0) as messages
+            FROM threads
+            WHERE user_id = ? OR user_identifier = ?
             """,
             (user_id, user_id),
         )
-        total_messages = cursor.fetchone()[0]
+        total_chats, total_messages = cursor.fetchone()
 
         # personas / vector stores は存在しない場合を考慮
         total_personas = 0
@@ -45,6 +45,8 @@ class SearchHandler:
         """検索ハンドラーを初期化"""
         self.chainlit_db_path = ".chainlit/chainlit.db"
         self.analytics_db_path = ".chainlit/analytics.db"
+        # 直近クエリのハイライト用正規表現 (query, pattern, replacements)
+        self._highlight_cache: Optional[Tuple[str, Optional[re.Pattern], Dict[str, str]]] = None
         
     async def search_all(
         self,
@@ -103,9 +105,11 @@ class SearchHandler:
                 )
                 return
             
-            message = f"# 🔍 検索結果\n\n"
-            message += f"**クエリ**: {query}\n"
-            message += f"**件数**: {len(results)}件\n\n"
+            parts = [
+                "# 🔍 検索結果\n\n",
+                f"**クエリ**: {query}\n",
+                f"**件数**: {len(results)}件\n\n",
+            ]
             
             # 結果タイプ別に分類
             conversation_results = [r for r in results if r.result_type == "conversation"]
@@ -114,60 +118,60 @@ class SearchHandler:
             
             # 会話履歴の結果
             if conversation_results:
-                message += f"## 💬 会話履歴 ({len(conversation_results)}件)\n\n"
+                parts.append(f"## 💬 会話履歴 ({len(conversation_results)}件)\n\n")
                 for i, result in enumerate(conversation_results[:5], 1):
                     highlighted_content = self._highlight_query_in_text(result.content, query)
                     timestamp = result.timestamp[:16] if result.timestamp else "不明"
                     
-                    message += f"### {i}. {result.title}\n"
-                    message += f"**日時**: {timestamp}\n"
-                    message += f"**関連度**: {result.relevance_score:.2f}\n"
-                    message += f"**内容**: {highlighted_content[:200]}{'...' if len(result.content) > 200 else ''}\n"
+                    parts.append(f"### {i}. {result.title}\n")
+                    parts.append(f"**日時**: {timestamp}\n")
+                    parts.append(f"**関連度**: {result.relevance_score:.2f}\n")
+                    parts.append(f"**内容**: {highlighted_content[:200]}{'...' if len(result.content) > 200 else ''}\n")
                     
                     if result.metadata:
                         if result.metadata.get("persona"):
-                            message += f"**ペルソナ**: {result.metadata['persona']}\n"
+                            parts.append(f"**ペルソナ**: {result.metadata['persona']}\n")
                         if result.metadata.get("model"):
-                            message += f"**モデル**: {result.metadata['model']}\n"
+                            parts.append(f"**モデル**: {result.metadata['model']}\n")
                     
-                    message += "\n"
+                    parts.append("\n")
                 
                 if len(conversation_results) > 5:
-                    message += f"*他{len(conversation_results) - 5}件の会話結果があります*\n\n"
+                    parts.append(f"*他{len(conversation_results) - 5}件の会話結果があります*\n\n")
             
             # ペルソナの結果
             if persona_results:
-                message += f"## 🎭 ペルソナ ({len(persona_results)}件)\n\n"
+                parts.append(f"## 🎭 ペルソナ ({len(persona_results)}件)\n\n")
                 for i, result in enumerate(persona_results, 1):
                     highlighted_content = self._highlight_query_in_text(result.content, query)
                     
-                    message += f"### {i}. {result.title}\n"
-                    message += f"**関連度**: {result.relevance_score:.2f}\n"
-                    message += f"**説明**: {highlighted_content}\n"
+                    parts.append(f"### {i}. {result.title}\n")
+                    parts.append(f"**関連度**: {result.relevance_score:.2f}\n")
+                    parts.append(f"**説明**: {highlighted_content}\n")
                     
                     if result.metadata:
                         if result.metadata.get("model"):
-                            message += f"**モデル**: {result.metadata['model']}\n"
+                            parts.append(f"**モデル**: {result.metadata['model']}\n")
                         if result.metadata.get("tags"):
-                            message += f"**タグ**: {', '.join(result.metadata['tags'])}\n"
+                            parts.append(f"**タグ**: {', '.join(result.metadata['tags'])}\n")
                     
-                    message += "\n"
+                    parts.append("\n")
             
             # ベクトルストアの結果
             if vs_results:
-                message += f"## 🗂️ ベクトルストア ({len(vs_results)}件)\n\n"
+                parts.append(f"## 🗂️ ベクトルストア ({len(vs_results)}件)\n\n")
                 for i, result in enumerate(vs_results, 1):
-                    message += f"### {i}. {result.title}\n"
-                    message += f"**関連度**: {result.relevance_score:.2f}\n"
-                    message += f"**タイプ**: {result.metadata.get('vs_type', 'Unknown')}\n"
+                    parts.append(f"### {i}. {result.title}\n")
+                    parts.append(f"**関連度**: {result.relevance_score:.2f}\n")
+                    parts.append(f"**タイプ**: {result.metadata.get('vs_type', 'Unknown')}\n")
                     
                     if result.content:
                         highlighted_content = self._highlight_query_in_text(result.content, query)
-                        message += f"**内容**: {highlighted_content[:150]}{'...' if len(result.content) > 150 else ''}\n"
+                        parts.append(f"**内容**: {highlighted_content[:150]}{'...' if len(result.content) > 150 else ''}\n")
                     
-                    message += "\n"
+                    parts.append("\n")
             
-            await ui.send_system_message(message)
+            await ui.send_system_message("".join(parts))
             
         except Exception as e:
             await error_handler.handle_unexpected_error(e, "検索結果表示")
@@ -473,16 +477,31 @@ class SearchHandler:
         if not text or not query:
             return text
         
-        # 簡易ハイライト実装
-        query_words = query.split()
-        highlighted_text = text
+        pattern, replacements = self._get_highlight_pattern(query)
+        if pattern is None:
+            return text
         
-        for word in query_words:
-            # 大文字小文字を無視して置換
-            pattern = re.compile(re.escape(word), re.IGNORECASE)
-            highlighted_text = pattern.sub(f"**{word}**", highlighted_text)
+        # 大文字小文字を無視して、マッチ箇所をクエリ側の表記で強調（1パスで置換）
+        return pattern.sub(lambda m: f"**{replacements.get(m.group(0).lower(), m.group(0))}**", text)
+    
+    def _get_highlight_pattern(self, query: str) -> Tuple[Optional[re.Pattern], Dict[str, str]]:
+        """クエリ単語の置換用正規表現を取得（同じクエリなら前回のコンパイル結果を再利用）"""
+        cached = self._highlight_cache
+        if cached and cached[0] == query:
+            return cached[1], cached[2]
+        
+        replacements: Dict[str, str] = {}
+        for word in query.split():
+            replacements.setdefault(word.lower(), word)
+        
+        pattern = None
+        if replacements:
+            # 長い単語を優先してマッチさせる
+            alternatives = sorted(replacements, key=len, reverse=True)
+            pattern = re.compile("|".join(map(re.escape, alternatives)), re.IGNORECASE)
         
-        return highlighted_text
+        self._highlight_cache = (query, pattern, replacements)
+        return pattern, replacements
     
     def _generate_search_stats(self, results: List[SearchResult], filters: SearchFilters) -> str:
         """検索統計の生成"""
@@ -28,20 +28,17 @@ class VectorStoreHandler:
             
             if result.get("synced"):
                 message += "✅ **同期されたベクトルストア:**\n"
-                for vs_id in result["synced"]:
-                    message += f"  - `{vs_id}`\n"
+                message += "".join(f"  - `{vs_id}`\n" for vs_id in result["synced"])
                 message += "\n"
             
             if result.get("removed_from_local"):
                 message += "🗑️ **ローカルから削除:**\n"
-                for vs_id in result["removed_from_local"]:
-                    message += f"  - `{vs_id}`\n"
+                message += "".join(f"  - `{vs_id}`\n" for vs_id in result["removed_from_local"])
                 message += "\n"
             
             if result.get("removed_from_config"):
                 message += "📝 **設定から削除:**\n"
-                for vs_id in result["removed_from_config"]:
-                    message += f"  - `{vs_id}`\n"
+                message += "".join(f"  - `{vs_id}`\n" for vs_id in result["removed_from_config"])
                 message += "\n"
             
             await ui.update_loading_message(loading_msg, message)
@@ -61,23 +58,25 @@ class VectorStoreHandler:
                 )
                 return
             
-            message = "# 🗂️ ベクトルストア一覧\n\n"
-            
             personal_vs_id = ui.get_session("personal_vs_id") or vector_store_handler.personal_vs_id
             
+            # ストア数に比例して文字列を連結し直さないよう、部品をまとめてjoinする
+            parts = ["# 🗂️ ベクトルストア一覧\n\n"]
             for vs in vector_stores:
-                is_active = vs.get("id") == personal_vs_id
-                status = " ✅ [アクティブ]" if is_active else ""
-                
-                message += f"## {vs.get('name', 'Unknown')}{status}\n"
-                message += f"🆔 ID: `{vs.get('id', 'N/A')}`\n"
-                message += f"📊 ファイル数: {vs.get('file_counts', {}).get('total', 0)}\n"
-                message += f"📅 作成日: {vs.get('created_at', 'Unknown')}\n\n"
-            
-            message += "💡 **使い方**:\n"
-            message += "- ファイルをアップロードで自動追加\n"
-            message += "- `/vs create` で新規作成\n"
-            message += "- `/vs info <ID>` で詳細表示\n"
+                status = " ✅ [アクティブ]" if vs.get("id") == personal_vs_id else ""
+                parts.append(
+                    f"## {vs.get('name', 'Unknown')}{status}\n"
+                    f"🆔 ID: `{vs.get('id', 'N/A')}`\n"
+                    f"📊 ファイル数: {vs.get('file_counts', {}).get('total', 0)}\n"
+                    f"📅 作成日: {vs.get('created_at', 'Unknown')}\n\n"
+                )
+            parts.append(
+                "💡 **使い方**:\n"
+                "- ファイルをアップロードで自動追加\n"
+                "- `/vs create` で新規作成\n"
+                "- `/vs info <ID>` で詳細表示\n"
+            )
+            message = "".join(parts)
             
             await ui.send_system_message(message)
             
@@ -266,33 +265,26 @@ class VectorStoreHandler:
             # ファイルを処理してベクトルストアに追加
             loading_msg = await ui.show_loading_message("ファイルを処理中...")
             
-            successful_ids, failed_files = await vector_store_handler.process_uploaded_files(files)
+            # アップロードが終わったファイルから順にベクトルストアへ追加する
+            successful_ids, failed_files = await vector_store_handler.upload_and_add_pipeline(
+                personal_vs_id, files
+            )
             
             if successful_ids:
-                success = await vector_store_handler.add_files_to_vector_store(
-                    personal_vs_id, successful_ids
-                )
+                message = f"✅ {len(successful_ids)}個のファイルを追加しました\n\n"
+                message += f"📁 ベクトルストアID: `{personal_vs_id}`\n\n"
                 
-                if success:
-                    message = f"✅ {len(successful_ids)}個のファイルを追加しました\n\n"
-                    message += f"📁 ベクトルストアID: `{personal_vs_id}`\n\n"
-                    
-                    if failed_files:
-                        message += f"⚠️ {len(failed_files)}個のファイルの処理に失敗しました"
-                    
-                    await ui.update_loading_message(loading_msg, message)
-                    
-                    app_logger.info(
-                        "ファイルアップロード成功", 
-                        vs_id=personal_vs_id, 
-                        success_count=len(successful_ids),
-                        failed_count=len(failed_files)
-                    )
-                else:
-                    await ui.update_loading_message(
-                        loading_msg,
-                        "❌ ファイルのベクトルストア追加に失敗しました"
-                    )
+                if failed_files:
+                    message += f"⚠️ {len(failed_files)}個のファイルの処理に失敗しました"
+                
+                await ui.update_loading_message(loading_msg, message)
+                
+                app_logger.info(
+                    "ファイルアップロード成功", 
+                    vs_id=personal_vs_id, 
+                    success_count=len(successful_ids),
+                    failed_count=len(failed_files)
+                )
             else:
                 await ui.update_loading_message(
                     loading_msg,
@@ -345,15 +337,16 @@ class VectorStoreHandler:
             if vector_stores:
                 app_logger.info("セッションベクトルストアをクリーンアップ中")
                 
-                for store_type, store_id in vector_stores.items():
-                    try:
-                        success = await vector_store_handler.delete_vector_store(store_id)
-                        if success:
-                            app_logger.info(f"セッションベクトルストア削除成功: {store_type}={store_id}")
-                        else:
-                            app_logger.warning(f"セッションベクトルストア削除失敗: {store_type}={store_id}")
-                    except Exception as e:
-                        app_logger.error(f"セッションベクトルストア削除エラー: {store_type}={store_id}", error=str(e))
+                # 全ストアの削除を並行して実行
+                items = list(vector_stores.items())
+                results = await vector_store_handler.delete_vector_stores(
+                    [store_id for _, store_id in items]
+                )
+                for (store_type, store_id), success in zip(items, results, strict=True):
+                    if success:
+                        app_logger.info(f"セッションベクトルストア削除成功: {store_type}={store_id}")
+                    else:
+                        app_logger.warning(f"セッションベクトルストア削除失敗: {store_type}={store_id}")
                 
                 # セッションから削除
                 ui.set_session("vector_stores", {})
@@ -0,0 +1,11 @@
+"""
+pytest共通設定
+リポジトリ直下のモジュール（data_layer、utils）をインポートできるようにする
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
@@ -0,0 +1,191 @@
+"""
+data_layer.SQLiteDataLayerのスキーマ移行のテスト
+（thread_tagsの移行、step_countカウンタ、ステップのFTS5インデックス）
+一時ファイルのSQLite DBに対して_init_db_syncを実行して検証する
+"""
+
+import asyncio
+import sqlite3
+
+import pytest
+
+pytest.importorskip("chainlit")
+pytest.importorskip("aiosqlite")
+
+from data_layer import SQLiteDataLayer  # noqa: E402
+
+
+def _create_legacy_db(path) -> None:
+    """移行前（thread_tags・step_count・steps_ftsがない）のスキーマでDBを作成"""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE threads (
+            id TEXT PRIMARY KEY,
+            name TEXT,
+            user_id TEXT,
+            user_identifier TEXT,
+            tags TEXT,
+            metadata TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE steps (
+            id TEXT PRIMARY KEY,
+            thread_id TEXT,
+            name TEXT,
+            type TEXT,
+            generation TEXT,
+            input TEXT,
+            output TEXT,
+            metadata TEXT,
+            parent_id TEXT,
+            start_time TIMESTAMP,
+            end_time TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    conn.executemany(
+        "INSERT INTO threads (id, name, tags) VALUES (?, ?, ?)",
+        [
+            ("t1", "スレッド1", '["work", "urgent"]'),
+            ("t2", "スレッド2", "{not json"),
+            ("t3", "スレッド3", '{"tag": "dict"}'),
+            ("t4", "スレッド4", None),
+            ("t5", "スレッド5", '[1, null, "", "work"]'),
+        ],
+    )
+    conn.executemany(
+        "INSERT INTO steps (id, thread_id, output, metadata) VALUES (?, ?, ?, ?)",
+        [
+            ("s1", "t1", "hello world", "{}"),
+            ("s2", "t1", "another message", "{}"),
+            ("s3", "t2", "legacy output", "{}"),
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "chainlit.db"
+    _create_legacy_db(path)
+    return path
+
+
+@pytest.fixture
+def layer(db_path):
+    layer = SQLiteDataLayer(db_path=str(db_path))
+    layer._init_db_sync()
+    return layer
+
+
+@pytest.fixture
+def conn(layer):
+    conn = sqlite3.connect(layer.db_path)
+    yield conn
+    conn.close()
+
+
+def _step_counts(conn):
+    return dict(conn.execute("SELECT id, step_count FROM threads"))
+
+
+def _tags(conn):
+    return set(conn.execute("SELECT thread_id, tag FROM thread_tags"))
+
+
+def _fts_ids(conn, query):
+    return {
+        row[0]
+        for row in conn.execute(
+            "SELECT steps.id FROM steps_fts JOIN steps ON steps.rowid = steps_fts.rowid "
+            "WHERE steps_fts MATCH ?",
+            (query,),
+        )
+    }
+
+
+def _require_fts(layer):
+    if not layer._fts_enabled:
+        pytest.skip("このSQLiteビルドではFTS5が利用できません")
+
+
+def _assert_fts_in_sync(conn):
+    # 外部コンテンツ方式のインデックスがstepsと食い違っていればエラーになる
+    conn.execute("INSERT INTO steps_fts(steps_fts) VALUES ('integrity-check')")
+
+
+def test_legacy_schema_is_migrated(conn):
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(threads)")}
+    assert {"step_count", "vector_store_id"} <= columns
+    assert _step_counts(conn) == {"t1": 2, "t2": 1, "t3": 0, "t4": 0, "t5": 0}
+
+
+def test_tag_backfill_skips_malformed_json(conn):
+    # t2は壊れたJSON、t3は配列でないためスキップされる。t5のNoneと空のタグは除かれる
+    assert _tags(conn) == {("t1", "work"), ("t1", "urgent"), ("t5", "1"), ("t5", "work")}
+
+
+def test_runtime_tags_are_normalized_like_backfill(layer, conn):
+    asyncio.run(layer.update_thread("t4", tags=[1, None, "", "work"]))
+
+    assert {tag for thread_id, tag in _tags(conn) if thread_id == "t4"} == {"1", "work"}
+    threads = asyncio.run(layer.list_threads_by_tag("1"))
+    assert {thread["id"] for thread in threads} == {"t4", "t5"}
+
+
+def test_second_init_is_noop(layer, conn):
+    # 移行後の変更（タグの削除・ステップの追加）が再初期化で巻き戻らないこと
+    conn.execute("DELETE FROM thread_tags WHERE thread_id = 't1' AND tag = 'urgent'")
+    conn.execute("INSERT INTO steps (id, thread_id, output) VALUES ('s4', 't3', 'new step')")
+    conn.commit()
+    tags_before = _tags(conn)
+    counts_before = _step_counts(conn)
+
+    layer._init_db_sync()
+
+    assert _tags(conn) == tags_before
+    assert _step_counts(conn) == counts_before
+    assert conn.execute("SELECT COUNT(*) FROM personas").fetchone()[0] == 5
+    if layer._fts_enabled:
+        _assert_fts_in_sync(conn)
+        assert _fts_ids(conn, "step") == {"s4"}
+
+
+def test_step_count_follows_insert_delete_and_move(conn):
+    conn.execute("INSERT INTO steps (id, thread_id, output) VALUES ('s4', 't4', 'x')")
+    conn.execute("INSERT INTO steps (id, thread_id, output) VALUES ('s5', 't4', 'y')")
+    assert _step_counts(conn)["t4"] == 2
+
+    conn.execute("DELETE FROM steps WHERE id = 's1'")
+    assert _step_counts(conn)["t1"] == 1
+
+    conn.execute("UPDATE steps SET thread_id = 't3' WHERE id = 's5'")
+    counts = _step_counts(conn)
+    assert (counts["t3"], counts["t4"]) == (1, 1)
+
+    # thread_id以外の更新ではカウントが変わらない
+    conn.execute("UPDATE steps SET output = 'changed' WHERE id = 's4'")
+    assert _step_counts(conn) == counts
+
+
+def test_fts_backfills_existing_steps(layer, conn):
+    _require_fts(layer)
+    _assert_fts_in_sync(conn)
+    assert _fts_ids(conn, "hello") == {"s1"}
+    assert _fts_ids(conn, "legacy") == {"s3"}
+
+
+def test_fts_stays_in_sync_after_update_and_delete(layer, conn):
+    _require_fts(layer)
+    conn.execute("UPDATE steps SET output = 'goodbye world' WHERE id = 's1'")
+    assert _fts_ids(conn, "hello") == set()
+    assert _fts_ids(conn, "goodbye") == {"s1"}
+
+    conn.execute("DELETE FROM steps WHERE id = 's2'")
+    assert _fts_ids(conn, "another") == set()
+
+    conn.execute("INSERT INTO steps (id, thread_id, output) VALUES ('s6', 't1', 'brand new')")
+    assert _fts_ids(conn, "brand") == {"s6"}
+    _assert_fts_in_sync(conn)
@@ -0,0 +1,46 @@
+"""
+utils.json_helperのBLOB形式（zlib圧縮）と従来のTEXT JSONの読み込みのテスト
+"""
+
+import json
+
+import pytest
+
+from utils import json_helper
+
+
+@pytest.fixture(params=[True, False], ids=["orjson", "stdlib"])
+def backend(request, monkeypatch):
+    """orjsonあり・なし（標準json）の両方で実行する"""
+    if request.param and not json_helper.ORJSON_AVAILABLE:
+        pytest.skip("orjsonが利用できません")
+    monkeypatch.setattr(json_helper, "ORJSON_AVAILABLE", request.param)
+    return request.param
+
+
+def test_small_blob_is_plain_json(backend):
+    value = {"a": 1, "text": "こんにちは"}
+    blob = json_helper.dumps_blob(value)
+    assert not blob.startswith(json_helper._COMPRESSED_MAGIC)
+    assert json.loads(blob) == value
+    assert json_helper.loads_blob(blob) == value
+
+
+def test_large_blob_is_compressed_and_round_trips(backend):
+    value = {"output": "応答テキスト" * 500, "items": list(range(200))}
+    blob = json_helper.dumps_blob(value)
+    assert blob.startswith(json_helper._COMPRESSED_MAGIC)
+    assert len(blob) < len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+    assert json_helper.loads_blob(blob) == value
+
+
+def test_loads_blob_reads_legacy_text_json(backend):
+    value = {"legacy": True, "name": "従来形式"}
+    text = json.dumps(value, ensure_ascii=False)
+    assert json_helper.loads_blob(text) == value
+    assert json_helper.loads_blob(text.encode("utf-8")) == value
+
+
+def test_loads_blob_rejects_malformed_json(backend):
+    with pytest.raises(json_helper.JSONDecodeError):
+        json_helper.loads_blob("{not json")
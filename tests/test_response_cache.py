@@ -0,0 +1,86 @@
+"""
+utils.response_cacheのインメモリLRU＋TTLキャッシュのテスト
+"""
+
+import pytest
+
+from utils import response_cache
+from utils.response_cache import ResponseCache, ResponseCacheStore
+
+
+class _FakeClock:
+    """time.monotonic/time.timeを手動で進められる時計"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _FakeClock()
+    monkeypatch.setattr(response_cache, "time", clock)
+    return clock
+
+
+@pytest.mark.parametrize("temperature, expected", [(0, True), (0.0, True), (None, False), (0.7, False)])
+def test_is_cacheable_requires_explicit_zero_temperature(temperature, expected):
+    assert ResponseCache.is_cacheable(temperature) is expected
+
+
+def test_make_key_ignores_stream():
+    params = {"model": "gpt-4o-mini", "input": "こんにちは", "temperature": 0}
+    assert ResponseCache.make_key({**params, "stream": True}) == ResponseCache.make_key(params)
+    assert ResponseCache.make_key({**params, "stream": False}) == ResponseCache.make_key(params)
+    assert ResponseCache.make_key({**params, "input": "別の入力"}) != ResponseCache.make_key(params)
+
+
+def test_lru_evicts_least_recently_used(clock):
+    cache = ResponseCache(maxsize=2)
+    cache.set("a", {"output_text": "A"})
+    cache.set("b", {"output_text": "B"})
+    assert cache.get("a") == {"output_text": "A"}  # aを最近使ったものにする
+
+    cache.set("c", {"output_text": "C"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"output_text": "A"}
+    assert cache.get("c") == {"output_text": "C"}
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResponseCache(ttl=60)
+    cache.set("k", {"output_text": "x"})
+
+    clock.now += 59
+    assert cache.get("k") == {"output_text": "x"}
+
+    clock.now += 2
+    assert cache.get("k") is None
+    assert "k" not in cache._entries
+
+
+def test_get_returns_copy(clock):
+    cache = ResponseCache()
+    cache.set("k", {"output_text": "x"})
+    cache.get("k")["output_text"] = "changed"
+    assert cache.get("k") == {"output_text": "x"}
+
+
+def test_promoted_entry_keeps_remaining_ttl(clock, tmp_path):
+    store = ResponseCacheStore(str(tmp_path / "response_cache.db"), ttl=60)
+    ResponseCache(ttl=60, store=store).set("k", {"output_text": "x"})
+
+    clock.now += 50
+    fresh = ResponseCache(ttl=60, store=store)  # 再起動後（メモリは空）
+    assert fresh.get("k") == {"output_text": "x"}
+    assert "k" in fresh._entries
+
+    # メモリに載せた時点から新たに60秒ではなく、保存からの60秒で期限切れになる
+    clock.now += 11
+    assert fresh.get("k") is None
@@ -0,0 +1,99 @@
+"""
+utils.tools_configの遅延書き込み（デバウンス）のテスト
+"""
+
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.tools_config import ToolsConfig
+
+
+class _FirstTaskDelayedExecutor(ThreadPoolExecutor):
+    """最初に投入されたタスクだけ遅らせ、後のタスクが先に完了する状況を作る"""
+
+    def __init__(self, delay: float):
+        super().__init__(max_workers=4)
+        self._delay = delay
+        self._first = True
+        self._lock = threading.Lock()
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self._lock:
+            delay, self._first = (self._delay if self._first else 0), False
+
+        def run():
+            time.sleep(delay)
+            return fn(*args, **kwargs)
+
+        return super().submit(run)
+
+
+def _read_config(tools_config: ToolsConfig):
+    with open(tools_config.config_file, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_overlapping_flushes_keep_newest_config(tmp_path):
+    tools_config = ToolsConfig(str(tmp_path / "tools_config.json"))
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        executor = _FirstTaskDelayedExecutor(delay=0.3)
+        loop.set_default_executor(executor)
+
+        tools_config.update_setting("max_search_results", 1)
+        tools_config._flush_later()  # 遅れて完了する古い世代の書き込み
+        tools_config.update_setting("max_search_results", 2)
+        tools_config._flush_later()  # 先に完了する新しい世代の書き込み
+
+        await asyncio.sleep(0.5)
+        executor.shutdown(wait=True)
+
+    asyncio.run(main())
+
+    assert _read_config(tools_config)["settings"]["max_search_results"] == 2
+    reloaded = ToolsConfig(tools_config.config_file)
+    assert reloaded.get_setting("max_search_results") == 2
+
+
+def test_failed_background_write_is_retried(tmp_path, monkeypatch):
+    tools_config = ToolsConfig(str(tmp_path / "tools_config.json"))
+    monkeypatch.setattr(ToolsConfig, "SAVE_DEBOUNCE_SECONDS", 0.01)
+    original_write = ToolsConfig._write_config
+    failures = []
+
+    def flaky_write(self, *args, **kwargs):
+        if not failures:
+            failures.append(True)
+            raise OSError("disk full")
+        return original_write(self, *args, **kwargs)
+
+    monkeypatch.setattr(ToolsConfig, "_write_config", flaky_write)
+
+    async def main():
+        tools_config.update_setting("max_search_results", 7)
+        for _ in range(100):
+            await asyncio.sleep(0.02)
+            if failures and not tools_config._dirty and tools_config._flush_handle is None:
+                break
+
+    asyncio.run(main())
+
+    assert failures
+    assert not tools_config._dirty
+    assert _read_config(tools_config)["settings"]["max_search_results"] == 7
+
+
+def test_enable_all_tools_saves_enabled_flag_without_tools(tmp_path):
+    tools_config = ToolsConfig(str(tmp_path / "tools_config.json"))
+    tools_config.config["tools"] = {}
+    tools_config.update_enabled(False)
+    tools_config.flush()
+
+    tools_config.enable_all_tools()
+    tools_config.flush()
+
+    assert _read_config(tools_config)["enabled"] is True
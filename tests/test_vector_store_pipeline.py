@@ -0,0 +1,82 @@
+"""
+VectorStoreHandler.upload_and_add_pipelineのテスト
+アップロードと追加はAPIを呼ばない偽のハンドラーで置き換える
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from utils.vector_store_handler import VectorStoreHandler
+
+
+class _FakeHandler:
+    """upload_and_add_pipelineが使うメソッドだけを持つ偽のハンドラー"""
+
+    def __init__(self, fail_uploads=(), raise_uploads=(), fail_adds=()):
+        self.fail_uploads = set(fail_uploads)
+        self.raise_uploads = set(raise_uploads)
+        self.fail_adds = set(fail_adds)
+        self.add_calls = []
+
+    async def process_uploaded_file(self, file):
+        await asyncio.sleep(0)
+        if file.name in self.raise_uploads:
+            raise RuntimeError("upload error")
+        if file.name in self.fail_uploads:
+            return None
+        return f"file-{file.name}"
+
+    async def add_file_to_vector_store(self, vector_store_id, file_id):
+        return await self.add_files_to_vector_store(vector_store_id, [file_id])
+
+    async def add_files_to_vector_store(self, vector_store_id, file_ids):
+        self.add_calls.append(list(file_ids))
+        await asyncio.sleep(0)
+        return not self.fail_adds.intersection(file_ids)
+
+
+def _files(*names):
+    return [SimpleNamespace(name=name) for name in names]
+
+
+def _run(handler, files, **kwargs):
+    pipeline = VectorStoreHandler.upload_and_add_pipeline(handler, "vs_test", files, **kwargs)
+    return asyncio.run(asyncio.wait_for(pipeline, timeout=5))
+
+
+@pytest.mark.parametrize("add_concurrency", [1, 3])
+def test_all_uploads_succeed(add_concurrency):
+    handler = _FakeHandler()
+    ids, failed = _run(handler, _files("a", "b", "c", "d"), add_concurrency=add_concurrency)
+
+    assert sorted(ids) == ["file-a", "file-b", "file-c", "file-d"]
+    assert failed == []
+    # 各ファイルはちょうど1回だけ追加される
+    added = [file_id for call in handler.add_calls for file_id in call]
+    assert sorted(added) == sorted(ids)
+
+
+def test_failed_uploads_are_reported_by_name():
+    handler = _FakeHandler(fail_uploads={"b"}, raise_uploads={"c"})
+    ids, failed = _run(handler, _files("a", "b", "c", "d"))
+
+    assert sorted(ids) == ["file-a", "file-d"]
+    assert sorted(failed) == ["b", "c"]
+
+
+def test_failed_add_reports_every_file_in_the_batch():
+    handler = _FakeHandler(fail_adds={"file-b"})
+    ids, failed = _run(handler, _files("a", "b", "c"), add_concurrency=1)
+
+    failed_batch = next(call for call in handler.add_calls if "file-b" in call)
+    assert sorted(failed) == sorted(file_id.removeprefix("file-") for file_id in failed_batch)
+    assert sorted(ids + failed_batch) == ["file-a", "file-b", "file-c"]
+
+
+@pytest.mark.parametrize("add_concurrency", [1, 6])
+def test_empty_file_list_does_not_hang(add_concurrency):
+    handler = _FakeHandler()
+    assert _run(handler, [], add_concurrency=add_concurrency) == ([], [])
+    assert handler.add_calls == []
@@ -3,10 +3,67 @@
 統計データをHTML/CSS/JSで可視化
 """
 
+from collections import defaultdict
 from typing import List, Dict, Any
+import html
 import json
 
 
+# 繰り返し描画するHTML断片はモジュール読み込み時に一度だけ用意し、呼び出しごとには値の埋め込みのみ行う
+# テンプレートはformatで値を埋め込むだけでエスケープしないため、ユーザー由来の文字列
+# （ペルソナ名など）は埋め込む関数側でhtml.escapeする（_create_usage_bar_chartのラベル等）
+
+_BAR_CHART_HEAD = """
+            <div style="background: white; border-radius: 12px; padding: 24px; margin-bottom: 24px; box-shadow: 0 2px 8px rgba(0,0,0,0.1);">
+                <h3 style="margin-top: 0; color: #333;">{title}</h3>
+                <div style="display: grid; gap: 12px;">
+        """
+
+_BAR_CHART_ROW = """
+                <div style="display: flex; align-items: center; gap: 12px;">
+                    <div style="min-width: {label_width}px; font-weight: 500;">{label}</div>
+                    <div style="flex: 1; background: #f0f0f0; border-radius: 8px; overflow: hidden;">
+                        <div style="height: 24px; background: {color}; width: {percentage}%; display: flex; align-items: center; justify-content: flex-end; padding-right: 8px; color: white; font-size: 12px; font-weight: 500;">
+                            {percentage:.1f}%
+                        </div>
+                    </div>
+                    <div style="min-width: 100px; text-align: right;">
+                        <div style="font-weight: 500;">${cost:.4f}</div>
+                        <div style="font-size: 12px; color: #666;">{count} requests</div>
+                    </div>
+                </div>
+            """
+
+_BAR_CHART_TAIL = """
+                </div>
+            </div>
+        """
+
+_TABLE_HEAD = """
+        <div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif;">
+            {title_html}
+            <table style="width: 100%; border-collapse: collapse; font-size: 14px;">
+                <thead>
+                    <tr style="background: #f8f9fa;">
+        """
+
+_TABLE_TH = '<th style="padding: 8px 12px; border: 1px solid #dee2e6; text-align: left;">{}</th>'
+
+_TABLE_HEAD_END = """
+                    </tr>
+                </thead>
+                <tbody>
+        """
+
+_TABLE_TD = '<td style="padding: 8px 12px; border: 1px solid #dee2e6;">{}</td>'
+
+_TABLE_TAIL = """
+                </tbody>
+            </table>
+        </div>
+        """
+
+
 class ChartHelper:
     """チャート生成の共通ヘルパークラス"""
     
@@ -19,7 +76,7 @@ class ChartHelper:
         daily_usage = summary_data.get("daily_usage", [])
         period = summary_data.get("period", {})
         
-        html = f"""
+        out = f"""
         <div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; max-width: 1200px;">
             <h2>📊 使用量ダッシュボード</h2>
             <p style="color: #666; margin-bottom: 24px;">
@@ -52,102 +109,58 @@ class ChartHelper:
         
         # モデル別使用量チャート
         if model_usage:
-            html += ChartHelper._create_model_usage_chart(model_usage)
+            out += ChartHelper._create_model_usage_chart(model_usage)
         
         # ペルソナ別使用量チャート
         if persona_usage:
-            html += ChartHelper._create_persona_usage_chart(persona_usage)
+            out += ChartHelper._create_persona_usage_chart(persona_usage)
         
         # 日別使用量チャート
         if daily_usage:
-            html += ChartHelper._create_daily_usage_chart(daily_usage)
+            out += ChartHelper._create_daily_usage_chart(daily_usage)
         
-        html += "</div>"
-        return html
+        out += "</div>"
+        return out
     
     @staticmethod
     def _create_model_usage_chart(model_usage: List[Dict]) -> str:
         """モデル別使用量チャート"""
-        if not model_usage:
-            return ""
-        
-        total_cost = sum(item["cost"] for item in model_usage)
-        
-        html = """
-            <div style="background: white; border-radius: 12px; padding: 24px; margin-bottom: 24px; box-shadow: 0 2px 8px rgba(0,0,0,0.1);">
-                <h3 style="margin-top: 0; color: #333;">🤖 モデル別使用量</h3>
-                <div style="display: grid; gap: 12px;">
-        """
-        
-        colors = ["#4facfe", "#667eea", "#f093fb", "#fa709a", "#fee140"]
-        
-        for i, item in enumerate(model_usage[:5]):  # 上位5モデル
-            percentage = (item["cost"] / total_cost * 100) if total_cost > 0 else 0
-            color = colors[i % len(colors)]
-            
-            html += f"""
-                <div style="display: flex; align-items: center; gap: 12px;">
-                    <div style="min-width: 120px; font-weight: 500;">{item['model']}</div>
-                    <div style="flex: 1; background: #f0f0f0; border-radius: 8px; overflow: hidden;">
-                        <div style="height: 24px; background: {color}; width: {percentage}%; display: flex; align-items: center; justify-content: flex-end; padding-right: 8px; color: white; font-size: 12px; font-weight: 500;">
-                            {percentage:.1f}%
-                        </div>
-                    </div>
-                    <div style="min-width: 100px; text-align: right;">
-                        <div style="font-weight: 500;">${item['cost']:.4f}</div>
-                        <div style="font-size: 12px; color: #666;">{item['count']} requests</div>
-                    </div>
-                </div>
-            """
-        
-        html += """
-                </div>
-            </div>
-        """
-        
-        return html
+        return ChartHelper._create_usage_bar_chart(
+            model_usage, "🤖 モデル別使用量", "model", 120,
+            ["#4facfe", "#667eea", "#f093fb", "#fa709a", "#fee140"]
+        )
     
     @staticmethod
     def _create_persona_usage_chart(persona_usage: List[Dict]) -> str:
         """ペルソナ別使用量チャート"""
-        if not persona_usage:
+        return ChartHelper._create_usage_bar_chart(
+            persona_usage, "🎭 ペルソナ別使用量", "persona", 150,
+            ["#764ba2", "#f5576c", "#00f2fe", "#fee140", "#4facfe"]
+        )
+    
+    @staticmethod
+    def _create_usage_bar_chart(
+        usage: List[Dict], title: str, label_key: str, label_width: int, colors: List[str]
+    ) -> str:
+        """コスト比率の横棒グラフ（上位5件）"""
+        if not usage:
             return ""
         
-        total_cost = sum(item["cost"] for item in persona_usage)
+        total_cost = sum(item["cost"] for item in usage)
         
-        html = """
-            <div style="background: white; border-radius: 12px; padding: 24px; margin-bottom: 24px; box-shadow: 0 2px 8px rgba(0,0,0,0.1);">
-                <h3 style="margin-top: 0; color: #333;">🎭 ペルソナ別使用量</h3>
-                <div style="display: grid; gap: 12px;">
-        """
-        
-        colors = ["#764ba2", "#f5576c", "#00f2fe", "#fee140", "#4facfe"]
-        
-        for i, item in enumerate(persona_usage[:5]):  # 上位5ペルソナ
+        parts = [_BAR_CHART_HEAD.format(title=title)]
+        for i, item in enumerate(usage[:5]):
             percentage = (item["cost"] / total_cost * 100) if total_cost > 0 else 0
-            color = colors[i % len(colors)]
-            
-            html += f"""
-                <div style="display: flex; align-items: center; gap: 12px;">
-                    <div style="min-width: 150px; font-weight: 500;">{item['persona']}</div>
-                    <div style="flex: 1; background: #f0f0f0; border-radius: 8px; overflow: hidden;">
-                        <div style="height: 24px; background: {color}; width: {percentage}%; display: flex; align-items: center; justify-content: flex-end; padding-right: 8px; color: white; font-size: 12px; font-weight: 500;">
-                            {percentage:.1f}%
-                        </div>
-                    </div>
-                    <div style="min-width: 100px; text-align: right;">
-                        <div style="font-weight: 500;">${item['cost']:.4f}</div>
-                        <div style="font-size: 12px; color: #666;">{item['count']} requests</div>
-                    </div>
-                </div>
-            """
-        
-        html += """
-                </div>
-            </div>
-        """
-        
-        return html
+            parts.append(_BAR_CHART_ROW.format_map(defaultdict(str,
+                label=html.escape(str(item[label_key])),
+                label_width=label_width,
+                color=colors[i % len(colors)],
+                percentage=percentage,
+                cost=item["cost"],
+                count=item["count"],
+            )))
+        parts.append(_BAR_CHART_TAIL)
+        return "".join(parts)
     
     @staticmethod
     def _create_daily_usage_chart(daily_usage: List[Dict]) -> str:
@@ -158,7 +171,7 @@ class ChartHelper:
         max_cost = max(item["cost"] for item in daily_usage) if daily_usage else 1
         max_requests = max(item["requests"] for item in daily_usage) if daily_usage else 1
         
-        html = """
+        out = """
             <div style="background: white; border-radius: 12px; padding: 24px; margin-bottom: 24px; box-shadow: 0 2px 8px rgba(0,0,0,0.1);">
                 <h3 style="margin-top: 0; color: #333;">📈 日別使用量推移</h3>
                 <div style="display: grid; gap: 8px; padding: 16px 0;">
@@ -168,7 +181,7 @@ class ChartHelper:
             cost_height = (item["cost"] / max_cost * 60) if max_cost > 0 else 0
             requests_height = (item["requests"] / max_requests * 60) if max_requests > 0 else 0
             
-            html += f"""
+            out += f"""
                 <div style="display: flex; align-items: end; gap: 8px; min-height: 80px;">
                     <div style="min-width: 80px; font-size: 12px; color: #666;">{item['date'][5:]}</div>
                     <div style="flex: 1; display: flex; align-items: end; gap: 4px;">
@@ -182,7 +195,7 @@ class ChartHelper:
                 </div>
             """
         
-        html += """
+        out += """
                 </div>
                 <div style="display: flex; gap: 20px; font-size: 12px; color: #666; margin-top: 16px;">
                     <div style="display: flex; align-items: center; gap: 6px;">
@@ -197,7 +210,7 @@ class ChartHelper:
             </div>
         """
         
-        return html
+        return out
     
     @staticmethod
     def create_vector_store_dashboard(vs_summary: Dict[str, Any]) -> str:
@@ -218,7 +231,7 @@ class ChartHelper:
         total_files = sum(item["total_files"] for item in vs_usage)
         total_size = sum(item["total_size_mb"] for item in vs_usage)
         
-        html = f"""
+        out = f"""
         <div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif;">
             <h3>🗂️ ベクトルストア使用状況</h3>
             <p style="color: #666; margin-bottom: 24px;">
@@ -259,7 +272,7 @@ class ChartHelper:
             color = vs_type_colors.get(item["vs_type"], "#999")
             percentage = (item["count"] / total_operations * 100) if total_operations > 0 else 0
             
-            html += f"""
+            out += f"""
                 <div style="display: flex; align-items: center; gap: 12px; padding: 8px 0; border-bottom: 1px solid #f0f0f0;">
                     <div style="min-width: 80px; font-size: 12px; color: {color}; font-weight: 500;">
                         {item['vs_type'].title()}
@@ -279,50 +292,33 @@ class ChartHelper:
                 </div>
             """
         
-        html += """
+        out += """
                 </div>
             </div>
         </div>
         """
         
-        return html
+        return out
     
     @staticmethod
     def create_simple_table(data: List[Dict], title: str = "") -> str:
         """シンプルなテーブル形式でのデータ表示"""
         if not data:
-            return f"<p>{title}: データなし</p>"
+            return f"<p>{html.escape(title)}: データなし</p>"
         
         headers = list(data[0].keys()) if data else []
         
-        html = f"""
-        <div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif;">
-            {f'<h4>{title}</h4>' if title else ''}
-            <table style="width: 100%; border-collapse: collapse; font-size: 14px;">
-                <thead>
-                    <tr style="background: #f8f9fa;">
-        """
-        
-        for header in headers:
-            html += f'<th style="padding: 8px 12px; border: 1px solid #dee2e6; text-align: left;">{header}</th>'
-        
-        html += """
-                    </tr>
-                </thead>
-                <tbody>
-        """
-        
+        parts = [_TABLE_HEAD.format(
+            title_html=f"<h4>{html.escape(title)}</h4>" if title else ""
+        )]
+        parts.extend(_TABLE_TH.format(html.escape(str(header))) for header in headers)
+        parts.append(_TABLE_HEAD_END)
         for row in data:
-            html += '<tr>'
-            for header in headers:
-                value = row.get(header, '')
-                html += f'<td style="padding: 8px 12px; border: 1px solid #dee2e6;">{value}</td>'
-            html += '</tr>'
-        
-        html += """
-                </tbody>
-            </table>
-        </div>
-        """
-        
-        return html
\ No newline at end of file
+            parts.append("<tr>")
+            parts.extend(
+                _TABLE_TD.format(html.escape(str(row.get(header, ""))))
+                for header in headers
+            )
+            parts.append("</tr>")
+        parts.append(_TABLE_TAIL)
+        return "".join(parts)
@@ -14,6 +14,11 @@ from openai import OpenAI
 import httpx
 import asyncio
 import json
+import time
+
+
+# 接続テスト結果を再利用する期間（秒）
+CONNECTION_PROBE_TTL = 30
 
 
 class ConfigManager:
@@ -21,6 +26,9 @@ class ConfigManager:
     
     def __init__(self):
         """初期化"""
+        # 接続テストの同時実行を1つにまとめるためのロックと直近の結果（時刻, 設定キー, 結果）
+        self._probe_lock = asyncio.Lock()
+        self._probe_result: Tuple[float, Optional[Tuple], Optional[Tuple]] = (0.0, None, None)
         self.env_file = find_dotenv() or Path(".env")
         if not self.env_file:
             # .envファイルが存在しない場合、.env.exampleからコピー
@@ -203,6 +211,38 @@ class ConfigManager:
     async def test_connection(self) -> Tuple[bool, str, Optional[List[str]]]:
         """
         OpenAI API接続テスト
+        同時に呼ばれた場合は実行中のテストの結果を待ち、直近の結果は一定時間再利用する
+        （APIキー・プロキシ設定が変わった場合は再テストする）
+        
+        Returns:
+            Tuple[bool, str, Optional[List[str]]]: 
+                - 成功/失敗のフラグ
+                - メッセージ
+                - 利用可能なモデルのリスト（成功時のみ）
+        """
+        probe_key = (self.get_api_key(), tuple(sorted(self.get_proxy_settings().items())))
+        
+        def _recent_result():
+            probed_at, key, result = self._probe_result
+            if key == probe_key and time.monotonic() - probed_at < CONNECTION_PROBE_TTL:
+                return result
+            return None
+        
+        result = _recent_result()
+        if result is not None:
+            return result
+        
+        async with self._probe_lock:
+            # ロック待ちの間に他の呼び出しがテストを終えていればその結果を使う
+            result = _recent_result()
+            if result is None:
+                result = await self._probe_connection()
+                self._probe_result = (time.monotonic(), probe_key, result)
+            return result
+    
+    async def _probe_connection(self) -> Tuple[bool, str, Optional[List[str]]]:
+        """
+        OpenAI API接続テストを実行（モデル一覧を取得）
         
         Returns:
             Tuple[bool, str, Optional[List[str]]]: 
@@ -0,0 +1,84 @@
+"""
+OpenAIクライアント用の共有httpxクライアント
+ハンドラーごと・APIキー更新ごとに接続を作り直さず、TLSセッションと接続プールを再利用する
+HTTP/2を使うには h2 が必要（pip install "httpx[http2]"）
+"""
+
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+try:
+    import h2  # noqa: F401  httpxのHTTP/2サポートに必要
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# 同時セッションのストリーミングを想定した接続プール設定
+DEFAULT_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=30)
+DEFAULT_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+# プロキシ設定ごとの共有クライアント
+_async_clients: Dict[Tuple, httpx.AsyncClient] = {}
+_sync_clients: Dict[Tuple, httpx.Client] = {}
+
+
+def _proxy_key(proxies: Optional[Dict[str, str]]) -> Tuple:
+    """プロキシ設定をキャッシュキーに変換"""
+    return tuple(sorted((proxies or {}).items()))
+
+
+def _mounts(proxies: Optional[Dict[str, str]], transport_class) -> Optional[Dict[str, object]]:
+    """スキームごとのプロキシ付きトランスポートを作成（httpx 0.28以降はproxies引数がないため）"""
+    if not proxies:
+        return None
+    return {
+        scheme: transport_class(proxy=url, http2=HTTP2_AVAILABLE, limits=DEFAULT_LIMITS)
+        for scheme, url in proxies.items()
+    }
+
+
+def get_async_http_client(proxies: Optional[Dict[str, str]] = None) -> httpx.AsyncClient:
+    """
+    共有の非同期httpxクライアントを取得（プロキシ設定ごとに1つ）
+
+    Args:
+        proxies: {"http://": URL, "https://": URL} 形式のプロキシ設定
+
+    Returns:
+        HTTP/2（利用可能な場合）と接続プールを有効にしたAsyncClient
+    """
+    key = _proxy_key(proxies)
+    client = _async_clients.get(key)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=DEFAULT_LIMITS,
+            timeout=DEFAULT_TIMEOUT,
+            mounts=_mounts(proxies, httpx.AsyncHTTPTransport),
+        )
+        _async_clients[key] = client
+    return client
+
+
+def get_http_client(proxies: Optional[Dict[str, str]] = None) -> httpx.Client:
+    """
+    共有の同期httpxクライアントを取得（プロキシ設定ごとに1つ）
+
+    Args:
+        proxies: {"http://": URL, "https://": URL} 形式のプロキシ設定
+
+    Returns:
+        HTTP/2（利用可能な場合）と接続プールを有効にしたClient
+    """
+    key = _proxy_key(proxies)
+    client = _sync_clients.get(key)
+    if client is None or client.is_closed:
+        client = httpx.Client(
+            http2=HTTP2_AVAILABLE,
+            limits=DEFAULT_LIMITS,
+            timeout=DEFAULT_TIMEOUT,
+            mounts=_mounts(proxies, httpx.HTTPTransport),
+        )
+        _sync_clients[key] = client
+    return client
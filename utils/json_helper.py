@@ -0,0 +1,68 @@
+"""
+JSONシリアライズの共通ヘルパー
+orjsonが利用可能ならC実装で高速に処理し、なければ標準のjsonにフォールバック
+"""
+
+import json
+import zlib
+from typing import Any
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+# orjson.JSONDecodeErrorはjson.JSONDecodeErrorのサブクラスなので両方をこれで捕捉できる
+JSONDecodeError = json.JSONDecodeError
+
+# BLOB保存時、このサイズ以上のJSONはzlibで圧縮する
+BLOB_COMPRESS_THRESHOLD = 1024
+# 圧縮済みBLOBの先頭に付けるマーカー（JSONは"{"や"["で始まるため衝突しない）
+_COMPRESSED_MAGIC = b"ZJS1"
+
+
+def dumps(obj: Any, sort_keys: bool = False) -> str:
+    """オブジェクトをJSON文字列に変換（sort_keys=Trueでキー順を正規化）"""
+    if ORJSON_AVAILABLE:
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, option=option).decode()
+    return json.dumps(obj, ensure_ascii=False, sort_keys=sort_keys)
+
+
+def loads(data: Any) -> Any:
+    """JSON文字列（またはbytes）をオブジェクトに変換"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_pretty(obj: Any) -> bytes:
+    """設定ファイル向けに2スペースインデントのUTF-8バイト列に変換"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+def dumps_blob(obj: Any) -> bytes:
+    """
+    SQLiteのBLOBカラム向けにオブジェクトをコンパクトなバイト列に変換
+    大きなペイロードはzlibで圧縮し、マーカーを付けて保存する
+    """
+    if ORJSON_AVAILABLE:
+        raw = orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    else:
+        raw = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(raw) >= BLOB_COMPRESS_THRESHOLD:
+        return _COMPRESSED_MAGIC + zlib.compress(raw, 3)
+    return raw
+
+
+def loads_blob(data: Any) -> Any:
+    """dumps_blobで保存した値（または従来のTEXT JSON）をオブジェクトに変換"""
+    if isinstance(data, bytes) and data.startswith(_COMPRESSED_MAGIC):
+        data = zlib.decompress(data[len(_COMPRESSED_MAGIC):])
+    return loads(data)
@@ -0,0 +1,187 @@
+"""
+AI応答のキャッシュ
+同じモデル・入力・ツール構成で温度0（決定的）のリクエストは、前回の応答を再利用して
+API呼び出しを省略する
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+from .json_helper import dumps, dumps_blob, loads_blob
+from .logger import app_logger
+
+
+class ResponseCacheStore:
+    """
+    応答キャッシュのSQLite永続化層（プロセス再起動後やワーカー間でも再利用する）
+    接続は初回アクセス時に開く
+    """
+
+    def __init__(self, db_path: str = ".chainlit/response_cache.db", ttl: float = 6 * 3600):
+        """
+        初期化
+
+        Args:
+            db_path: キャッシュDBのパス
+            ttl: 応答の有効期間（秒）
+        """
+        self.db_path = db_path
+        self.ttl = ttl
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """接続を取得（初回のみテーブル作成と期限切れ行の削除を行う）"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS resp (key TEXT PRIMARY KEY, value BLOB, created REAL)"
+            )
+            conn.execute("DELETE FROM resp WHERE created < ?", (time.time() - self.ttl,))
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """保存済みの応答と保存時刻（UNIX時刻）を取得（期限切れ・読み込み失敗はNone）"""
+        try:
+            with self._lock:
+                row = self._connection().execute(
+                    "SELECT value, created FROM resp WHERE key = ?", (key,)
+                ).fetchone()
+            if row is None or time.time() - row[1] > self.ttl:
+                return None
+            return loads_blob(row[0]), row[1]
+        except (sqlite3.Error, ValueError) as e:
+            app_logger.debug(f"応答キャッシュDBの読み込みエラー: {e}")
+            return None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """応答を保存（大きな応答はzlib圧縮される）"""
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO resp (key, value, created) VALUES (?, ?, ?)",
+                    (key, dumps_blob(value), time.time()),
+                )
+                conn.commit()
+        except (sqlite3.Error, TypeError) as e:
+            app_logger.debug(f"応答キャッシュDBの書き込みエラー: {e}")
+
+    def clear(self) -> None:
+        """保存済みの応答を全て削除"""
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute("DELETE FROM resp")
+                conn.commit()
+        except sqlite3.Error as e:
+            app_logger.debug(f"応答キャッシュDBの削除エラー: {e}")
+
+
+class ResponseCache:
+    """LRU + TTLのインメモリ応答キャッシュ（storeを指定するとSQLiteを2次キャッシュに使う）"""
+
+    def __init__(self, maxsize: int = 512, ttl: float = 6 * 3600, store: Optional[ResponseCacheStore] = None):
+        """
+        初期化
+
+        Args:
+            maxsize: 保持する応答の最大数（超えたら最も古く使われたものから破棄）
+            ttl: 応答の有効期間（秒）
+            store: 永続化層（メモリにない場合に参照する）
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.store = store
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._pending_writes: Set[asyncio.Task] = set()  # 完了を待たない永続化タスク（GC防止用に参照を保持）
+
+    @staticmethod
+    def is_cacheable(temperature: Optional[float]) -> bool:
+        """温度0を明示した決定的なリクエストのみキャッシュ対象（未指定はサーバー既定の1.0になる）"""
+        return temperature == 0
+
+    @staticmethod
+    def make_key(params: Dict[str, Any]) -> str:
+        """
+        リクエストパラメータから正規化したキャッシュキーを作成
+        stream指定の違いは応答内容に影響しないためキーに含めない
+        """
+        canonical = {k: v for k, v in params.items() if k != "stream"}
+        payload = dumps(canonical, sort_keys=True).encode("utf-8")
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+    def _get_memory(self, key: str) -> Optional[Dict[str, Any]]:
+        """メモリ上のLRUから応答を取得（期限切れは破棄してNone）"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            created, value = entry
+            if time.monotonic() - created <= self.ttl:
+                self._entries.move_to_end(key)
+                return dict(value)
+            del self._entries[key]
+        return None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """キャッシュから応答を取得（イベントループ外から使う同期版）"""
+        value = self._get_memory(key)
+        if value is not None or self.store is None:
+            return value
+        return self._promote(key, self.store.get(key))
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        """キャッシュから応答を取得（永続化層の読み込みはスレッドで行い、イベントループを止めない）"""
+        value = self._get_memory(key)
+        if value is not None or self.store is None:
+            return value
+        return self._promote(key, await asyncio.to_thread(self.store.get, key))
+
+    def _promote(self, key: str, stored: Optional[Tuple[Dict[str, Any], float]]) -> Optional[Dict[str, Any]]:
+        """永続化層でヒットしたものを、保存からの経過時間を引き継いでメモリにも載せる"""
+        if stored is None:
+            return None
+        value, created = stored
+        self._remember(key, value, age=max(0.0, time.time() - created))
+        return value
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """
+        応答をキャッシュに保存
+        イベントループ上では永続化層への書き込みをスレッドで実行し、完了を待たない
+        """
+        self._remember(key, value)
+        if self.store is None:
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self.store.set(key, value)
+            return
+        task = asyncio.create_task(asyncio.to_thread(self.store.set, key, dict(value)))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
+
+    def _remember(self, key: str, value: Dict[str, Any], age: float = 0.0) -> None:
+        """メモリ上のLRUに保存（ageは保存済みの応答の経過秒数。有効期限は残り時間だけになる）"""
+        self._entries[key] = (time.monotonic() - age, dict(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """キャッシュを全て破棄"""
+        self._entries.clear()
+        if self.store is not None:
+            self.store.clear()
+
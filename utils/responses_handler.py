@@ -47,15 +47,19 @@ OpenAIは2024年12月に新しいResponses APIを発表しました：
 """
 
 import os
-import json
 import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from typing import Dict, List, Optional, AsyncGenerator, Any, Union
-from openai import OpenAI, AsyncOpenAI
-import httpx
+from openai import OpenAI, AsyncOpenAI, BadRequestError, NotFoundError
 from datetime import datetime
-from .tools_config import tools_config
+from .tools_config import get_tools_config
 from .logger import app_logger  # ログシステムを追加
+from .http_client import get_async_http_client, get_http_client
+from .json_helper import JSONDecodeError, dumps, loads
 from .vector_store_handler import vector_store_handler  # ベクトルストアハンドラーを追加
+from .response_cache import ResponseCache, ResponseCacheStore
 
 # リトライ機構のインポート
 try:
@@ -74,6 +78,31 @@ except ImportError:
     TENACITY_AVAILABLE = False
 
 
+@dataclass(slots=True)
+class StreamChunk:
+    """ストリーミングのテキスト差分（トークンごとに生成されるためdictではなくslotsで軽量化）"""
+    content: str = ""
+    id: Optional[str] = None
+    cached: bool = False
+    type: str = "text_delta"
+
+
+# 前回のレスポンスIDを保持するスレッド数の上限（超えたら最も古く使われたスレッドから破棄）
+MAX_TRACKED_THREADS = 1024
+
+# タイトル生成の設定（指示文は毎回同じ文字列にしてサーバー側のプロンプトキャッシュに乗せる）
+TITLE_MODEL = "gpt-4o-mini"
+TITLE_MAX_LENGTH = 20
+# {"title": "…"}の枠と20文字の日本語タイトルが収まる出力トークン数
+TITLE_MAX_OUTPUT_TOKENS = 48
+TITLE_SYSTEM_TEMPLATE = (
+    "この会話の短く簡潔なタイトルを日本語で生成してください。"
+    '{n}文字以内で、{{"title": "タイトル"}} の形式のJSONのみを出力してください。'
+)
+_TITLE_INSTRUCTIONS = TITLE_SYSTEM_TEMPLATE.format(n=TITLE_MAX_LENGTH)
+_TITLE_PROMPT_CACHE_KEY = f"title-gen-{TITLE_MAX_LENGTH}"
+
+
 class ResponsesAPIHandler:
     """
     OpenAI Responses API管理クラス
@@ -95,9 +124,23 @@ class ResponsesAPIHandler:
         self.default_model = os.getenv("DEFAULT_MODEL", "gpt-4o-mini")
         self.client = None
         self.async_client = None
-        self.tools_config = tools_config
+        # previous_response_idで会話を継続するか（OPENAI_STATEFUL_RESPONSES=falseで無効化）
+        self.stateful = os.getenv("OPENAI_STATEFUL_RESPONSES", "true").lower() != "false"
+        # スレッドID -> 最後に受け取ったレスポンスID（呼び出し側がIDを渡さない場合に使用）
+        self._last_response_ids: "OrderedDict[str, str]" = OrderedDict()
+        # ストリーミング中の関数呼び出し引数の断片（(チャンク/アイテムID, index) -> 断片リスト）
+        self._tool_arg_chunks: Dict[tuple, List[str]] = {}
+        # created_at用タイムスタンプのキャッシュ（(10ms単位のバケット, UNIX時刻)）
+        self._ts_cache: tuple = (None, 0.0)
+        # 温度0の決定的なリクエストの応答キャッシュ（SQLiteに永続化し再起動後も再利用）
+        self.response_cache = ResponseCache(store=ResponseCacheStore())
         self._init_clients()
     
+    @property
+    def tools_config(self):
+        """Tools設定（初回参照時に読み込まれる）"""
+        return get_tools_config()
+    
     def _init_clients(self):
         """OpenAIクライアントを初期化"""
         if not self.api_key or self.api_key == "your_api_key_here":
@@ -107,33 +150,31 @@ class ResponsesAPIHandler:
         http_proxy = os.getenv("HTTP_PROXY", "")
         https_proxy = os.getenv("HTTPS_PROXY", "")
         
-        http_client = None
-        if http_proxy or https_proxy:
-            proxies = {}
-            if http_proxy:
-                proxies["http://"] = http_proxy
-            if https_proxy:
-                proxies["https://"] = https_proxy
-            http_client = httpx.Client(proxies=proxies)
+        proxies = {}
+        if http_proxy:
+            proxies["http://"] = http_proxy
+        if https_proxy:
+            proxies["https://"] = https_proxy
         
-        # 同期クライアント
+        # 同期クライアント（httpxクライアントは他のハンドラーと共有）
         self.client = OpenAI(
             api_key=self.api_key,
-            http_client=http_client
+            http_client=get_http_client(proxies)
         )
         
-        # 非同期クライアント
-        async_http_client = None
-        if http_proxy or https_proxy:
-            async_http_client = httpx.AsyncClient(proxies=proxies)
-        
+        # 非同期クライアント（HTTP/2と接続プールで同時セッションのストリーミングを多重化）
         self.async_client = AsyncOpenAI(
             api_key=self.api_key,
-            http_client=async_http_client
+            http_client=get_async_http_client(proxies)
         )
     
     def update_api_key(self, api_key: str):
-        """APIキーを更新"""
+        """
+        APIキーを更新
+        キーが変わらず初期化済みならクライアントを作り直さない（httpxの接続プールは共有のため閉じない）
+        """
+        if api_key == self.api_key and self.async_client is not None:
+            return
         self.api_key = api_key
         os.environ["OPENAI_API_KEY"] = api_key
         self._init_clients()
@@ -155,6 +196,8 @@ class ResponsesAPIHandler:
         previous_response_id: str = None,
         session: Optional[Dict] = None,  # Chainlitセッションを追加
         retry_count: int = 3,  # リトライ回数
+        thread_id: Optional[str] = None,
+        stateful: Optional[bool] = None,
         **kwargs
     ) -> AsyncGenerator[Dict, None]:
         """
@@ -178,10 +221,12 @@ class ResponsesAPIHandler:
             tool_choice: ツール選択設定
             previous_response_id: 会話継続用ID
             session: Chainlitセッション情報
+            thread_id: スレッドID（previous_response_id省略時に前回のIDを引き継ぐ）
+            stateful: previous_response_idで履歴の再送を省略するか（省略時はself.stateful）
             **kwargs: その他のパラメータ
         
         Yields:
-            ストリーミングチャンク or 完了レスポンス
+            テキスト差分（StreamChunk） or その他のイベント・完了レスポンス（dict）
         """
         if not self.async_client:
             yield {
@@ -192,6 +237,16 @@ class ResponsesAPIHandler:
         
         model = model or self.default_model
         
+        # 会話継続用IDを決定（未指定ならスレッドごとに保持している前回のIDを使用）
+        if stateful is None:
+            stateful = self.stateful
+        if not stateful:
+            previous_response_id = None
+        elif not previous_response_id and thread_id:
+            previous_response_id = self._last_response_ids.get(thread_id)
+            if previous_response_id:
+                self._last_response_ids.move_to_end(thread_id)
+        
         # メッセージ履歴から入力とシステムプロンプトを抽出
         input_content = ""
         instructions = ""
@@ -219,33 +274,16 @@ class ResponsesAPIHandler:
                     conversation_parts.append(f"{role}: {content}")
             input_content = "\n".join(conversation_parts)
         
-        # Responses APIパラメータを構築
-        response_params = {
-            "model": model,
-            "temperature": temperature,
-            "stream": stream,
-            "store": True,  # 会話継続に必要：レスポンスを保存
-            **kwargs
-        }
-        
         # inputの設定：previous_response_idがある場合は新しいメッセージのみ
         if previous_response_id:
             # 会話継続時：最新のユーザーメッセージのみを送信
             if messages and messages[-1].get("role") == "user":
-                response_params["input"] = [messages[-1]]  # 配列形式
+                api_input = [messages[-1]]  # 配列形式
             else:
-                response_params["input"] = input_content  # フォールバック
-            response_params["previous_response_id"] = previous_response_id
+                api_input = input_content  # フォールバック
         else:
             # 新しい会話開始時：全メッセージ履歴
-            response_params["input"] = messages if isinstance(messages, list) else input_content
-        
-        # instructionsを設定（システムプロンプト）
-        if instructions:
-            response_params["instructions"] = instructions
-        
-        if max_tokens:
-            response_params["max_tokens"] = max_tokens
+            api_input = messages if isinstance(messages, list) else input_content
         
         # Tools機能の設定
         tools = []
@@ -265,8 +303,21 @@ class ResponsesAPIHandler:
                         "vector_store_ids": vector_store_ids
                     })
         
-        if tools:
-            response_params["tools"] = tools
+        # Responses APIパラメータを構築（明示的な引数がkwargsより優先、Noneの項目は送らない）
+        explicit_params = {
+            "model": model,
+            "temperature": temperature,
+            "stream": True,  # 最初のトークンから返せるよう常にストリーミングで受信
+            "store": True,  # 会話継続に必要：レスポンスを保存
+            "input": api_input,
+            "previous_response_id": previous_response_id,
+            "instructions": instructions or None,  # システムプロンプト
+            "max_output_tokens": max_tokens or None,
+            "tools": tools or None,
+            "tool_choice": tool_choice if tools else None,
+        }
+        response_params = {k: v for k, v in kwargs.items() if v is not None}
+        response_params |= {k: v for k, v in explicit_params.items() if v is not None}
         
         # デバッグログを追加
         app_logger.debug(f"🔧 create_response開始", 
@@ -296,6 +347,24 @@ class ResponsesAPIHandler:
                 # tenacityが利用できない場合は直接呼び出し
                 return await self.async_client.responses.create(**response_params)
         
+        # 温度0なら同一リクエストの前回応答を再利用（キーはモデル・入力・継続IDなど）
+        # ツール付きの応答はWeb検索結果やベクトルストアの内容で変わるためキャッシュしない
+        cache_key = None
+        if ResponseCache.is_cacheable(temperature) and not response_params.get("tools"):
+            try:
+                cache_key = ResponseCache.make_key(response_params)
+            except TypeError:
+                cache_key = None  # シリアライズできない引数がある場合はキャッシュしない
+        if cache_key:
+            cached = await self.response_cache.aget(cache_key)
+            if cached is not None:
+                app_logger.debug("🔧 応答キャッシュヒット", model=model)
+                if thread_id and cached.get("response_id"):
+                    self._remember_response_id(thread_id, cached["response_id"])
+                for chunk in self._replay_cached_response(cached, stream):
+                    yield chunk
+                return
+        
         response_stream = None
         try:
             # ========================================================
@@ -310,35 +379,105 @@ class ResponsesAPIHandler:
             app_logger.debug(f"  Tools: {len(tools)} tools enabled" if tools else "  Tools: None")
             app_logger.debug(f"  Retry: {retry_count} attempts" if TENACITY_AVAILABLE else "  Retry: Disabled")
             
-            response = await call_api_with_retry()
+            try:
+                response = await call_api_with_retry()
+            except (NotFoundError, BadRequestError) as e:
+                # 保存期間切れなどでprevious_response_idが使えない場合は全履歴で再送
+                if not previous_response_id or not self._is_previous_response_error(e):
+                    raise
+                app_logger.warning(f"⚠️ previous_response_idが無効なため全履歴で再送します: {e}")
+                if thread_id:
+                    self._last_response_ids.pop(thread_id, None)
+                previous_response_id = None
+                response_params.pop("previous_response_id", None)
+                response_params["input"] = messages if isinstance(messages, list) else input_content
+                response = await call_api_with_retry()
             
-            # ストリーミングモード
-            if stream:
-                app_logger.debug("🔧 Responses APIストリーミングモード")
-                try:
-                    async for event in response:
-                        if event:  # eventがNoneでないことを確認
-                            yield self._process_response_stream_event(event)
-                except asyncio.CancelledError:
-                    app_logger.debug("⚠️ ストリーミングがキャンセルされました")
-                    # Cancelled Errorは正常な終了として扱う
-                    return
-                except GeneratorExit:
-                    app_logger.debug("⚠️ ジェネレーターが終了しました")
-                    # GeneratorExitも正常な終了として扱う
-                    return
-                finally:
-                    app_logger.debug("🔧 ストリーミング終了処理")
-                    # response_streamのクリーンアップ
-                    if response_stream and hasattr(response_stream, 'aclose'):
-                        try:
-                            await response_stream.aclose()
-                        except Exception as cleanup_error:
-                            app_logger.debug(f"⚠️ クリーンアップエラー: {cleanup_error}")
-            # 非ストリーミングモード
-            else:
-                app_logger.debug("🔧 Responses API非ストリーミングモード")
-                yield self._process_response_output(response)
+            # APIは常にストリーミングで呼び出し、届いたチャンクから順に返す
+            # stream=Falseの呼び出し元には、途中のテキストに加えて完了時に組み立てた応答全体を返す
+            app_logger.debug("🔧 Responses APIストリーミングモード" if stream
+                             else "🔧 Responses API非ストリーミングモード（内部はストリーミング）")
+            text_parts = []
+            completed_response = None
+            # この呼び出しで蓄積を始めた関数呼び出し引数のキー（途中終了時に破棄する）
+            tool_arg_keys = set()
+            try:
+                async for event in response:
+                    if not event:  # eventがNoneでないことを確認
+                        continue
+                    processed = self._process_response_stream_event(event)
+                    if processed.__class__ is StreamChunk:
+                        # テキスト差分（最も頻度の高いイベント）
+                        if processed.content:
+                            text_parts.append(processed.content)
+                        yield processed
+                        continue
+                    
+                    event_type = processed.get("type")
+                    if event_type == "function_call_arguments_delta":
+                        tool_arg_keys.add((processed["item_id"], 0))
+                    if thread_id and processed.get("response_id"):
+                        self._remember_response_id(thread_id, processed["response_id"])
+                    
+                    if event_type == "response_complete":
+                        completed_response = processed
+                        if not processed.get("output_text"):
+                            processed["output_text"] = "".join(text_parts)
+                        if cache_key:
+                            # 組み立てた全文をキャッシュ（ヒット時は1チャンクで再生）
+                            self.response_cache.set(cache_key, {
+                                "response_id": processed.get("response_id"),
+                                "output_text": processed["output_text"],
+                                "model": model,
+                            })
+                        if not stream:
+                            # 非ストリーミング形式の応答全体を返す
+                            raw_response = getattr(event, 'response', None)
+                            final = self._process_response_output(raw_response) if raw_response else {}
+                            final.update({
+                                "id": processed.get("response_id"),
+                                "response_id": processed.get("response_id"),
+                                "object": "response",
+                                "output_text": final.get("output_text") or processed["output_text"],
+                                "type": "response_complete",
+                            })
+                            final.setdefault("model", model)
+                            final.setdefault("output", [])
+                            yield final
+                            continue
+                    yield processed
+            except asyncio.CancelledError:
+                app_logger.debug("⚠️ ストリーミングがキャンセルされました")
+                # Cancelled Errorは正常な終了として扱う
+                return
+            except GeneratorExit:
+                app_logger.debug("⚠️ ジェネレーターが終了しました")
+                # GeneratorExitも正常な終了として扱う
+                return
+            finally:
+                app_logger.debug("🔧 ストリーミング終了処理")
+                # キャンセルやエラーでdoneイベントが届かなかった引数の断片を残さない
+                for key in tool_arg_keys:
+                    self._tool_arg_chunks.pop(key, None)
+                # response_streamのクリーンアップ
+                if response_stream and hasattr(response_stream, 'aclose'):
+                    try:
+                        await response_stream.aclose()
+                    except Exception as cleanup_error:
+                        app_logger.debug(f"⚠️ クリーンアップエラー: {cleanup_error}")
+            
+            if completed_response is None and not stream and text_parts:
+                # 完了イベントが届かなかった場合も、受信済みのテキストで応答を返す
+                yield {
+                    "id": None,
+                    "response_id": None,
+                    "object": "response",
+                    "output_text": "".join(text_parts),
+                    "output": [],
+                    "model": model,
+                    "created_at": self._current_timestamp(),
+                    "type": "response_complete",
+                }
         
         except asyncio.CancelledError:
             app_logger.debug("⚠️ 処理がキャンセルされました")
@@ -382,6 +521,54 @@ class ResponsesAPIHandler:
                 except Exception:
                     pass  # クリーンアップエラーは無視
     
+    def _remember_response_id(self, thread_id: str, response_id: str) -> None:
+        """スレッドの最新レスポンスIDを保存（上限を超えたら最も古く使われたスレッドから破棄）"""
+        self._last_response_ids[thread_id] = response_id
+        self._last_response_ids.move_to_end(thread_id)
+        while len(self._last_response_ids) > MAX_TRACKED_THREADS:
+            self._last_response_ids.popitem(last=False)
+    
+    @staticmethod
+    def _is_previous_response_error(error: Exception) -> bool:
+        """previous_response_idが見つからない・無効なことを示すAPIエラーか（エラーの構造化フィールドで判定）"""
+        return (
+            getattr(error, "code", None) == "previous_response_not_found"
+            or getattr(error, "param", None) == "previous_response_id"
+        )
+    
+    def _replay_cached_response(self, cached: Dict[str, Any], stream: bool) -> List[Dict[str, Any]]:
+        """キャッシュした応答を、通常の応答と同じ形式のチャンクとして返す"""
+        response_id = cached.get("response_id")
+        output_text = cached.get("output_text", "")
+        if stream:
+            return [
+                StreamChunk(content=output_text, id=response_id, cached=True),
+                {"type": "response_complete", "id": response_id, "response_id": response_id,
+                 "output_text": output_text, "cached": True},
+            ]
+        return [{
+            "id": response_id,
+            "response_id": response_id,
+            "object": "response",
+            "output_text": output_text,
+            "output": [],
+            "model": cached.get("model") or self.default_model,
+            "created_at": self._current_timestamp(),
+            "type": "response_complete",
+            "cached": True,
+        }]
+    
+    def _current_timestamp(self) -> float:
+        """
+        現在のUNIX時刻を取得（10ms単位でキャッシュし、連続する応答では時刻取得を省略する）
+        """
+        bucket = int(time.monotonic() * 100)
+        cached_bucket, timestamp = self._ts_cache
+        if bucket != cached_bucket:
+            timestamp = datetime.now().timestamp()
+            self._ts_cache = (bucket, timestamp)
+        return timestamp
+    
     def _process_stream_chunk(self, chunk) -> Dict[str, Any]:
         """ストリーミングチャンクを処理"""
         chunk_dict = {
@@ -401,59 +588,81 @@ class ResponsesAPIHandler:
                 }
                 
                 # deltaの内容を処理
-                if choice.delta:
+                delta = getattr(choice, 'delta', None)
+                if delta:
+                    delta_dict = choice_dict["delta"]
                     # コンテンツ
-                    if choice.delta.content is not None:
-                        choice_dict["delta"]["content"] = choice.delta.content
+                    content = getattr(delta, 'content', None)
+                    if content is not None:
+                        delta_dict["content"] = content
                     
                     # ロール
-                    if hasattr(choice.delta, 'role') and choice.delta.role is not None:
-                        choice_dict["delta"]["role"] = choice.delta.role
+                    role = getattr(delta, 'role', None)
+                    if role is not None:
+                        delta_dict["role"] = role
                     
                     # ツール呼び出し
-                    if hasattr(choice.delta, 'tool_calls') and choice.delta.tool_calls:
-                        choice_dict["delta"]["tool_calls"] = []
-                        for tc in choice.delta.tool_calls:
+                    tool_calls = getattr(delta, 'tool_calls', None)
+                    if tool_calls:
+                        delta_dict["tool_calls"] = []
+                        for tc in tool_calls:
                             tool_call = {
-                                "index": tc.index if hasattr(tc, 'index') else None
+                                "index": getattr(tc, 'index', None)
                             }
                             
-                            if hasattr(tc, 'id') and tc.id:
-                                tool_call["id"] = tc.id
-                            if hasattr(tc, 'type') and tc.type:
-                                tool_call["type"] = tc.type
+                            tc_id = getattr(tc, 'id', None)
+                            if tc_id:
+                                tool_call["id"] = tc_id
+                            tc_type = getattr(tc, 'type', None)
+                            if tc_type:
+                                tool_call["type"] = tc_type
                             
+                            web_search = getattr(tc, 'web_search', None)
+                            function = getattr(tc, 'function', None)
                             # Web検索ツール
-                            if hasattr(tc, 'web_search') and tc.web_search:
+                            if web_search:
                                 tool_call["web_search"] = {
-                                    "query": tc.web_search.query if hasattr(tc.web_search, 'query') else None
+                                    "query": getattr(web_search, 'query', None)
                                 }
                             
                             # ファイル検索ツール
-                            elif hasattr(tc, 'file_search') and tc.file_search:
+                            elif getattr(tc, 'file_search', None):
                                 tool_call["file_search"] = {}
                             
                             # 関数呼び出し
-                            elif hasattr(tc, 'function') and tc.function:
+                            elif function:
+                                arguments = getattr(function, 'arguments', None)
                                 tool_call["function"] = {
-                                    "name": tc.function.name if hasattr(tc.function, 'name') else None,
-                                    "arguments": tc.function.arguments if hasattr(tc.function, 'arguments') else None
+                                    "name": getattr(function, 'name', None),
+                                    "arguments": arguments
                                 }
+                                if arguments:
+                                    self._tool_arg_chunks.setdefault((chunk.id, tool_call["index"]), []).append(arguments)
                             
-                            choice_dict["delta"]["tool_calls"].append(tool_call)
+                            delta_dict["tool_calls"].append(tool_call)
                 
                 # finish_reasonを処理
-                if hasattr(choice, 'finish_reason') and choice.finish_reason:
-                    choice_dict["finish_reason"] = choice.finish_reason
+                finish_reason = getattr(choice, 'finish_reason', None)
+                if finish_reason:
+                    choice_dict["finish_reason"] = finish_reason
+                    # 蓄積した関数呼び出し引数を1回だけ結合・パースして返す
+                    completed_calls = [
+                        {"index": index, **self._finish_tool_arguments((chunk_id, index))}
+                        for chunk_id, index in list(self._tool_arg_chunks)
+                        if chunk_id == chunk.id
+                    ]
+                    if completed_calls:
+                        choice_dict["completed_tool_calls"] = completed_calls
                 
                 chunk_dict["choices"].append(choice_dict)
         
         # usage情報があれば追加
-        if hasattr(chunk, 'usage') and chunk.usage:
+        usage = getattr(chunk, 'usage', None)
+        if usage:
             chunk_dict["usage"] = {
-                "prompt_tokens": chunk.usage.prompt_tokens if hasattr(chunk.usage, 'prompt_tokens') else 0,
-                "completion_tokens": chunk.usage.completion_tokens if hasattr(chunk.usage, 'completion_tokens') else 0,
-                "total_tokens": chunk.usage.total_tokens if hasattr(chunk.usage, 'total_tokens') else 0
+                "prompt_tokens": getattr(usage, 'prompt_tokens', 0),
+                "completion_tokens": getattr(usage, 'completion_tokens', 0),
+                "total_tokens": getattr(usage, 'total_tokens', 0)
             }
         
         return chunk_dict
@@ -463,23 +672,26 @@ class ResponsesAPIHandler:
         """
         Responses APIの非ストリーミング応答を処理
         """
+        response_id = getattr(response, 'id', None)
+        created_at = getattr(response, 'created_at', None)
         return {
-            "id": response.id if hasattr(response, 'id') else None,
+            "id": response_id,
+            "response_id": response_id,  # 会話継続用（呼び出し側で保存する）
             "object": "response",
-            "output_text": response.output_text if hasattr(response, 'output_text') else "",
-            "output": response.output if hasattr(response, 'output') else [],
-            "model": response.model if hasattr(response, 'model') else self.default_model,
-            "created_at": response.created_at if hasattr(response, 'created_at') else datetime.now().timestamp(),
+            "output_text": getattr(response, 'output_text', ""),
+            "output": getattr(response, 'output', []),
+            "model": getattr(response, 'model', self.default_model),
+            "created_at": created_at if created_at is not None else self._current_timestamp(),
             "type": "response_complete"
         }
     
-    def _process_response_stream_event(self, event) -> Dict[str, Any]:
+    def _process_response_stream_event(self, event) -> Union[StreamChunk, Dict[str, Any]]:
         """
         Responses APIのストリーミングイベントを処理
         
         イベントタイプ:
-        - response.output_text.delta: テキストのデルタ
-        - response.output.delta: 出力のデルタ
+        - response.output_text.delta: テキストのデルタ（StreamChunkで返す）
+        - response.output.delta: 出力のデルタ（StreamChunkで返す）
         - response.completed: 応答完了
         - tool.call: ツール呼び出し
         - error: エラー
@@ -489,42 +701,60 @@ class ResponsesAPIHandler:
         
         if event_type == 'response.output_text.delta' or event_type == 'response.output.delta':
             # テキストデルタイベント
-            delta_content = ""
-            if hasattr(event, 'delta'):
-                delta_content = event.delta
-            elif hasattr(event, 'output_text_delta'):
-                delta_content = event.output_text_delta
+            delta_content = getattr(event, 'delta', None)
+            if delta_content is None:
+                delta_content = getattr(event, 'output_text_delta', "")
             
-            return {
-                "type": "text_delta",
-                "content": delta_content,
-                "id": event.id if hasattr(event, 'id') else None
-            }
+            return StreamChunk(content=delta_content, id=getattr(event, 'id', None))
         elif event_type == 'response.completed':
             # 完了イベント
-            output_text = ""
-            if hasattr(event, 'output_text'):
-                output_text = event.output_text
-            elif hasattr(event, 'response') and hasattr(event.response, 'output_text'):
-                output_text = event.response.output_text
+            response = getattr(event, 'response', None)
+            output_text = getattr(event, 'output_text', None)
+            if output_text is None:
+                output_text = getattr(response, 'output_text', "")
+            
+            # 完了イベントのresponse.idが次のターンのprevious_response_idになる
+            response_id = getattr(response, 'id', None) or getattr(event, 'response_id', None)
             
             return {
                 "type": "response_complete",
-                "id": event.response_id if hasattr(event, 'response_id') else None,
+                "id": response_id,
+                "response_id": response_id,
                 "output_text": output_text
             }
+        elif event_type == 'response.function_call_arguments.delta':
+            # 関数呼び出し引数の断片（完了時にまとめて結合する）
+            item_id = getattr(event, 'item_id', None)
+            delta = getattr(event, 'delta', None) or ""
+            if delta:
+                self._tool_arg_chunks.setdefault((item_id, 0), []).append(delta)
+            return {
+                "type": "function_call_arguments_delta",
+                "item_id": item_id,
+                "delta": delta
+            }
+        elif event_type == 'response.function_call_arguments.done':
+            # 関数呼び出し引数の確定（完全な引数があればそれを優先）
+            item_id = getattr(event, 'item_id', None)
+            finished = self._finish_tool_arguments((item_id, 0), getattr(event, 'arguments', None))
+            return {
+                "type": "function_call_arguments_done",
+                "item_id": item_id,
+                **finished
+            }
         elif event_type == 'tool.call':
             # ツール呼び出しイベント
             return {
                 "type": "tool_call",
-                "tool_type": event.tool_type if hasattr(event, 'tool_type') else None,
-                "data": event.data if hasattr(event, 'data') else None
+                "tool_type": getattr(event, 'tool_type', None),
+                "data": getattr(event, 'data', None)
             }
         elif event_type == 'error':
             # エラーイベント
+            error = getattr(event, 'error', None)
             return {
                 "type": "error",
-                "error": str(event.error) if hasattr(event, 'error') else "Unknown error"
+                "error": str(error) if error is not None else "Unknown error"
             }
         else:
             # その他のイベント（デバッグ用）
@@ -534,6 +764,31 @@ class ResponsesAPIHandler:
                 "data": str(event)
             }
     
+    def _finish_tool_arguments(self, key: tuple, arguments: Optional[str] = None) -> Dict[str, Any]:
+        """
+        蓄積した関数呼び出し引数の断片を1回だけ結合してパース
+        断片ごとに文字列連結や再パースをしないため、引数が長くても線形時間で済む
+        
+        Args:
+            key: 断片の蓄積キー
+            arguments: 完全な引数文字列（届いている場合は断片より優先）
+        
+        Returns:
+            arguments（結合済み文字列）とparsed_arguments（パース結果、失敗時はNone）
+        """
+        chunks = self._tool_arg_chunks.pop(key, None)
+        if arguments is None:
+            arguments = "".join(chunks) if chunks else ""
+        
+        parsed = None
+        # JSONとして閉じていない（途中で切れた）引数はパースを試みない
+        if arguments.rstrip().endswith(("}", "]")):
+            try:
+                parsed = loads(arguments)
+            except JSONDecodeError:
+                parsed = None
+        return {"arguments": arguments, "parsed_arguments": parsed}
+    
     def _process_response(self, response) -> Dict[str, Any]:
         """非ストリーミングレスポンスを処理"""
         response_dict = {
@@ -561,10 +816,11 @@ class ResponsesAPIHandler:
             }
             
             # ツール呼び出しがある場合
-            if hasattr(choice.message, 'tool_calls') and choice.message.tool_calls:
+            tool_calls = getattr(choice.message, 'tool_calls', None)
+            if tool_calls:
                 choice_dict["message"]["tool_calls"] = []
                 
-                for tc in choice.message.tool_calls:
+                for tc in tool_calls:
                     tool_call = {
                         "id": tc.id,
                         "type": tc.type
@@ -573,7 +829,7 @@ class ResponsesAPIHandler:
                     # Web検索ツール
                     if tc.type == "web_search":
                         tool_call["web_search"] = {
-                            "query": tc.web_search.query if hasattr(tc, 'web_search') else None
+                            "query": getattr(getattr(tc, 'web_search', None), 'query', None)
                         }
                     
                     # ファイル検索ツール
@@ -608,60 +864,102 @@ class ResponsesAPIHandler:
         Returns:
             ツール実行結果のリスト
         """
-        tool_results = []
+        # 各ツール呼び出しは互いに独立しているため並行して実行する（所要時間は合計ではなく最大に）
+        # TaskGroup（Python 3.11以降）なら呼び出し元のキャンセル時に全タスクを確実に止められる
+        if hasattr(asyncio, "TaskGroup"):
+            async with asyncio.TaskGroup() as tg:
+                tasks = [tg.create_task(self._run_one_tool(tool_call, messages)) for tool_call in tool_calls]
+            outcomes = [task.result() for task in tasks]
+        else:
+            outcomes = await asyncio.gather(
+                *(self._run_one_tool(tool_call, messages) for tool_call in tool_calls)
+            )
         
-        for tool_call in tool_calls:
-            tool_id = tool_call.get("id", f"tool_{datetime.now().timestamp()}")
-            tool_type = tool_call.get("type")
-            
-            if tool_type == "web_search":
-                # Web検索を実行
-                query = tool_call.get("web_search", {}).get("query", "")
-                result = await self._handle_web_search(query)
-                tool_results.append({
-                    "tool_call_id": tool_id,
-                    "role": "tool",
-                    "content": result
-                })
-            
-            elif tool_type == "file_search":
-                # ファイル検索を実行
-                result = await self._handle_file_search(messages)
-                tool_results.append({
-                    "tool_call_id": tool_id,
-                    "role": "tool",
-                    "content": result
-                })
+        return [outcome for outcome in outcomes if outcome is not None]
+    
+    async def _run_one_tool(
+        self,
+        tool_call: Dict[str, Any],
+        messages: List[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        ツール呼び出しを1件実行し、失敗はエラー結果に変換する（他のツールの実行を止めない）
+        
+        Args:
+            tool_call: ツール呼び出し
+            messages: メッセージ履歴（コンテキスト用）
+        
+        Returns:
+            ツール実行結果（未対応のツール種別はNone）
+        """
+        try:
+            return await self._execute_tool_call(tool_call, messages)
+        except Exception as e:
+            app_logger.error(f"ツール実行エラー: {e}")
+            return {
+                "tool_call_id": tool_call.get("id") or f"tool_{datetime.now().timestamp()}",
+                "role": "tool",
+                "content": f"エラー: ツールの実行に失敗しました: {e}"
+            }
+    
+    async def _execute_tool_call(
+        self,
+        tool_call: Dict[str, Any],
+        messages: List[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        ツール呼び出しを1件実行
+        
+        Args:
+            tool_call: ツール呼び出し
+            messages: メッセージ履歴（コンテキスト用）
+        
+        Returns:
+            ツール実行結果（未対応のツール種別はNone）
+        """
+        tool_id = tool_call.get("id") or f"tool_{datetime.now().timestamp()}"
+        tool_type = tool_call.get("type")
+        
+        if tool_type == "web_search":
+            # Web検索を実行
+            query = tool_call.get("web_search", {}).get("query", "")
+            result = await self._handle_web_search(query)
+        
+        elif tool_type == "file_search":
+            # ファイル検索を実行
+            result = await self._handle_file_search(messages)
+        
+        elif tool_type == "function":
+            # 関数呼び出しを実行
+            function_name = tool_call.get("function", {}).get("name")
+            arguments = tool_call.get("function", {}).get("arguments", "{}")
             
-            elif tool_type == "function":
-                # 関数呼び出しを実行
-                function_name = tool_call.get("function", {}).get("name")
-                arguments = tool_call.get("function", {}).get("arguments", "{}")
+            if function_name == "web_search":
+                # Web検索関数として処理
+                try:
+                    args = loads(arguments)
+                    query = args.get("query", "")
+                    result = await self._handle_web_search(query)
+                except JSONDecodeError:
+                    result = f"エラー: 引数のパースに失敗しました: {arguments}"
                 
-                if function_name == "web_search":
-                    # Web検索関数として処理
-                    try:
-                        args = json.loads(arguments)
-                        query = args.get("query", "")
-                        result = await self._handle_web_search(query)
-                    except json.JSONDecodeError:
-                        result = f"エラー: 引数のパースに失敗しました: {arguments}"
-                    
-                elif function_name == "file_search":
-                    # ファイル検索関数として処理
-                    result = await self._handle_file_search(messages)
-                    
-                else:
-                    # その他のカスタム関数
-                    result = await self._handle_function_call(function_name, arguments)
+            elif function_name == "file_search":
+                # ファイル検索関数として処理
+                result = await self._handle_file_search(messages)
                 
-                tool_results.append({
-                    "tool_call_id": tool_id,
-                    "role": "tool",
-                    "content": result
-                })
+            else:
+                # その他のカスタム関数
+                result = await self._handle_function_call(function_name, arguments)
+        
+        else:
+            return None
         
-        return tool_results
+        return {
+            "tool_call_id": tool_id,
+            "role": "tool",
+            # 構造化された結果はorjson（利用可能な場合）でJSON文字列にする
+            "content": result if isinstance(result, str) else dumps(result)
+        }
     
     async def _handle_web_search(self, query: str) -> str:
         """
@@ -792,8 +1090,8 @@ class ResponsesAPIHandler:
             関数の実行結果
         """
         try:
-            args = json.loads(arguments)
-        except json.JSONDecodeError:
+            args = loads(arguments)
+        except JSONDecodeError:
             return f"エラー: 引数のパースに失敗しました: {arguments}"
         
         # カスタム関数の実装をここに追加
@@ -876,38 +1174,40 @@ class ResponsesAPIHandler:
             return f"Chat - {datetime.now().strftime('%Y-%m-%d %H:%M')}"
         
         try:
-            # 会話内容を整形
-            conversation_context = "\n".join([
-                f"{m['role']}: {m['content'][:100]}" 
-                for m in messages[:3] 
+            # 会話内容を整形（各メッセージはスライスで100文字に切り詰め、1回のjoinで連結）
+            conversation_context = "\n".join(
+                f"{m['role']}: {m['content'][:100]}"
+                for m in messages[:3]
                 if m.get('content')
-            ])
-            
-            # Responses APIを使用してタイトル生成
-            response = await self.async_client.responses.create(
-                model="gpt-4o-mini",
-                input=conversation_context,
-                instructions="この会話から、短く簡潔なタイトルを日本語で生成してください。20文字以内で、タイトルのみを出力してください。",
-                temperature=0.5,
-                max_tokens=30,
-                stream=False
             )
+            if not conversation_context:
+                # 内容がなければAPIを呼ばずに既定のタイトルを返す
+                return f"Chat - {datetime.now().strftime('%Y-%m-%d %H:%M')}"
             
-            # レスポンスからタイトルを抽出
-            if hasattr(response, 'output_text'):
-                title = response.output_text.strip()
-            elif hasattr(response, 'output') and isinstance(response.output, list) and len(response.output) > 0:
-                # outputが配列の場合、最初のメッセージのcontentを取得
-                first_output = response.output[0]
-                if hasattr(first_output, 'content') and isinstance(first_output.content, list):
-                    for content_item in first_output.content:
-                        if hasattr(content_item, 'text'):
-                            title = content_item.text.strip()
-                            break
-                else:
-                    title = str(first_output).strip()
+            # Responses APIを使用してタイトル生成（JSONで短く返させ、温度0で応答キャッシュの対象にする）
+            title_params = {
+                "model": TITLE_MODEL,
+                "input": conversation_context,
+                "instructions": _TITLE_INSTRUCTIONS,
+                "text": {"format": {"type": "json_object"}},
+                "temperature": 0,
+                "max_output_tokens": TITLE_MAX_OUTPUT_TOKENS,
+                "store": False,
+                # 共通の指示文をユーザー間で同じプロンプトキャッシュに振り分ける
+                "extra_body": {"prompt_cache_key": _TITLE_PROMPT_CACHE_KEY},
+            }
+            cache_key = ResponseCache.make_key(title_params)
+            cached = await self.response_cache.aget(cache_key)
+            if cached is not None:
+                output_text = cached.get("output_text") or ""
             else:
-                title = "Untitled Chat"
+                response = await self.async_client.responses.create(**title_params)
+                output_text = getattr(response, 'output_text', None) or ""
+                # 出力トークン上限で途中で切れた応答はキャッシュしない
+                if output_text and getattr(response, 'status', None) != "incomplete":
+                    self.response_cache.set(cache_key, {"output_text": output_text, "model": TITLE_MODEL})
+            
+            title = self._parse_title(output_text) or "Untitled Chat"
             
             # タイトルが長すぎる場合は切り詰め
             if len(title) > 30:
@@ -919,6 +1219,25 @@ class ResponsesAPIHandler:
             app_logger.error(f"Error generating title: {e}")
             return f"Chat - {datetime.now().strftime('%Y-%m-%d %H:%M')}"
     
+    @staticmethod
+    def _parse_title(output_text: str) -> str:
+        """
+        タイトル生成のJSON出力からタイトルを取り出す
+        出力トークン上限で途中で切れたJSONは、閉じていない文字列部分をそのまま使う
+        """
+        text = output_text.strip()
+        try:
+            data = loads(text)
+        except JSONDecodeError:
+            # {"title": "途中まで … の形から値部分を取り出す
+            _, sep, rest = text.partition('"title"')
+            if not sep:
+                return text
+            return rest.lstrip(' :').strip('"}').strip()
+        if isinstance(data, dict):
+            return str(data.get("title") or "").strip()
+        return str(data).strip()
+    
     def format_token_usage(self, usage: Dict[str, int]) -> str:
         """
         トークン使用量をフォーマット
@@ -5,15 +5,98 @@ OpenAI Tools機能の設定管理
 - その他のツール設定
 """
 
-import json
+import asyncio
+import atexit
+import copy
+import hashlib
+import logging
 import os
-from typing import Dict, List, Any, Optional
+import re
+import threading
+from contextlib import contextmanager
+from types import MappingProxyType
+from typing import Dict, FrozenSet, List, Any, Mapping, Optional, Set, Tuple
 from pathlib import Path
 
+from .json_helper import dumps_pretty, loads
+from .logger import app_logger
+
+# ベクトルストアID文字列の区切り（カンマと空白のどちらでも区切れる）
+_VECTOR_STORE_ID_SPLIT = re.compile(r"[,\s]+")
+
+# デフォルト設定（変更せずに使うテンプレート。作業用には_build_default_configでコピーする）
+_DEFAULT_CONFIG_TEMPLATE: Dict[str, Any] = {
+    "enabled": True,  # Tools機能全体の有効/無効
+    "vector_store_layers": {  # ベクトルストア層の有効/無効
+        "company": True,    # 1層目：会社全体
+        "personal": True,   # 2層目：個人ユーザー
+        "thread": True      # 3層目：チャット単位
+    },
+    "tools": {
+        "web_search": {
+            "enabled": True,
+            "name": "web_search",
+            "description": "Search the web for current information",
+            "auto_invoke": True  # 自動的にツールを呼び出すか
+        },
+        "file_search": {
+            "enabled": True,
+            "name": "file_search", 
+            "description": "Search through uploaded files and documents",
+            "auto_invoke": True,
+            "file_ids": [],  # 検索対象のファイルID
+            "vector_store_ids": []  # 参照対象のベクトルストアID（カンマ区切りで複数指定可）
+        },
+        "code_interpreter": {
+            "enabled": False,
+            "name": "code_interpreter",
+            "description": "Execute Python code for calculations and data analysis",
+            "auto_invoke": False
+        },
+        "custom_functions": {
+            "enabled": False,
+            "functions": []  # カスタム関数のリスト
+        }
+    },
+    "settings": {
+        "tool_choice": "auto",  # "auto", "none", "required", または特定のツール
+        "parallel_tool_calls": True,  # 並列ツール呼び出しを許可
+        "max_tools_per_call": 5,  # 1回の呼び出しで使用可能な最大ツール数
+        "web_search_max_results": 5,  # Web検索の最大結果数
+        "file_search_max_chunks": 20,  # ファイル検索の最大チャンク数
+        "show_tool_calls": True,  # UIにツール呼び出しを表示
+        "show_tool_results": True  # UIにツール結果を表示
+    }
+}
+
 
 class ToolsConfig:
     """Tools機能の設定管理クラス"""
     
+    # 設定変更をまとめて書き込むまでの待ち時間（秒）
+    SAVE_DEBOUNCE_SECONDS = 0.5
+    
+    # 読み込み済み設定のキャッシュ（(絶対パス, st_mtime_ns) -> マージ済み設定）
+    # ファイルが更新されていなければ、再インスタンス化時にJSONの解析とマージを省略する
+    _CACHE: Dict[Tuple[str, int], Dict[str, Any]] = {}
+    
+    # 属性を固定してインスタンス辞書を持たない（属性参照も高速になる）
+    __slots__ = (
+        "config_file",
+        "config",
+        "_config_version",
+        "_static_tools_cache",
+        "_enabled_set_cache",
+        "_indices_cache",
+        "_file_ids_cache",
+        "_dirty",
+        "_autoflush",
+        "_flush_handle",
+        "_write_lock",
+        "_last_saved_digest",
+        "_last_written_version",
+    )
+    
     def __init__(self, config_file: str = ".chainlit/tools_config.json"):
         """
         初期化
@@ -22,101 +105,251 @@ class ToolsConfig:
             config_file: 設定ファイルのパス
         """
         self.config_file = config_file
+        # 設定が変わるたびに増える世代番号（キャッシュの有効性判定に使用）
+        self._config_version = 0
+        # セッションに依存しないツール定義（世代番号, file_searchより前, file_searchより後）
+        self._static_tools_cache: Optional[Tuple[int, Tuple[Dict[str, Any], ...], Tuple[Dict[str, Any], ...]]] = None
+        # 有効なツール名の集合（世代番号, 定義順のタプル, 判定用frozenset）
+        self._enabled_set_cache: Optional[Tuple[int, Tuple[str, ...], FrozenSet[str]]] = None
+        # 参照用に1階層へ展開した設定（世代番号, ツール状態, ツール設定, settings）
+        self._indices_cache: Optional[Tuple[int, Dict[str, bool], Dict[str, Dict[str, Any]], Dict[str, Any]]] = None
+        # ファイル検索対象IDの集合（世代番号, ID集合）
+        self._file_ids_cache: Optional[Tuple[int, Set[str]]] = None
+        # 保存のデバウンス状態
+        self._dirty = False
+        self._autoflush = True
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._write_lock = threading.Lock()
+        # 最後に書き込んだ内容のダイジェスト（同じ内容なら書き込みを省略する）
+        self._last_saved_digest: Optional[bytes] = None
+        # 最後に書き込んだ設定の世代番号（古い世代の書き込みが後から完了して上書きするのを防ぐ）
+        self._last_written_version = -1
         self.config = self._load_config()
+        # 終了直前の変更を取りこぼさないように
+        atexit.register(self.flush)
+    
+    def _invalidate_cache(self) -> None:
+        """設定変更を通知し、派生データのキャッシュを無効化"""
+        self._config_version += 1
+    
+    @staticmethod
+    def _build_default_config() -> Dict[str, Any]:
+        """デフォルト設定を新しい辞書として作成"""
+        return copy.deepcopy(_DEFAULT_CONFIG_TEMPLATE)
     
     def _load_config(self) -> Dict[str, Any]:
         """設定を読み込み"""
-        # デフォルト設定
-        default_config = {
-            "enabled": True,  # Tools機能全体の有効/無効
-            "vector_store_layers": {  # ベクトルストア層の有効/無効
-                "company": True,    # 1層目：会社全体
-                "personal": True,   # 2層目：個人ユーザー
-                "thread": True      # 3層目：チャット単位
-            },
-            "tools": {
-                "web_search": {
-                    "enabled": True,
-                    "name": "web_search",
-                    "description": "Search the web for current information",
-                    "auto_invoke": True  # 自動的にツールを呼び出すか
-                },
-                "file_search": {
-                    "enabled": True,
-                    "name": "file_search", 
-                    "description": "Search through uploaded files and documents",
-                    "auto_invoke": True,
-                    "file_ids": [],  # 検索対象のファイルID
-                    "vector_store_ids": []  # 参照対象のベクトルストアID（カンマ区切りで複数指定可）
-                },
-                "code_interpreter": {
-                    "enabled": False,
-                    "name": "code_interpreter",
-                    "description": "Execute Python code for calculations and data analysis",
-                    "auto_invoke": False
-                },
-                "custom_functions": {
-                    "enabled": False,
-                    "functions": []  # カスタム関数のリスト
-                }
-            },
-            "settings": {
-                "tool_choice": "auto",  # "auto", "none", "required", または特定のツール
-                "parallel_tool_calls": True,  # 並列ツール呼び出しを許可
-                "max_tools_per_call": 5,  # 1回の呼び出しで使用可能な最大ツール数
-                "web_search_max_results": 5,  # Web検索の最大結果数
-                "file_search_max_chunks": 20,  # ファイル検索の最大チャンク数
-                "show_tool_calls": True,  # UIにツール呼び出しを表示
-                "show_tool_results": True  # UIにツール結果を表示
-            }
-        }
+        self._invalidate_cache()
         
-        # 設定ファイルが存在する場合は読み込み
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    loaded_config = json.load(f)
-                    # デフォルト設定に読み込んだ設定をマージ
-                    return self._merge_configs(default_config, loaded_config)
-            except Exception as e:
-                print(f"⚠️ 設定ファイルの読み込みエラー: {e}")
-                return default_config
-        else:
-            # 設定ファイルが存在しない場合は作成
-            self._save_config(default_config)
-            return default_config
-    
-    def _merge_configs(self, default: Dict, loaded: Dict) -> Dict:
-        """設定をマージ（再帰的）"""
-        result = default.copy()
-        for key, value in loaded.items():
-            if key in result and isinstance(result[key], dict) and isinstance(value, dict):
-                result[key] = self._merge_configs(result[key], value)
-            else:
-                result[key] = value
-        return result
+        # 設定ファイルを開いて読み込み（存在確認のstatは行わず、開けなければ作成）
+        try:
+            with open(self.config_file, 'rb') as f:
+                # 開いたファイルの更新時刻で判定し、未更新ならJSONの解析とマージを省略
+                cache_key = (os.path.abspath(self.config_file), os.fstat(f.fileno()).st_mtime_ns)
+                cached = self._CACHE.get(cache_key)
+                if cached is not None:
+                    return copy.deepcopy(cached)
+                loaded_config = loads(f.read())
+        except FileNotFoundError:
+            # 設定ファイルが存在しない場合はテンプレートをそのまま書き出して作成
+            self._save_config(_DEFAULT_CONFIG_TEMPLATE)
+            return self._build_default_config()
+        except Exception as e:
+            app_logger.warning(f"設定ファイルの読み込みエラー: {e}")
+            return self._build_default_config()
+        
+        try:
+            # デフォルト設定に読み込んだ設定をマージ
+            merged = self._deep_merge(self._build_default_config(), loaded_config)
+        except Exception as e:
+            app_logger.warning(f"設定ファイルの形式エラー: {e}")
+            return self._build_default_config()
+        self._store_cache(cache_key, merged)
+        return merged
+    
+    def _cache_key(self) -> Tuple[str, int]:
+        """設定ファイルの絶対パスと更新時刻からキャッシュキーを作成"""
+        return (os.path.abspath(self.config_file), os.stat(self.config_file).st_mtime_ns)
+    
+    def _store_cache(self, cache_key: Tuple[str, int], config: Dict[str, Any]) -> None:
+        """同じファイルの古い世代を捨ててから設定のコピーをキャッシュ"""
+        for key in [key for key in self._CACHE if key[0] == cache_key[0]]:
+            self._CACHE.pop(key, None)
+        self._CACHE[cache_key] = copy.deepcopy(config)
+    
+    @staticmethod
+    def _deep_merge(dest: Dict, src: Dict) -> Dict:
+        """
+        srcの内容をdestに上書きマージして返す（destを直接変更）
+        再帰の代わりに(マージ先, マージ元)の組をスタックで処理するため、深い入れ子でも
+        RecursionErrorにならない。JSON由来の値しか扱わないため型は__class__で判定する
+        """
+        stack = [(dest, src)]
+        while stack:
+            target, source = stack.pop()
+            for key, value in source.items():
+                current = target.get(key)
+                if current.__class__ is dict and value.__class__ is dict:
+                    # マージ先の辞書を共有しないよう、コピーしてから下位階層をマージ
+                    merged = {**current}
+                    target[key] = merged
+                    stack.append((merged, value))
+                else:
+                    target[key] = value
+        return dest
     
     def _save_config(self, config: Dict[str, Any] = None) -> None:
-        """設定を保存"""
-        if config is None:
-            config = self.config
+        """
+        設定を保存
+        
+        configを省略した場合（self.configの変更後）は即座に書き込まず、
+        SAVE_DEBOUNCE_SECONDS以内の変更をまとめて1回だけ書き込む
+        """
+        if config is not None:
+            self._write_config(dumps_pretty(config), config)
+            return
+        
+        # self.configを書き換えた後の保存なのでキャッシュを無効化
+        self._invalidate_cache()
+        self._dirty = True
+        if self._autoflush:
+            self._schedule_flush()
+    
+    def _schedule_flush(self) -> None:
+        """保留中の変更の書き込みを予約（イベントループ外では即座に書き込む）"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # イベントループ外（スクリプト等）では即座に書き込む
+            self.flush()
+            return
         
-        # ディレクトリを作成
-        os.makedirs(os.path.dirname(self.config_file), exist_ok=True)
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.SAVE_DEBOUNCE_SECONDS, self._flush_later)
+    
+    @contextmanager
+    def batch(self):
+        """
+        複数の設定変更をまとめて1回の書き込みにする
         
-        # 設定を保存
-        with open(self.config_file, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+        使用例:
+            with tools_config.batch():
+                tools_config.update_tool_status("web_search", True)
+                tools_config.set_layer_enabled("company", False)
+        """
+        previous = self._autoflush
+        self._autoflush = False
+        try:
+            yield self
+        finally:
+            self._autoflush = previous
+            if previous and self._dirty:
+                self._schedule_flush()
+    
+    def _flush_later(self) -> None:
+        """デバウンス期間経過後に、書き込みをイベントループ外のスレッドで実行"""
+        self._flush_handle = None
+        if not self._dirty:
+            return
+        self._dirty = False
+        # シリアライズはループ上で行い、その時点のスナップショットを書き込む
+        data = dumps_pretty(self.config)
+        snapshot = copy.deepcopy(self.config)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            None, self._write_config, data, snapshot, self._config_version
+        )
+        future.add_done_callback(self._on_flush_done)
+    
+    def _on_flush_done(self, future: "asyncio.Future") -> None:
+        """バックグラウンド書き込みの失敗を記録し、書き込みを予約し直して再試行する"""
+        if future.cancelled():
+            # シャットダウン中のキャンセルはatexitのflushに任せる
+            self._dirty = True
+            return
+        error = future.exception()
+        if error is not None:
+            app_logger.error(f"設定ファイルの書き込みエラー: {error}")
+            self._dirty = True
+            future.get_loop().call_soon_threadsafe(self._schedule_flush)
+    
+    def flush(self) -> None:
+        """保留中の設定変更があれば同期的に書き込む"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._dirty:
+            return
+        self._dirty = False
+        try:
+            self._write_config(dumps_pretty(self.config), self.config, self._config_version)
+        except Exception:
+            # 書き込めなかった変更は保留のまま残す
+            self._dirty = True
+            raise
+    
+    def _write_config(self, data: bytes, config: Dict[str, Any], version: Optional[int] = None) -> None:
+        """
+        一時ファイルに書いてからリネームし、設定ファイルを原子的に置き換え
+        書き込んだ設定は新しい更新時刻でキャッシュし直す
+        前回書き込んだ内容と同じ場合や、versionが書き込み済みの世代より古い場合は何もしない
+        """
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        with self._write_lock:
+            if version is not None and version < self._last_written_version:
+                # 後から予約された新しい世代の書き込みが先に完了している
+                return
+            if digest == self._last_saved_digest and os.path.exists(self.config_file):
+                if version is not None:
+                    self._last_written_version = version
+                return
+            
+            # ディレクトリを作成
+            os.makedirs(os.path.dirname(self.config_file), exist_ok=True)
+            
+            tmp_file = self.config_file + ".tmp"
+            with open(tmp_file, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.config_file)
+            self._store_cache(self._cache_key(), config)
+            self._last_saved_digest = digest
+            if version is not None:
+                self._last_written_version = version
     
     def is_enabled(self) -> bool:
         """Tools機能が有効かどうか"""
         return self.config.get("enabled", False)
     
+    def _enabled_tools_snapshot(self) -> Tuple[Tuple[str, ...], FrozenSet[str]]:
+        """
+        有効なツール名を設定の世代ごとに1回だけ走査して返す
+        Tools機能全体が無効な場合は空
+        """
+        cache = self._enabled_set_cache
+        if cache is not None and cache[0] == self._config_version:
+            return cache[1], cache[2]
+        
+        enabled_tools: Tuple[str, ...] = ()
+        if self.is_enabled():
+            enabled_tools = tuple(
+                tool_name
+                for tool_name, tool_config in self.config.get("tools", {}).items()
+                if tool_config.get("enabled", False) is True
+            )
+        enabled_set = frozenset(enabled_tools)
+        self._enabled_set_cache = (self._config_version, enabled_tools, enabled_set)
+        return enabled_tools, enabled_set
+    
+    @property
+    def _enabled_set(self) -> FrozenSet[str]:
+        """有効なツール名の集合（設定変更時に自動で再構築）"""
+        return self._enabled_tools_snapshot()[1]
+    
     def is_tool_enabled(self, tool_name: str) -> bool:
         """特定のツールが有効かどうか"""
-        if not self.is_enabled():
-            return False
-        return self.config.get("tools", {}).get(tool_name, {}).get("enabled", False)
+        return tool_name in self._enabled_set
     
     def get_tools_status(self) -> Dict[str, bool]:
         """
@@ -125,30 +358,39 @@ class ToolsConfig:
         Returns:
             ツール名と状態の辞書
         """
-        status = {}
-        if self.config and 'tools' in self.config:
-            for tool_name, tool_config in self.config['tools'].items():
-                status[tool_name] = tool_config.get('enabled', False)
-        return status
+        return dict(self._indices()[0])
     
     def get_enabled_tools(self) -> List[str]:
-        """有効なツールのリストを取得"""
-        if not self.is_enabled():
-            return []
-        
-        enabled_tools = []
-        for tool_name, tool_config in self.config.get("tools", {}).items():
-            if tool_config.get("enabled", False):
-                enabled_tools.append(tool_name)
-        return enabled_tools
+        """有効なツールのリストを取得（設定ファイルでの定義順）"""
+        return list(self._enabled_tools_snapshot()[0])
     
     def get_tool_config(self, tool_name: str) -> Dict[str, Any]:
         """特定のツールの設定を取得"""
-        return self.config.get("tools", {}).get(tool_name, {})
+        return self._indices()[1].get(tool_name, {})
     
     def get_setting(self, setting_name: str, default: Any = None) -> Any:
         """設定値を取得"""
-        return self.config.get("settings", {}).get(setting_name, default)
+        return self._indices()[2].get(setting_name, default)
+    
+    def _indices(self) -> Tuple[Dict[str, bool], Dict[str, Dict[str, Any]], Dict[str, Any]]:
+        """
+        ツールの状態・ツール設定・settingsを1階層の辞書に展開して返す（世代ごとに再構築）
+        
+        Returns:
+            (ツール名→有効/無効, ツール名→ツール設定, 設定名→値)
+        """
+        cache = self._indices_cache
+        if cache is not None and cache[0] == self._config_version:
+            return cache[1], cache[2], cache[3]
+        
+        tool_configs = dict(self.config.get("tools", {}))
+        tool_status = {
+            tool_name: tool_config.get("enabled", False)
+            for tool_name, tool_config in tool_configs.items()
+        }
+        settings = dict(self.config.get("settings", {}))
+        self._indices_cache = (self._config_version, tool_status, tool_configs, settings)
+        return tool_status, tool_configs, settings
     
     def update_tool_status(self, tool_name: str, enabled: bool) -> None:
         """ツールの有効/無効を更新"""
@@ -165,20 +407,39 @@ class ToolsConfig:
     
     def add_file_for_search(self, file_id: str) -> None:
         """ファイル検索の対象ファイルを追加"""
-        if "file_search" in self.config.get("tools", {}):
-            if "file_ids" not in self.config["tools"]["file_search"]:
-                self.config["tools"]["file_search"]["file_ids"] = []
-            if file_id not in self.config["tools"]["file_search"]["file_ids"]:
-                self.config["tools"]["file_search"]["file_ids"].append(file_id)
-                self._save_config()
+        file_search = self.config.get("tools", {}).get("file_search")
+        if file_search is None:
+            return
+        file_id_set = self._search_file_id_set()
+        if file_id in file_id_set:
+            return
+        file_search.setdefault("file_ids", []).append(file_id)
+        file_id_set.add(file_id)
+        self._save_config()
+        # 集合はリストと同時に更新済みなので、新しい世代でもそのまま使う
+        self._file_ids_cache = (self._config_version, file_id_set)
     
     def remove_file_from_search(self, file_id: str) -> None:
         """ファイル検索の対象ファイルを削除"""
-        if "file_search" in self.config.get("tools", {}):
-            if "file_ids" in self.config["tools"]["file_search"]:
-                if file_id in self.config["tools"]["file_search"]["file_ids"]:
-                    self.config["tools"]["file_search"]["file_ids"].remove(file_id)
-                    self._save_config()
+        file_search = self.config.get("tools", {}).get("file_search")
+        if file_search is None:
+            return
+        file_id_set = self._search_file_id_set()
+        if file_id not in file_id_set:
+            return
+        file_search["file_ids"].remove(file_id)
+        file_id_set.discard(file_id)
+        self._save_config()
+        self._file_ids_cache = (self._config_version, file_id_set)
+    
+    def _search_file_id_set(self) -> Set[str]:
+        """ファイル検索対象のファイルIDを集合で取得（所属判定をO(1)にする）"""
+        cache = self._file_ids_cache
+        if cache is not None and cache[0] == self._config_version:
+            return cache[1]
+        file_id_set = set(self.get_search_file_ids())
+        self._file_ids_cache = (self._config_version, file_id_set)
+        return file_id_set
     
     def get_search_file_ids(self) -> List[str]:
         """ファイル検索の対象ファイルIDリストを取得"""
@@ -189,13 +450,18 @@ class ToolsConfig:
         ベクトルストアIDを更新（カンマ区切りの文字列から）
         
         Args:
-            vector_store_ids: カンマ区切りのベクトルストアID文字列
+            vector_store_ids: カンマ区切りのベクトルストアID文字列（空白区切りも可）
         """
-        if "file_search" in self.config.get("tools", {}):
-            # カンマ区切りの文字列をリストに変換
-            ids_list = [id.strip() for id in vector_store_ids.split(',') if id.strip()]
-            self.config["tools"]["file_search"]["vector_store_ids"] = ids_list
-            self._save_config()
+        file_search = self.config.get("tools", {}).get("file_search")
+        if file_search is None:
+            return
+        # 区切り文字で分割し、空要素を除外
+        ids_list = [vs_id for vs_id in _VECTOR_STORE_ID_SPLIT.split(vector_store_ids) if vs_id]
+        # 設定画面からの再送などで内容が変わっていなければ保存しない
+        if ids_list == file_search.get("vector_store_ids"):
+            return
+        file_search["vector_store_ids"] = ids_list
+        self._save_config()
     
     def get_vector_store_ids(self) -> List[str]:
         """ベクトルストアIDリストを取得"""
@@ -218,10 +484,10 @@ class ToolsConfig:
     
     def enable_all_tools(self) -> None:
         """すべてのツールを有効化"""
-        self.config["enabled"] = True
-        for tool_name in self.config.get("tools", {}):
-            self.config["tools"][tool_name]["enabled"] = True
-        self._save_config()
+        with self.batch():
+            self.update_enabled(True)
+            for tool_name in self.config.get("tools", {}):
+                self.update_tool_status(tool_name, True)
     
     def disable_all_tools(self) -> None:
         """すべてのツールを無効化"""
@@ -243,15 +509,17 @@ class ToolsConfig:
     
     def reset_to_default(self) -> None:
         """設定をデフォルトにリセット"""
-        self.config = self._load_config()
-        # 設定ファイルを削除して再作成
-        if os.path.exists(self.config_file):
-            os.remove(self.config_file)
+        # 既存ファイルは読み直さず、デフォルト設定で上書き保存する（書き込みは原子的な置き換え）
+        self.config = self._build_default_config()
         self._save_config()
     
-    def to_dict(self) -> Dict[str, Any]:
-        """設定を辞書として取得"""
-        return self.config.copy()
+    def to_dict(self) -> Mapping[str, Any]:
+        """
+        設定を読み取り専用のビューとして取得（コピーしない）
+        
+        変更可能な辞書が必要な場合は copy.deepcopy(dict(tools_config.to_dict())) を使うこと
+        """
+        return MappingProxyType(self.config)
     
     def is_layer_enabled(self, layer_name: str) -> bool:
         """ベクトルストア層が有効かどうか"""
@@ -268,6 +536,7 @@ class ToolsConfig:
         """
         OpenAI APIのtoolsパラメータを構築
         注: Responses APIではweb_search_previewタイプを使用
+        設定だけで決まるツール定義は世代番号ごとにキャッシュし、file_searchのみ毎回組み立てる
         
         Args:
             session: Chainlitセッションオブジェクト（ベクトルストアID取得用）
@@ -275,121 +544,145 @@ class ToolsConfig:
         Returns:
             有効なツールのリスト（API用フォーマット）
         """
-        print(f"🔍 [DEBUG] build_tools_parameter - セッション: {session is not None}")
-        if session:
-            print(f"🔍 [DEBUG] セッションキー: {list(session.keys()) if isinstance(session, dict) else 'Not a dict'}")
+        debug = app_logger.logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            app_logger.debug(f"build_tools_parameter - セッション: {session is not None}, キー: {list(session.keys()) if isinstance(session, dict) else None}")
         
-        # Tools全体が無効でも、個別のツールが有効なら動作させる
-        tools = []
+        file_search_enabled = "file_search" in self._enabled_set
+        vector_store_ids = self._collect_vector_store_ids(session) if file_search_enabled else []
         
-        # Web検索ツール (web_search_previewタイプとして定義)
-        if self.is_enabled() and self.is_tool_enabled("web_search"):
-            tools.append({
-                "type": "web_search_preview",
-                "search_context_size": "medium",  # low, medium, high
-            })
+        # 設定だけで決まる部分は世代ごとに1回だけ構築
+        head, tail = self._static_tools()
+        
+        # 呼び出し側での変更がキャッシュに波及しないよう各ツールはコピーして返す
+        tools = [{**tool} for tool in head]
         
         # ファイル検索ツール (file_searchタイプとして定義)
-        # Tools全体が無効でもfile_searchが有効なら動作
-        if self.is_tool_enabled("file_search"):
-            print(f"🔍 [DEBUG] file_searchツール有効")
-            vector_store_ids = []
-            
-            # 1層目：会社全体（.envから）
-            if self.is_layer_enabled("company"):
-                print(f"🔍 [DEBUG] 会社全体VS層有効")
-                # .envから取得
-                company_vs_id = os.getenv("COMPANY_VECTOR_STORE_ID")
-                
-                # セッションからも取得を試みる（設定更新後の値）
-                if session and not company_vs_id:
-                    company_vs_id = session.get("company_vs_id")
-                    if not company_vs_id:
-                        vs_ids = session.get("vector_store_ids", {})
-                        company_vs_id = vs_ids.get("company")
-                
-                print(f"🔍 [DEBUG] 会社全体VS ID: {company_vs_id[:8] if company_vs_id else 'None'}...")
-                if company_vs_id and company_vs_id.strip():
-                    vector_store_ids.append(company_vs_id.strip())
-                    print(f"✅ 会社VSを検索対象に追加: {company_vs_id[:8]}...")
-            
-            # 2層目：個人（セッションから）
-            if session and self.is_layer_enabled("personal"):
-                print(f"🔍 [DEBUG] 個人VS層有効")
-                # 複数の方法で取得を試みる
-                personal_vs_id = session.get("personal_vs_id")
-                if not personal_vs_id:
-                    vs_ids = session.get("vector_store_ids", {})
-                    personal_vs_id = vs_ids.get("personal")
-                
-                print(f"🔍 [DEBUG] 個人VS ID: {personal_vs_id[:8] if personal_vs_id else 'None'}...")
-                if personal_vs_id and personal_vs_id.strip():
-                    vector_store_ids.append(personal_vs_id.strip())
-                    print(f"✅ 個人VSを検索対象に追加: {personal_vs_id[:8]}...")
-            
-            # 3層目：チャット（セッションから）
-            if session and self.is_layer_enabled("thread"):
-                print(f"🔍 [DEBUG] チャットVS層有効")
-                # 複数の方法で取得を試みる
-                chat_vs_id = session.get("chat_vs_id")
-                print(f"🔍 [DEBUG] chat_vs_id直接: {chat_vs_id[:8] if chat_vs_id else 'None'}...")
-                
-                if not chat_vs_id:
-                    # 互換性のため古い名前もチェック
-                    chat_vs_id = session.get("session_vs_id") or session.get("thread_vs_id")
-                    print(f"🔍 [DEBUG] 互換性チェック: {chat_vs_id[:8] if chat_vs_id else 'None'}...")
-                
-                if not chat_vs_id:
-                    vs_ids = session.get("vector_store_ids", {})
-                    chat_vs_id = vs_ids.get("chat") or vs_ids.get("session") or vs_ids.get("thread")
-                    print(f"🔍 [DEBUG] vs_ids辞書から: {chat_vs_id[:8] if chat_vs_id else 'None'}...")
-                
-                if chat_vs_id and chat_vs_id.strip():
-                    vector_store_ids.append(chat_vs_id.strip())
-                    print(f"✅ チャットVSを検索対象に追加: {chat_vs_id[:8]}...")
-            
+        if file_search_enabled:
             # vector_store_idsが空の場合はfile_searchツールを追加しない
             # OpenAI APIは空のvector_store_idsを許可しないため
-            print(f"🔍 [DEBUG] 収集されたベクトルストアID数: {len(vector_store_ids)}")
             if vector_store_ids:
-                print(f"🔍 [DEBUG] ベクトルストアIDリスト: {[vs[:8] + '...' for vs in vector_store_ids]}")
                 # Responses API形式のfile_searchツール構造
-                file_search_config = {
+                tools.append({
                     "type": "file_search",
                     "vector_store_ids": vector_store_ids  # 直接vector_store_idsを配置
-                }
-                tools.append(file_search_config)
-                print(f"✅ file_searchツールを追加しました")
+                })
             else:
-                print("⚠️ file_searchツールは有効ですが、ベクトルストアIDが設定されていないためスキップします")
-                print("   ヒント: 1) 会社VSのIDを.envまたは設定画面で設定")
-                print("         2) 個人VSのIDをユーザー設定で設定")
-                print("         3) ファイルを添付してセッションVSを作成")
+                app_logger.warning("file_searchツールは有効ですが、ベクトルストアIDが設定されていないためスキップします（会社VSのIDを.envまたは設定画面で設定／個人VSのIDをユーザー設定で設定／ファイルを添付してセッションVSを作成）")
+        
+        tools.extend({**tool} for tool in tail)
+        
+        if debug:
+            app_logger.debug(f'構築したツール: {[tool.get("type", "unknown") for tool in tools]}, vector_store_ids: {vector_store_ids}')
+        
+        return tools or None
+    
+    def _static_tools(self) -> Tuple[Tuple[Dict[str, Any], ...], Tuple[Dict[str, Any], ...]]:
+        """
+        セッションに依存しないツール定義を設定の世代ごとにキャッシュして返す
+        
+        Returns:
+            (file_searchより前に並ぶツール, file_searchより後に並ぶツール)
+        """
+        cache = self._static_tools_cache
+        if cache is not None and cache[0] == self._config_version:
+            return cache[1], cache[2]
+        
+        enabled = self._enabled_set
+        head = []
+        tail = []
+        
+        # Web検索ツール (web_search_previewタイプとして定義)
+        if "web_search" in enabled:
+            head.append({
+                "type": "web_search_preview",
+                "search_context_size": "medium",  # low, medium, high
+            })
         
         # コードインタープリター (code_interpreterタイプとして定義)
-        if self.is_enabled() and self.is_tool_enabled("code_interpreter"):
-            tools.append({
+        if "code_interpreter" in enabled:
+            tail.append({
                 "type": "code_interpreter"
             })
         
         # カスタム関数
-        if self.is_enabled() and self.is_tool_enabled("custom_functions"):
+        if "custom_functions" in enabled:
             custom_functions = self.config.get("tools", {}).get("custom_functions", {}).get("functions", [])
             for func in custom_functions:
-                tools.append({
+                tail.append({
                     "type": "function",
                     "function": func
                 })
         
-        print(f"🔍 [DEBUG] 最終的なツール数: {len(tools)}")
-        if tools:
-            for i, tool in enumerate(tools):
-                print(f"🔍 [DEBUG] ツール[{i}]: {tool.get('type', 'unknown')}")
-                if tool.get('type') == 'file_search':
-                    print(f"🔍 [DEBUG]   - vector_store_ids: {tool.get('vector_store_ids', [])}")
+        self._static_tools_cache = (self._config_version, tuple(head), tuple(tail))
+        return self._static_tools_cache[1], self._static_tools_cache[2]
+    
+    def _collect_vector_store_ids(self, session=None) -> List[str]:
+        """
+        file_searchの検索対象となるベクトルストアIDを3層から収集
+        
+        Args:
+            session: Chainlitセッションオブジェクト
+        
+        Returns:
+            会社→個人→チャットの順に並んだベクトルストアIDのリスト（重複なし）
+        """
+        # 層の設定とセッションの辞書は1回だけ引いて使い回す
+        layers = self.config.get("vector_store_layers", {})
+        session_get = session.get if session else (lambda key: None)
+        vs_ids = session_get("vector_store_ids") or {}
+        candidates = []
+        
+        # 1層目：会社全体（.envを優先し、なければ設定更新後のセッション値）
+        # .envの値は設定画面からの更新でos.environが書き換わるため毎回参照する
+        if layers.get("company", True):
+            candidates.append(
+                os.environ.get("COMPANY_VECTOR_STORE_ID")
+                or session_get("company_vs_id")
+                or vs_ids.get("company")
+            )
         
-        return tools if tools else None
+        # 2層目：個人（セッションから）
+        if session and layers.get("personal", True):
+            candidates.append(session_get("personal_vs_id") or vs_ids.get("personal"))
+        
+        # 3層目：チャット（セッションから、互換性のため古い名前もチェック）
+        if session and layers.get("thread", True):
+            candidates.append(
+                session_get("chat_vs_id")
+                or session_get("session_vs_id")
+                or session_get("thread_vs_id")
+                or vs_ids.get("chat")
+                or vs_ids.get("session")
+                or vs_ids.get("thread")
+            )
+        
+        # 同じIDが複数の層に設定されていてもAPIには1回だけ渡す（順序は維持）
+        vector_store_ids = list(dict.fromkeys(
+            vs_id.strip() for vs_id in candidates if vs_id and vs_id.strip()
+        ))
+        
+        if app_logger.logger.isEnabledFor(logging.DEBUG):
+            app_logger.debug(f"file_search対象のベクトルストアID: {vector_store_ids}")
+        return vector_store_ids
+
+# グローバルインスタンス（初回参照時に生成し、import時のファイル読み込みを避ける）
+_instance: Optional[ToolsConfig] = None
+_instance_lock = threading.Lock()
+
+
+def get_tools_config() -> ToolsConfig:
+    """グローバルなToolsConfigを取得（未生成ならここで設定を読み込む）"""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = ToolsConfig()
+    return _instance
 
 
-# グローバルインスタンス
-tools_config = ToolsConfig()
+def __getattr__(name: str):
+    """`from utils.tools_config import tools_config` を従来どおり使えるようにする"""
+    if name == "tools_config":
+        return get_tools_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
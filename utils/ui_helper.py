@@ -4,36 +4,57 @@ Chainlit UI処理の共通ヘルパー
 """
 
 import chainlit as cl
+from contextvars import ContextVar
 from typing import Dict, List, Optional, Any
 
+# format_file_sizeで使う単位（1024倍ごと）
+_FILE_SIZE_UNITS = ("B", "KB", "MB", "GB", "TB")
+
+# リクエスト（Chainlitのハンドラータスク）単位でキャッシュするユーザーID・スレッドID
+_user_id_cv: ContextVar[Optional[str]] = ContextVar("user_id", default=None)
+_thread_id_cv: ContextVar[Optional[str]] = ContextVar("thread_id", default=None)
+
 
 class ChainlitHelper:
     """Chainlit UI操作の共通処理クラス"""
     
+    # メッセージ種別ごとの接頭辞
+    _PREFIX = {
+        "success": "✅ ",
+        "error": "❌ ",
+        "warning": "⚠️ ",
+        "info": "ℹ️ ",
+    }
+    
     @staticmethod
-    async def send_system_message(content: str):
+    async def _send(prefix: str, content: str):
+        """接頭辞付きのシステムメッセージを送信（各send_*_messageの共通処理）"""
+        await cl.Message(content=f"{prefix}{content}", author="System").send()
+    
+    @classmethod
+    async def send_system_message(cls, content: str):
         """システムメッセージを送信"""
-        await cl.Message(content=content, author="System").send()
+        await cls._send("", content)
     
-    @staticmethod
-    async def send_success_message(content: str):
+    @classmethod
+    async def send_success_message(cls, content: str):
         """成功メッセージを送信"""
-        await cl.Message(content=f"✅ {content}", author="System").send()
+        await cls._send(cls._PREFIX["success"], content)
     
-    @staticmethod
-    async def send_error_message(content: str):
+    @classmethod
+    async def send_error_message(cls, content: str):
         """エラーメッセージを送信"""
-        await cl.Message(content=f"❌ {content}", author="System").send()
+        await cls._send(cls._PREFIX["error"], content)
     
-    @staticmethod
-    async def send_warning_message(content: str):
+    @classmethod
+    async def send_warning_message(cls, content: str):
         """警告メッセージを送信"""
-        await cl.Message(content=f"⚠️ {content}", author="System").send()
+        await cls._send(cls._PREFIX["warning"], content)
     
-    @staticmethod
-    async def send_info_message(content: str):
+    @classmethod
+    async def send_info_message(cls, content: str):
         """情報メッセージを送信"""
-        await cl.Message(content=f"ℹ️ {content}", author="System").send()
+        await cls._send(cls._PREFIX["info"], content)
     
     @staticmethod
     def get_session(key: str, default=None):
@@ -44,19 +65,39 @@ class ChainlitHelper:
     def set_session(key: str, value):
         """セッション値を設定"""
         cl.user_session.set(key, value)
+        # キャッシュ済みの値が古くならないようにする
+        if key == "user":
+            _user_id_cv.set(None)
+        elif key == "thread_id":
+            _thread_id_cv.set(None)
+    
+    @staticmethod
+    def reset_request_cache():
+        """リクエスト単位のキャッシュをクリア（ハンドラーの開始時に呼ぶ）"""
+        _user_id_cv.set(None)
+        _thread_id_cv.set(None)
     
     @staticmethod
     def get_user_id() -> str:
-        """現在のユーザーIDを取得"""
-        user = cl.user_session.get("user")
-        if user and hasattr(user, 'identifier'):
-            return user.identifier
-        return "anonymous"
+        """現在のユーザーIDを取得（リクエスト内では初回のみセッションを参照）"""
+        user_id = _user_id_cv.get()
+        if user_id is None:
+            user = cl.user_session.get("user")
+            user_id = getattr(user, 'identifier', None) if user else None
+            if user_id is None:
+                user_id = "anonymous"
+            _user_id_cv.set(user_id)
+        return user_id
     
     @staticmethod
     def get_thread_id() -> Optional[str]:
-        """現在のスレッドIDを取得"""
-        return cl.user_session.get("thread_id")
+        """現在のスレッドIDを取得（リクエスト内では初回のみセッションを参照）"""
+        thread_id = _thread_id_cv.get()
+        if thread_id is None:
+            thread_id = cl.user_session.get("thread_id")
+            if thread_id is not None:
+                _thread_id_cv.set(thread_id)
+        return thread_id
     
     @staticmethod
     async def ask_confirmation(message: str) -> bool:
@@ -67,27 +108,24 @@ class ChainlitHelper:
     @staticmethod
     def format_file_size(size: int) -> str:
         """ファイルサイズを人間が読みやすい形式でフォーマット"""
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size < 1024.0:
-                return f"{size:.1f}{unit}"
-            size /= 1024.0
-        return f"{size:.1f}TB"
+        # ビット長から単位を直接求める（1024 = 2**10 ごとに単位が上がる）
+        index = min((max(int(size), 1).bit_length() - 1) // 10, len(_FILE_SIZE_UNITS) - 1)
+        return f"{size / (1 << (index * 10)):.1f}{_FILE_SIZE_UNITS[index]}"
     
     @staticmethod
     def format_model_list(models: List[str]) -> str:
         """モデルリストを表示用にフォーマット"""
-        return "\n".join([f"• {model}" for model in models])
+        return "\n".join(f"• {model}" for model in models)
     
     @staticmethod
     def format_vector_store_info(vs_info: Dict) -> str:
         """ベクトルストア情報を表示用にフォーマット"""
-        lines = [
-            f"🗂️ **{vs_info.get('name', 'Unknown')}**",
-            f"📊 ID: `{vs_info.get('id', 'N/A')}`",
-            f"📈 ファイル数: {vs_info.get('file_counts', {}).get('total', 0)}",
+        return (
+            f"🗂️ **{vs_info.get('name', 'Unknown')}**\n"
+            f"📊 ID: `{vs_info.get('id', 'N/A')}`\n"
+            f"📈 ファイル数: {vs_info.get('file_counts', {}).get('total', 0)}\n"
             f"📅 作成日: {vs_info.get('created_at', 'Unknown')}"
-        ]
-        return "\n".join(lines)
+        )
     
     @staticmethod
     async def show_loading_message(message: str = "処理中...") -> cl.Message:
@@ -101,6 +139,14 @@ class ChainlitHelper:
         """ローディングメッセージを更新"""
         loading_msg.content = new_content
         await loading_msg.update()
+    
+    @staticmethod
+    async def append_loading_message(loading_msg: cl.Message, delta: str):
+        """
+        ローディングメッセージに追記（差分のみを送信する）
+        段階的な進捗表示にはupdate_loading_messageで全文を再送せずこちらを使う
+        """
+        await loading_msg.stream_token(delta)
 
 
 # 短縮形のエイリアス
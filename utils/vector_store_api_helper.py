@@ -3,12 +3,171 @@
 OpenAI SDKの異なるバージョンに対応
 """
 
-from typing import Optional, Any, List, Dict
+import asyncio
+import logging
+import random
+import sys
+import time
+from dataclasses import dataclass
+from itertools import islice
+from operator import attrgetter
+from typing import Optional, Any, AsyncIterator, Awaitable, Callable, List, Dict, NamedTuple
+
+from .logger import app_logger
+
+# APIが対応している操作のフラグ（解決時に1回だけ判定する）
+HAS_CREATE_AND_POLL = 1     # file_batches.create_and_poll
+HAS_BATCH_RETRIEVE = 2      # file_batches.create + file_batches.retrieve
+FILES_HAS_CREATE = 4        # ファイルAPIのcreate
+FILES_HAS_LIST = 8          # ファイルAPIのlist
+
+
+
+@dataclass(slots=True)
+class _Resolved:
+    """
+    クライアントごとのAPI解決結果（呼び出すメソッドは解決時に取得しておく。未対応はNone）
+    クライアントごとに保持するため__slots__で__dict__を持たせない
+    """
+    vs_api: Optional[Any]
+    vs_files_api: Optional[Any]
+    caps: int
+    create: Optional[Callable]
+    list: Optional[Callable]
+    retrieve: Optional[Callable]
+    delete: Optional[Callable]
+    update: Optional[Callable]
+    files_create: Optional[Callable]
+    files_list: Optional[Callable]
+    batches_create_and_poll: Optional[Callable]
+    batches_create: Optional[Callable]
+    batches_retrieve: Optional[Callable]
+
+
+# API解決結果を保存するクライアントの属性名
+# 解決結果はクライアントを参照するメソッドを持つため、外部の辞書ではなくクライアント自身に持たせる
+# （クライアントと一緒に破棄される）。見つからなかった結果も保存する
+_RESOLVED_ATTR = "_vs_api_resolved"
+# キャッシュの世代（全クライアント分の破棄は世代を進めて古い解決結果を無効にする）
+_cache_generation = 0
+# キャッシュ未登録を表す番兵（同一性で判定する）
+_MISSING = object()
+# betaの下でベクトルストアAPIが取り得る名前（SDKバージョンによる違い）
+_BETA_VS_CANDIDATES = ("vector_stores", "vectorStores", "vector_store", "vectorstore")
+# ファイル一覧の1ページあたりの件数（APIの上限。ページ数＝往復回数を減らす）
+_FILES_PAGE_LIMIT = 100
+# ファイル一覧の各行から取り出す属性
+_FILE_FIELDS = attrgetter("id", "created_at", "status")
+# 状態が取得できないファイルの既定値
+_DEFAULT_FILE_STATUS = "processed"
+
+
+async def poll_until(
+    check: Callable[[], Awaitable[Any]],
+    *,
+    initial: float = 0.25,
+    cap: float = 2.0,
+    max_total: float = 30.0
+) -> Optional[Any]:
+    """
+    処理完了までポーリング（指数バックオフ＋ジッター）
+    すぐ終わる処理は短い間隔で検出し、長い処理ではリクエスト頻度を抑える
+    
+    Args:
+        check: 状態を確認するコルーチン関数（完了したら None 以外を返す）
+        initial: 最初の待機秒数
+        cap: 待機秒数の上限
+        max_total: 全体の待機上限（秒）
+    
+    Returns:
+        checkが返した値、タイムアウト時は None
+    """
+    deadline = time.monotonic() + max_total
+    delay = initial
+    while True:
+        result = await check()
+        if result is not None:
+            return result
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        await asyncio.sleep(min(delay + random.uniform(0, delay * 0.1), remaining))
+        delay = min(cap, delay * 2)
+
+
+def _resolve(client: Any) -> _Resolved:
+    """クライアントのAPI解決結果を取得（クライアントごとにキャッシュ、属性を持てないクライアントは毎回解決）"""
+    try:
+        entry = client.__dict__.get(_RESOLVED_ATTR, _MISSING)
+    except AttributeError:
+        return _resolve_apis(client)
+    if entry is not _MISSING and entry[0] == _cache_generation:
+        return entry[1]
+    resolved = _resolve_apis(client)
+    client.__dict__[_RESOLVED_ATTR] = (_cache_generation, resolved)
+    return resolved
+
+
+def clear_vector_store_api_cache(client: Any = None) -> None:
+    """
+    API解決結果のキャッシュを破棄（SDKの差し替え時やテスト用）
+    見つからなかった結果もキャッシュされるため、再判定させたい場合に使う
+    
+    Args:
+        client: 対象のクライアント（省略時は全クライアント）
+    """
+    global _cache_generation
+    if client is None:
+        _cache_generation += 1
+        return
+    try:
+        client.__dict__.pop(_RESOLVED_ATTR, None)
+    except AttributeError:
+        pass
+
+
+def _resolve_apis(client: Any) -> _Resolved:
+    """APIを判定し、対応している操作のフラグと呼び出すメソッドをまとめる"""
+    vs_api = _resolve_vector_store_api(client)
+    vs_files_api = _resolve_vector_store_files_api(vs_api)
+    batches_api = getattr(vs_api, "file_batches", None)
+    # 各メソッドは1回のgetattrで取得し、フラグもその結果から決める（hasattr後に再取得しない）
+    files_create = getattr(vs_files_api, "create", None)
+    files_list = getattr(vs_files_api, "list", None)
+    batches_create_and_poll = getattr(batches_api, "create_and_poll", None)
+    batches_create = getattr(batches_api, "create", None)
+    batches_retrieve = getattr(batches_api, "retrieve", None)
+    
+    caps = 0
+    if batches_create_and_poll is not None:
+        caps |= HAS_CREATE_AND_POLL
+    if batches_create is not None and batches_retrieve is not None:
+        caps |= HAS_BATCH_RETRIEVE
+    if files_create is not None:
+        caps |= FILES_HAS_CREATE
+    if files_list is not None:
+        caps |= FILES_HAS_LIST
+    
+    return _Resolved(
+        vs_api=vs_api,
+        vs_files_api=vs_files_api,
+        caps=caps,
+        create=getattr(vs_api, "create", None),
+        list=getattr(vs_api, "list", None),
+        retrieve=getattr(vs_api, "retrieve", None),
+        delete=getattr(vs_api, "delete", None),
+        update=getattr(vs_api, "update", None),
+        files_create=files_create,
+        files_list=files_list,
+        batches_create_and_poll=batches_create_and_poll,
+        batches_create=batches_create,
+        batches_retrieve=batches_retrieve,
+    )
 
 
 def get_vector_store_api(client: Any) -> Optional[Any]:
     """
-    利用可能なベクトルストアAPIを取得
+    利用可能なベクトルストアAPIを取得（クライアントごとに1回だけ判定）
     
     Args:
         client: OpenAIクライアント（同期または非同期）
@@ -16,37 +175,46 @@ def get_vector_store_api(client: Any) -> Optional[Any]:
     Returns:
         ベクトルストアAPI、または None
     """
+    return _resolve(client).vs_api
+
+
+def _resolve_vector_store_api(client: Any) -> Optional[Any]:
+    """ベクトルストアAPIを判定"""
     # パターン1: 直接vector_stores (Responses API)
-    if hasattr(client, 'vector_stores'):
-        print("✅ vector_stores APIを使用（Responses API）")
-        return client.vector_stores
+    vs_api = getattr(client, 'vector_stores', None)
+    if vs_api is not None:
+        app_logger.debug("✅ vector_stores APIを使用（Responses API）")
+        return vs_api
     
     # パターン2: beta.vector_stores (Beta API)
-    if hasattr(client, 'beta') and hasattr(client.beta, 'vector_stores'):
-        print("✅ beta.vector_stores APIを使用（Beta API）")
-        return client.beta.vector_stores
-    
-    # パターン3: betaの下の異なる名前をチェック
-    if hasattr(client, 'beta'):
-        beta_attrs = dir(client.beta)
-        # ベクトル関連の属性を探す
-        for attr in beta_attrs:
-            if 'vector' in attr.lower() and 'store' in attr.lower():
-                print(f"✅ beta.{attr} APIを使用")
-                return getattr(client.beta, attr)
+    # パターン3: betaの下の異なる名前（dir()を走査せず既知の候補名だけ試す）
+    beta = getattr(client, 'beta', None)
+    if beta is not None:
+        for attr in _BETA_VS_CANDIDATES:
+            api = getattr(beta, attr, None)
+            if api is not None:
+                app_logger.debug(f"✅ beta.{attr} APIを使用")
+                return api
     
     # 見つからない場合
-    print("❌ ベクトルストアAPIが見つかりません")
-    print(f"   利用可能な属性: {dir(client)[:10]}...")  # 最初の10個だけ表示
-    if hasattr(client, 'beta'):
-        print(f"   Beta属性: {dir(client.beta)[:10]}...")  # 最初の10個だけ表示
+    app_logger.error("❌ ベクトルストアAPIが見つかりません")
+    # 属性一覧の作成は重いため、DEBUGログが有効な場合のみ行う
+    if app_logger.logger.isEnabledFor(logging.DEBUG):
+        app_logger.debug(f"利用可能な属性: {_public_attrs(client)}...")
+        if beta is not None:
+            app_logger.debug(f"Beta属性: {_public_attrs(beta)}...")
     
     return None
 
 
+def _public_attrs(obj: Any, limit: int = 10) -> List[str]:
+    """診断表示用に公開属性名を先頭からlimit個だけ取得"""
+    return list(islice((attr for attr in dir(obj) if not attr.startswith("_")), limit))
+
+
 def get_vector_store_files_api(client: Any) -> Optional[Any]:
     """
-    利用可能なベクトルストアファイルAPIを取得
+    利用可能なベクトルストアファイルAPIを取得（クライアントごとに1回だけ判定）
     
     Args:
         client: OpenAIクライアント（同期または非同期）
@@ -54,18 +222,23 @@ def get_vector_store_files_api(client: Any) -> Optional[Any]:
     Returns:
         ベクトルストアファイルAPI、または None
     """
-    # まずベクトルストアAPIを取得
-    vs_api = get_vector_store_api(client)
+    return _resolve(client).vs_files_api
+
+
+def _resolve_vector_store_files_api(vs_api: Optional[Any]) -> Optional[Any]:
+    """ベクトルストアAPIからファイルAPIを判定"""
+    if vs_api is None:
+        return None
     
-    if vs_api and hasattr(vs_api, 'files'):
-        return vs_api.files
+    files_api = getattr(vs_api, 'files', None)
+    if files_api is not None:
+        return files_api
     
     # file_batchesもチェック（一部のSDKバージョンでは異なる名前）
-    if vs_api and hasattr(vs_api, 'file_batches'):
-        print("⚠️ file_batchesを使用（filesの代わり）")
-        return vs_api.file_batches
-    
-    return None
+    batches_api = getattr(vs_api, 'file_batches', None)
+    if batches_api is not None:
+        app_logger.warning("⚠️ file_batchesを使用（filesの代わり）")
+    return batches_api
 
 
 async def safe_create_vector_store(client: Any, name: str, metadata: dict = None) -> Optional[str]:
@@ -81,28 +254,28 @@ async def safe_create_vector_store(client: Any, name: str, metadata: dict = None
         作成されたベクトルストアID、またはNone
     """
     try:
-        vs_api = get_vector_store_api(client)
-        if not vs_api:
+        create = _resolve(client).create
+        if create is None:
             return None
         
         # メタデータ付きで作成を試みる
         if metadata:
             try:
-                vector_store = await vs_api.create(
+                vector_store = await create(
                     name=name,
                     metadata=metadata
                 )
             except TypeError:
                 # metadataパラメータがサポートされていない場合
-                print("⚠️ メタデータはサポートされていません")
-                vector_store = await vs_api.create(name=name)
+                app_logger.warning("⚠️ メタデータはサポートされていません")
+                vector_store = await create(name=name)
         else:
-            vector_store = await vs_api.create(name=name)
+            vector_store = await create(name=name)
         
         return vector_store.id
         
     except Exception as e:
-        print(f"❌ ベクトルストア作成エラー: {e}")
+        app_logger.error(f"❌ ベクトルストア作成エラー: {e}")
         return None
 
 
@@ -117,15 +290,15 @@ async def safe_list_vector_stores(client: Any) -> list:
         ベクトルストアのリスト
     """
     try:
-        vs_api = get_vector_store_api(client)
-        if not vs_api:
+        list_stores = _resolve(client).list
+        if list_stores is None:
             return []
         
-        result = await vs_api.list()
-        return result.data if hasattr(result, 'data') else []
+        result = await list_stores()
+        return getattr(result, 'data', [])
         
     except Exception as e:
-        print(f"❌ ベクトルストア一覧取得エラー: {e}")
+        app_logger.error(f"❌ ベクトルストア一覧取得エラー: {e}")
         return []
 
 
@@ -141,14 +314,14 @@ async def safe_retrieve_vector_store(client: Any, vs_id: str) -> Optional[Any]:
         ベクトルストアオブジェクト、またはNone
     """
     try:
-        vs_api = get_vector_store_api(client)
-        if not vs_api:
+        retrieve = _resolve(client).retrieve
+        if retrieve is None:
             return None
         
-        return await vs_api.retrieve(vs_id)
+        return await retrieve(vs_id)
         
     except Exception as e:
-        print(f"❌ ベクトルストア取得エラー: {e}")
+        app_logger.error(f"❌ ベクトルストア取得エラー: {e}")
         return None
 
 
@@ -164,18 +337,39 @@ async def safe_delete_vector_store(client: Any, vs_id: str) -> bool:
         成功/失敗
     """
     try:
-        vs_api = get_vector_store_api(client)
-        if not vs_api:
+        delete = _resolve(client).delete
+        if delete is None:
             return False
         
-        await vs_api.delete(vs_id)
+        await delete(vs_id)
         return True
         
     except Exception as e:
-        print(f"❌ ベクトルストア削除エラー: {e}")
+        app_logger.error(f"❌ ベクトルストア削除エラー: {e}")
         return False
 
 
+async def safe_delete_vector_stores(client: Any, vs_ids: List[str], *, concurrency: int = 16) -> List[bool]:
+    """
+    複数のベクトルストアを並行して削除
+    
+    Args:
+        client: 非同期OpenAIクライアント
+        vs_ids: 削除するベクトルストアIDのリスト
+        concurrency: 同時に実行する削除の上限（レート制限対策）
+    
+    Returns:
+        vs_idsと同じ順序の成功/失敗のリスト
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def _one(vs_id: str) -> bool:
+        async with semaphore:
+            return await safe_delete_vector_store(client, vs_id)
+    
+    return list(await asyncio.gather(*map(_one, vs_ids)))
+
+
 async def safe_update_vector_store(client: Any, vs_id: str, name: str = None, metadata: dict = None) -> bool:
     """
     安全にベクトルストアを更新
@@ -190,21 +384,23 @@ async def safe_update_vector_store(client: Any, vs_id: str, name: str = None, me
         成功/失敗
     """
     try:
-        vs_api = get_vector_store_api(client)
-        if not vs_api:
+        update = _resolve(client).update
+        if update is None:
             return False
         
-        kwargs = {"vector_store_id": vs_id}
-        if name:
-            kwargs["name"] = name
-        if metadata:
-            kwargs["metadata"] = metadata
-        
-        await vs_api.update(**kwargs)
+        # 指定された項目だけを渡す（未指定の項目はSDKのデフォルトのまま）
+        if name is not None and metadata is not None:
+            await update(vector_store_id=vs_id, name=name, metadata=metadata)
+        elif name is not None:
+            await update(vector_store_id=vs_id, name=name)
+        elif metadata is not None:
+            await update(vector_store_id=vs_id, metadata=metadata)
+        else:
+            await update(vector_store_id=vs_id)
         return True
         
     except Exception as e:
-        print(f"❌ ベクトルストア更新エラー: {e}")
+        app_logger.error(f"❌ ベクトルストア更新エラー: {e}")
         return False
 
 
@@ -221,30 +417,25 @@ async def safe_add_file_to_vector_store(client: Any, vs_id: str, file_id: str) -
         成功/失敗
     """
     try:
-        vs_files_api = get_vector_store_files_api(client)
-        if not vs_files_api:
+        files_create = _resolve(client).files_create
+        if files_create is None:
             return False
         
-        # files APIにcreateがある場合
-        if hasattr(vs_files_api, "create"):
-            # 2系統（files.create と file_batches.create）が存在し得るため
-            # 引数名で分岐（files: file_id / file_batches: file_ids）
-            try:
-                await vs_files_api.create(vector_store_id=vs_id, file_id=file_id)
-                return True
-            except TypeError:
-                # file_batches系のcreate
-                await vs_files_api.create(vector_store_id=vs_id, file_ids=[file_id])
-                return True
-        
-        return False
+        # 2系統（files.create と file_batches.create）が存在し得るため
+        # 引数名で分岐（files: file_id / file_batches: file_ids）
+        try:
+            await files_create(vector_store_id=vs_id, file_id=file_id)
+        except TypeError:
+            # file_batches系のcreate
+            await files_create(vector_store_id=vs_id, file_ids=[file_id])
+        return True
         
     except Exception as e:
-        print(f"❌ ファイル追加エラー: {e}")
+        app_logger.error(f"❌ ファイル追加エラー: {e}")
         return False
 
 
-async def safe_attach_file_to_vector_store_and_poll(client: Any, vs_id: str, file_id: str) -> bool:
+async def safe_attach_file_to_vector_store_and_poll(client: Any, vs_id: str, file_id: str, timeout: float = 60.0) -> bool:
     """
     ファイルをベクトルストアに追加し、処理完了までポーリング
 
@@ -252,82 +443,153 @@ async def safe_attach_file_to_vector_store_and_poll(client: Any, vs_id: str, fil
     1) file_batches.create_and_poll
     2) file_batches.create → retrieve で手動ポーリング
     3) files.create （ポーリングなし。SDKにより自動処理）
+
+    timeoutは2)の手動ポーリングで待つ上限（秒）
     """
     try:
-        vs_api = get_vector_store_api(client)
-        if not vs_api:
+        r = _resolve(client)
+        if r.vs_api is None:
             return False
 
         # file_batchesのcreate_and_pollがあれば最優先
-        if hasattr(vs_api, "file_batches") and hasattr(vs_api.file_batches, "create_and_poll"):
-            batch = await vs_api.file_batches.create_and_poll(
+        if r.caps & HAS_CREATE_AND_POLL:
+            batch = await r.batches_create_and_poll(
                 vector_store_id=vs_id, file_ids=[file_id]
             )
             status = getattr(batch, "status", "completed")
             return status == "completed"
 
         # 次点: create → retrieve で手動ポーリング
-        if hasattr(vs_api, "file_batches") and hasattr(vs_api.file_batches, "create") and hasattr(vs_api.file_batches, "retrieve"):
-            created = await vs_api.file_batches.create(
+        if r.caps & HAS_BATCH_RETRIEVE:
+            batches_retrieve = r.batches_retrieve
+            created = await r.batches_create(
                 vector_store_id=vs_id, file_ids=[file_id]
             )
             batch_id = getattr(created, "id", None)
             if not batch_id:
                 return False
-            # 簡易ポーリング（最大30秒）
-            import asyncio
-            waited = 0
-            while waited < 30:
-                batch = await vs_api.file_batches.retrieve(
+            # すぐ終わるバッチは短い間隔で検出し、長いものは間隔を広げてポーリング
+            async def check_batch():
+                batch = await batches_retrieve(
                     vector_store_id=vs_id, batch_id=batch_id
                 )
                 status = getattr(batch, "status", "completed")
-                if status in ("completed", "failed"):
-                    return status == "completed"
-                await asyncio.sleep(2)
-                waited += 2
-            return False
+                return status if status in ("completed", "failed", "cancelled") else None
+
+            status = await poll_until(check_batch, initial=0.1, max_total=timeout)
+            return status == "completed"
 
         # 最後にfiles.create（ポーリングなし）
-        vs_files_api = get_vector_store_files_api(client)
-        if vs_files_api and hasattr(vs_files_api, "create"):
-            await vs_files_api.create(vector_store_id=vs_id, file_id=file_id)
+        if r.caps & FILES_HAS_CREATE:
+            await r.files_create(vector_store_id=vs_id, file_id=file_id)
             return True
 
         return False
     except Exception as e:
-        print(f"❌ ファイル追加+ポーリングエラー: {e}")
+        app_logger.error(f"❌ ファイル追加+ポーリングエラー: {e}")
         return False
 
 
-async def safe_list_vector_store_files(client: Any, vs_id: str) -> List[Dict]:
+async def safe_add_files_to_vector_store(client: Any, vs_id: str, file_ids: List[str], max_concurrency: int = 16) -> bool:
     """
-    ベクトルストア内のファイル一覧を安全に取得
-    戻り値は {id, created_at, status} の辞書配列
+    複数のファイルをベクトルストアに追加し、処理完了まで待つ
+    file_batches.create_and_pollがあれば1回のバッチ登録で、なければ並行して1件ずつ追加する
+    
+    Args:
+        client: 非同期OpenAIクライアント
+        vs_id: ベクトルストアID
+        file_ids: ファイルIDのリスト
+        max_concurrency: 1件ずつ追加する場合の同時実行数の上限
+    
+    Returns:
+        全ファイルの追加に成功したか
     """
+    if not file_ids:
+        return True
     try:
-        vs_files_api = get_vector_store_files_api(client)
-        if not vs_files_api:
-            return []
+        r = _resolve(client)
+        if r.vs_api is None:
+            return False
+        
+        if r.caps & HAS_CREATE_AND_POLL:
+            batch = await r.batches_create_and_poll(vector_store_id=vs_id, file_ids=list(file_ids))
+            status = getattr(batch, "status", "completed")
+            if status != "completed":
+                app_logger.warning(f'⚠️ ファイルのバッチ追加が完了しませんでした: {status} ({getattr(batch, "file_counts", None)})')
+            return status == "completed"
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def _one(file_id: str) -> bool:
+            async with semaphore:
+                return await safe_attach_file_to_vector_store_and_poll(client, vs_id, file_id)
+        
+        results = await asyncio.gather(*(_one(file_id) for file_id in file_ids))
+        failed_ids = [file_id for file_id, ok in zip(file_ids, results, strict=True) if not ok]
+        if failed_ids:
+            app_logger.warning(f'⚠️ ベクトルストアへの追加に失敗したファイル: {", ".join(failed_ids)}')
+        return not failed_ids
+    except Exception as e:
+        app_logger.error(f"❌ ファイル一括追加エラー: {e}")
+        return False
 
-        # files.list が一般的
-        if hasattr(vs_files_api, "list"):
-            result = await vs_files_api.list(vector_store_id=vs_id)
-            data = getattr(result, "data", [])
-            files: List[Dict] = []
-            for f in data:
-                files.append(
-                    {
-                        "id": getattr(f, "id", None),
-                        "created_at": getattr(f, "created_at", 0),
-                        "status": getattr(f, "status", "processed"),
-                    }
-                )
-            return files
 
-        return []
+class VSFile(NamedTuple):
+    """ベクトルストア内のファイル1件（辞書より小さく、一覧が大きくてもメモリを抑えられる）"""
+    id: Optional[str]
+    created_at: int
+    status: str
+
+
+def _to_vs_file(f: Any) -> VSFile:
+    """SDKのファイルオブジェクトをVSFileに変換"""
+    try:
+        # SDKのオブジェクトは3属性を必ず持つため、C実装のattrgetterでまとめて取得
+        file_id, created_at, status = _FILE_FIELDS(f)
+    except AttributeError:
+        # 属性が欠けた古いSDKのオブジェクトはデフォルト値で補う
+        file_id = getattr(f, "id", None)
+        created_at = getattr(f, "created_at", 0)
+        status = getattr(f, "status", _DEFAULT_FILE_STATUS)
+    # 状態は数種類の値しか取らないため、行ごとに別の文字列オブジェクトを持たせず共有する
+    if type(status) is str:
+        status = sys.intern(status)
+    return VSFile(file_id, created_at, status)
+
+
+async def iter_vector_store_files(client: Any, vs_id: str) -> AsyncIterator[VSFile]:
+    """
+    ベクトルストア内のファイルを全ページ順に返す（一覧全体をメモリに溜めない）
+    エラーはそのまま呼び出し元に送出する
+    
+    Args:
+        client: 非同期OpenAIクライアント
+        vs_id: ベクトルストアID
+    """
+    files_list = _resolve(client).files_list
+    if files_list is None:
+        return
+    
+    # 1ページ目だけで打ち切らないよう、SDKのページオブジェクトで全ページを辿る
+    # （カーソル方式のため次ページの取得は前ページの結果待ちになり並行化できない）
+    result = await files_list(vector_store_id=vs_id, limit=_FILES_PAGE_LIMIT)
+    if hasattr(result, "__aiter__"):
+        async for f in result:
+            yield _to_vs_file(f)
+    else:
+        for f in getattr(result, "data", []):
+            yield _to_vs_file(f)
+
+
+async def safe_list_vector_store_files(client: Any, vs_id: str) -> List[Dict]:
+    """
+    ベクトルストア内のファイル一覧を安全に取得（全ページ）
+    戻り値は {id, created_at, status} の辞書配列（逐次処理で足りる場合はiter_vector_store_filesを使う）
+    """
+    try:
+        return [f._asdict() async for f in iter_vector_store_files(client, vs_id)]
     except Exception as e:
-        print(f"❌ ファイル一覧取得エラー: {e}")
+        app_logger.error(f"❌ ファイル一覧取得エラー: {e}")
         return []
 
 
@@ -338,9 +600,10 @@ async def safe_retrieve_file_metadata(client: Any, file_id: str) -> Optional[Dic
     Returns: {id, filename, bytes, created_at} or None
     """
     try:
-        if not hasattr(client, "files"):
+        files_api = getattr(client, "files", None)
+        if files_api is None:
             return None
-        f = await client.files.retrieve(file_id)
+        f = await files_api.retrieve(file_id)
         if not f:
             return None
         return {
@@ -350,5 +613,5 @@ async def safe_retrieve_file_metadata(client: Any, file_id: str) -> Optional[Dic
             "created_at": getattr(f, "created_at", None),
         }
     except Exception as e:
-        print(f"❌ ファイルメタ取得エラー({file_id}): {e}")
+        app_logger.error(f"❌ ファイルメタ取得エラー({file_id}): {e}")
         return None
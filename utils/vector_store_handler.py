@@ -37,18 +37,22 @@ AIアプリケーションで文書を検索可能にするための「ベクト
 - 2025-08-28: Pydantic設定システム対応、pathlib使用、初心者向けコメント追加
 """
 
+import base64
 import os
+import re
 import json
 import shutil
+import time
+import traceback
+from types import MappingProxyType
 from typing import Dict, List, Optional, Tuple, Any
 from openai import OpenAI, AsyncOpenAI
 import asyncio
 from datetime import datetime, timedelta
-import aiofiles
-import mimetypes
 from pathlib import Path
 import chainlit as cl
 from .logger import app_logger
+from .http_client import get_async_http_client, get_http_client
 # from utils.project_settings import get_app_settings, get_project_paths, get_mime_settings
 from utils.vector_store_api_helper import (
     get_vector_store_api,
@@ -57,7 +61,13 @@ from utils.vector_store_api_helper import (
     safe_list_vector_stores,
     safe_retrieve_vector_store,
     safe_delete_vector_store,
-    safe_update_vector_store
+    safe_delete_vector_stores,
+    safe_update_vector_store,
+    safe_add_files_to_vector_store,
+    safe_attach_file_to_vector_store_and_poll,
+    safe_list_vector_store_files,
+    safe_retrieve_file_metadata,
+    poll_until
 )
 
 # 設定システムから取得（一時的にコメントアウト）
@@ -89,45 +99,60 @@ class VectorStoreHandler:
       → OpenAIの最新API仕様に準拠
     """
     
+    # サポートされるファイル形式（拡張子 → MIME型）
+    # 一時的にハードコーディング（設定システム修正後に元に戻す）
+    _SUPPORTED_FILE_TYPES = MappingProxyType({
+        # テキスト形式
+        '.c': 'text/x-c',
+        '.cpp': 'text/x-c++',
+        '.cs': 'text/x-csharp',
+        '.css': 'text/css',
+        '.go': 'text/x-golang',
+        '.html': 'text/html',
+        '.java': 'text/x-java',
+        '.js': 'text/javascript',
+        '.json': 'application/json',
+        '.md': 'text/markdown',
+        '.php': 'text/x-php',
+        '.py': 'text/x-python',
+        '.rb': 'text/x-ruby',
+        '.sh': 'application/x-sh',
+        '.tex': 'text/x-tex',
+        '.ts': 'application/typescript',
+        '.txt': 'text/plain',
+        
+        # ドキュメント形式
+        '.doc': 'application/msword',
+        '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+        '.pdf': 'application/pdf',
+        '.pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+    })
+    # 拡張子の所属判定用（アップロードごとに辞書を作らない）
+    _SUPPORTED_EXT_SET = frozenset(_SUPPORTED_FILE_TYPES)
+    # OpenAI Files APIの1ファイルあたりのサイズ上限
+    # アップロードはファイルオブジェクトを渡してhttpxに順次読み出させるため、メモリ使用量はこの値に依存しない
+    MAX_UPLOAD_SIZE = 512 * 1024 * 1024
+    
     @property
     def SUPPORTED_FILE_TYPES(self) -> Dict[str, str]:
         """サポートされるファイル形式（設定から取得）
         
         🎯 目的: アップロード可能なファイルの種類を定義
-        📋 動作: 中央設定システムからMIME型マッピングを取得
+        📋 動作: クラス定数のMIME型マッピング（読み取り専用）を返す
         💡 初心者向け: .txt, .pdf, .py などの拡張子に対応するファイル種別辞書を返す
         
         Returns:
             Dict[str, str]: ファイル拡張子とMIME型の対応辞書
                            例: {'.txt': 'text/plain', '.pdf': 'application/pdf'}
         """
-        # 一時的にハードコーディング（設定システム修正後に元に戻す）
-        return {
-            # テキスト形式
-            '.c': 'text/x-c',
-            '.cpp': 'text/x-c++',
-            '.cs': 'text/x-csharp',
-            '.css': 'text/css',
-            '.go': 'text/x-golang',
-            '.html': 'text/html',
-            '.java': 'text/x-java',
-            '.js': 'text/javascript',
-            '.json': 'application/json',
-            '.md': 'text/markdown',
-            '.php': 'text/x-php',
-            '.py': 'text/x-python',
-            '.rb': 'text/x-ruby',
-            '.sh': 'application/x-sh',
-            '.tex': 'text/x-tex',
-            '.ts': 'application/typescript',
-            '.txt': 'text/plain',
-            
-            # ドキュメント形式
-            '.doc': 'application/msword',
-            '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            '.pdf': 'application/pdf',
-            '.pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
-        }
+        return self._SUPPORTED_FILE_TYPES
+    
+    @staticmethod
+    def _file_extension(filename: str) -> str:
+        """ファイル名から小文字の拡張子を取得（Path(filename).suffix.lower()と同じ結果をPathを作らずに得る）"""
+        dot = filename.rfind('.')
+        sep = max(filename.rfind('/'), filename.rfind('\\'))
+        return filename[dot:].lower() if dot > sep + 1 else ''
     
     def __init__(self):
         """クラスの初期化処理
@@ -156,6 +181,9 @@ class VectorStoreHandler:
         self._ownership_cache = {}      # ベクトルストアの所有者情報をメモリに保存
         self._session_vs_cache = {}     # セッション用ベクトルストアの情報をキャッシュ
         self._user_preferences = {}     # ユーザー設定をメモリに保存（高速アクセス用）
+        self._vs_info_cache: Dict[str, Tuple[float, Dict]] = {}  # ベクトルストア情報（取得時刻, 情報）
+        self.vs_info_cache_ttl = 30     # ベクトルストア情報を再利用する秒数
+        self._background_tasks = set()  # 完了を待たないバックグラウンドタスク（GC防止用に参照を保持）
         
         # 自動削除設定（リソース節約のため）
         self.auto_delete_hours = 24     # 24時間後に一時ファイルを自動削除
@@ -190,6 +218,8 @@ class VectorStoreHandler:
         💡 初心者向け: OpenAI APIを使うための「電話回線」のようなものを準備します
         """
         app_logger.debug("🔧 OpenAIクライアント初期化中...")
+        # SDKがvector_stores（Responses API系）を直接持つか（クライアント作成時に1回だけ判定）
+        self._has_responses_vs = False
         
         if not self.api_key or self.api_key == "your_api_key_here":
             app_logger.warning("⚠️ OpenAI APIキーが設定されていません")
@@ -206,33 +236,18 @@ class VectorStoreHandler:
         if proxy_enabled:
             app_logger.debug("HTTP/HTTPSプロキシ", http=http_proxy or '未設定', https=https_proxy or '未設定')
         
-        # httpxクライアントの設定
-        http_client = None
-        async_http_client = None
-        
+        # httpxクライアントの設定（他のハンドラーと接続プールを共有）
+        proxies = {}
         if proxy_enabled and (http_proxy or https_proxy):
-            import httpx
-            proxies = {}
             if http_proxy:
                 proxies["http://"] = http_proxy
             if https_proxy:
                 proxies["https://"] = https_proxy
             
             app_logger.debug("🔄 httpxクライアントをプロキシ設定で作成")
-            
-            # タイムアウト設定を追加
-            timeout = httpx.Timeout(60.0, connect=10.0)
-            
-            http_client = httpx.Client(
-                proxies=proxies,
-                timeout=timeout,
-                verify=True
-            )
-            async_http_client = httpx.AsyncClient(
-                proxies=proxies,
-                timeout=timeout,
-                verify=True
-            )
+        
+        http_client = get_http_client(proxies)
+        async_http_client = get_async_http_client(proxies)
         
         try:
             # 同期クライアント
@@ -251,7 +266,10 @@ class VectorStoreHandler:
                 timeout=60.0
             )
             
-            app_logger.info("✅ OpenAIクライアント初期化完了")
+            vs_api = getattr(self.async_client, 'vector_stores', None)
+            self._has_responses_vs = vs_api is not None and hasattr(vs_api, 'files')
+            
+            app_logger.info("✅ OpenAIクライアント初期化完了", responses_vector_stores=self._has_responses_vs)
             
         except Exception as e:
             app_logger.error("❌ OpenAIクライアント初期化エラー", error=str(e), error_type=type(e).__name__)
@@ -259,17 +277,23 @@ class VectorStoreHandler:
             self.async_client = None
     
     def update_api_key(self, api_key: str):
-        """APIキーを更新"""
+        """
+        APIキーを更新
+        キーが変わらず初期化済みならクライアントを作り直さない（httpxの接続プールは共有のため閉じない）
+        """
+        if api_key == self.api_key and self.async_client is not None:
+            return
         self.api_key = api_key
         self._init_clients()
     
-    async def create_vector_store(self, name: str, file_ids: List[str] = None) -> Optional[str]:
+    async def create_vector_store(self, name: str, file_ids: List[str] = None, max_wait: float = 30.0) -> Optional[str]:
         """
         ベクトルストアを作成（API ヘルパー使用）
         
         Args:
             name: ベクトルストア名
             file_ids: 含めるファイルIDのリスト（オプション）
+            max_wait: 準備完了を待つ最大秒数
         
         Returns:
             作成されたベクトルストアのID
@@ -282,50 +306,49 @@ class VectorStoreHandler:
             app_logger.info("📝 ベクトルストア作成開始", name=name)
 
             # 安全APIで作成
-            from .vector_store_api_helper import safe_create_vector_store
             vector_store_id = await safe_create_vector_store(self.async_client, name=name)
             if not vector_store_id:
                 app_logger.error("❌ ベクトルストアAPIが利用できません or 作成失敗")
                 return None
             app_logger.info("✅ ベクトルストア作成成功", id=vector_store_id, name=name)
             
-            # ステータス確認
-            max_wait = 30
-            waited = 0
-            while waited < max_wait:
+            # ステータス確認（完了・失敗・取得失敗のいずれかになるまでバックオフしながら待つ）
+            async def check_status():
                 vs = await safe_retrieve_vector_store(self.async_client, vector_store_id)
                 if not vs:
                     app_logger.warning("⚠️ ベクトルストアの取得に失敗", id=vector_store_id)
-                    break
-                    
+                    return "unknown"
                 status = getattr(vs, 'status', 'completed')  # statusがない場合はcompletedとみなす
-                if status == "completed":
-                    app_logger.info("✅ ベクトルストアの準備が完了", id=getattr(vs, 'id', vector_store_id))
-                    break
-                elif status == "failed":
-                    app_logger.error("❌ ベクトルストアの作成に失敗", id=getattr(vs, 'id', vector_store_id))
-                    return None
+                if status in ("completed", "failed"):
+                    return status
                 app_logger.debug("⏳ ベクトルストアを準備中...", status=status)
-                await asyncio.sleep(2)
-                waited += 2
+                return None
+            
+            status = await poll_until(check_status, max_total=max_wait)
+            if status == "completed":
+                app_logger.info("✅ ベクトルストアの準備が完了", id=vector_store_id)
+            elif status == "failed":
+                app_logger.error("❌ ベクトルストアの作成に失敗", id=vector_store_id)
+                return None
             
             return vector_store_id
                 
         except Exception as e:
             app_logger.error("❌ ベクトルストア作成エラー", error=str(e), error_type=type(e).__name__)
-            import traceback
             app_logger.debug("STACKTRACE", trace=traceback.format_exc())
             return None
     
-    async def upload_file(self, file_path: str, purpose: str = "assistants") -> Optional[str]:
+    async def upload_file(self, file_path: str, purpose: str = "assistants", filename: str = None, file_size: Optional[int] = None) -> Optional[str]:
         """
-        ファイルをOpenAIにアップロード
+        ファイルをOpenAIにアップロード（ファイル全体をメモリに読み込まずに送信）
         
         参照: openai responseAPI reference (File search).md - Upload the file to the File API
         
         Args:
             file_path: アップロードするファイルパス
             purpose: ファイルの用途 ("assistants")
+            filename: OpenAI側に登録するファイル名（省略時はパスのファイル名）
+            file_size: 呼び出し元で取得済みのファイルサイズ（省略時のみstatする）
         
         Returns:
             アップロードされたファイルID
@@ -334,29 +357,30 @@ class VectorStoreHandler:
             if not self.async_client:
                 raise ValueError("OpenAI client not initialized")
             
-            # ファイルサイズ確認
-            file_size = os.path.getsize(file_path)
-            print(f"📤 ファイルアップロード開始: {file_path}")
-            print(f"   ファイルサイズ: {file_size:,} bytes")
-            print(f"   用途: {purpose}")
+            # ファイルサイズ確認（呼び出し元で取得済みなら再度statしない）
+            if file_size is None:
+                file_size = os.path.getsize(file_path)
+            app_logger.info(f"📤 ファイルアップロード開始: {file_path}")
+            app_logger.debug(f"ファイルサイズ: {file_size} bytes")
+            app_logger.debug(f"用途: {purpose}")
             
-            # ファイルを開いてアップロード
+            # ファイルを開いてアップロード（ファイルオブジェクトを渡し、httpxに順次読み出させる）
+            filename = filename or os.path.basename(file_path)
             with open(file_path, 'rb') as file:
-                print(f"📝 OpenAI APIへの送信開始...")
+                app_logger.debug("📝 OpenAI APIへの送信開始...")
                 response = await self.async_client.files.create(
-                    file=file,
+                    file=(filename, file, self.get_mime_type(filename)),
                     purpose=purpose
                 )
             
-            print(f"✅ ファイルアップロード成功: {response.id}")
-            print(f"   ファイルID: {response.id}")
-            print(f"   ファイル名: {response.filename}")
+            app_logger.info(f"✅ ファイルアップロード成功: {response.id}")
+            app_logger.debug(f"ファイルID: {response.id}")
+            app_logger.debug(f"ファイル名: {response.filename}")
             return response.id
             
         except Exception as e:
-            import traceback
-            print(f"❌ ファイルアップロードエラー: {e}")
-            print(f"   スタックトレース:\n{traceback.format_exc()}")
+            app_logger.error("❌ ファイルアップロードエラー", error=str(e), error_type=type(e).__name__)
+            app_logger.debug("STACKTRACE", trace=traceback.format_exc())
             return None
     
     async def upload_file_from_bytes(self, file_bytes: bytes, filename: str, purpose: str = "assistants") -> Optional[str]:
@@ -376,19 +400,19 @@ class VectorStoreHandler:
                 raise ValueError("OpenAI client not initialized")
             
             file_size = len(file_bytes)
-            print(f"📤 ファイルアップロード開始（バイトデータ）: {filename}")
-            print(f"   ファイルサイズ: {file_size:,} bytes")
+            app_logger.info(f"📤 ファイルアップロード開始（バイトデータ）: {filename}")
+            app_logger.debug(f"ファイルサイズ: {file_size} bytes")
             
             response = await self.async_client.files.create(
                 file=(filename, file_bytes),
                 purpose=purpose
             )
             
-            print(f"✅ ファイルアップロード成功: {response.id}")
+            app_logger.info(f"✅ ファイルアップロード成功: {response.id}")
             return response.id
             
         except Exception as e:
-            print(f"❌ ファイルアップロードエラー: {e}")
+            app_logger.error(f"❌ ファイルアップロードエラー: {e}")
             return None
     
     async def add_file_to_vector_store(self, vector_store_id: str, file_id: str) -> bool:
@@ -408,15 +432,14 @@ class VectorStoreHandler:
                 return False
 
             app_logger.info("📎 ファイルをベクトルストアに追加中", file_id=file_id, vector_store_id=vector_store_id)
-            from .vector_store_api_helper import safe_attach_file_to_vector_store_and_poll
             ok = await safe_attach_file_to_vector_store_and_poll(self.async_client, vector_store_id, file_id)
+            self.invalidate_vector_store_info(vector_store_id)  # file_countsが変わるため
             if ok:
                 app_logger.info("✅ ファイル追加完了", file_id=file_id)
             else:
                 app_logger.error("❌ ファイル追加失敗", file_id=file_id)
             return ok
         except Exception as e:
-            import traceback
             app_logger.error("❌ ファイル追加エラー", error=str(e))
             app_logger.debug("STACKTRACE", trace=traceback.format_exc())
             return False
@@ -438,26 +461,36 @@ class VectorStoreHandler:
             # APIヘルパーを使用して一覧を取得
             vector_stores_data = await safe_list_vector_stores(self.async_client)
             
-            stores_list = []
-            for vs in vector_stores_data:
-                try:
-                    vs_detail = await safe_retrieve_vector_store(self.async_client, vs.id)
-                    if vs_detail:
-                        stores_list.append({
-                            "id": vs_detail.id,
-                            "name": getattr(vs_detail, 'name', 'Unnamed'),
-                            "file_counts": getattr(vs_detail, 'file_counts', {}),
-                            "created_at": getattr(vs_detail, 'created_at', 0),
-                            "status": getattr(vs_detail, 'status', 'unknown')
-                        })
-                except Exception as e:
-                    app_logger.warning("⚠️ ベクトルストア詳細取得に失敗", id=vs.id, error=str(e))
-                    continue
+            # 詳細は並行して取得（同時実行数はレート制限を考慮して制限）
+            semaphore = asyncio.Semaphore(10)
+            
+            async def retrieve(vs):
+                async with semaphore:
+                    return await safe_retrieve_vector_store(self.async_client, vs.id)
+            
+            details = await asyncio.gather(
+                *(retrieve(vs) for vs in vector_stores_data), return_exceptions=True
+            )
+            
+            for vs, vs_detail in zip(vector_stores_data, details, strict=True):
+                if isinstance(vs_detail, Exception):
+                    app_logger.warning("⚠️ ベクトルストア詳細取得に失敗", id=vs.id, error=str(vs_detail))
+            
+            stores_list = [
+                {
+                    "id": vs_detail.id,
+                    "name": getattr(vs_detail, 'name', 'Unnamed'),
+                    "file_counts": getattr(vs_detail, 'file_counts', {}),
+                    "created_at": getattr(vs_detail, 'created_at', 0),
+                    "status": getattr(vs_detail, 'status', 'unknown')
+                }
+                for vs_detail in details
+                if vs_detail and not isinstance(vs_detail, Exception)
+            ]
             
             return stores_list
             
         except Exception as e:
-            import traceback
             app_logger.error("❌ ベクトルストア一覧取得エラー", error=str(e))
             app_logger.debug("STACKTRACE", trace=traceback.format_exc())
             return []
@@ -477,7 +510,6 @@ class VectorStoreHandler:
                 app_logger.warning("⚠️ OpenAIクライアントが初期化されていません")
                 return []
 
-            from .vector_store_api_helper import safe_list_vector_store_files, safe_retrieve_file_metadata
 
             files = await safe_list_vector_store_files(self.async_client, vector_store_id)
 
@@ -497,8 +529,6 @@ class VectorStoreHandler:
 
             try:
                 # 過度な同時実行を避ける（最大5並列）
-                import asyncio
-
                 semaphore = asyncio.Semaphore(5)
 
                 async def sem_enrich(item):
@@ -530,8 +560,8 @@ class VectorStoreHandler:
                 app_logger.warning("⚠️ OpenAIクライアントが初期化されていません")
                 return False
 
-            from .vector_store_api_helper import safe_delete_vector_store
             ok = await safe_delete_vector_store(self.async_client, vector_store_id)
+            self.invalidate_vector_store_info(vector_store_id)
             if ok:
                 app_logger.info("✅ ベクトルストア削除", id=vector_store_id)
             else:
@@ -542,6 +572,31 @@ class VectorStoreHandler:
             app_logger.error("❌ ベクトルストア削除エラー", error=str(e))
             return False
     
+    async def delete_vector_stores(self, vector_store_ids: List[str]) -> List[bool]:
+        """
+        複数のベクトルストアを並行して削除
+        
+        Args:
+            vector_store_ids: 削除するベクトルストアIDのリスト
+        
+        Returns:
+            vector_store_idsと同じ順序の成功/失敗のリスト
+        """
+        if not vector_store_ids:
+            return []
+        if not self.async_client:
+            app_logger.warning("⚠️ OpenAIクライアントが初期化されていません")
+            return [False] * len(vector_store_ids)
+        
+        results = await safe_delete_vector_stores(self.async_client, vector_store_ids)
+        for vector_store_id, ok in zip(vector_store_ids, results, strict=True):
+            self.invalidate_vector_store_info(vector_store_id)
+            if ok:
+                app_logger.info("✅ ベクトルストア削除", id=vector_store_id)
+            else:
+                app_logger.error("❌ ベクトルストア削除失敗", id=vector_store_id)
+        return results
+    
     async def rename_vector_store(self, vector_store_id: str, new_name: str) -> bool:
         """ベクトルストアの名前を変更
         
@@ -566,8 +621,8 @@ class VectorStoreHandler:
                 app_logger.warning("⚠️ OpenAIクライアントが初期化されていません")
                 return False
 
-            from .vector_store_api_helper import safe_update_vector_store
             ok = await safe_update_vector_store(self.async_client, vector_store_id, name=new_name)
+            self.invalidate_vector_store_info(vector_store_id)
             if ok:
                 app_logger.info("✅ ベクトルストア名を変更", id=vector_store_id, name=new_name)
             else:
@@ -598,8 +653,8 @@ class VectorStoreHandler:
             >>> handler.is_supported_file("image.bmp")
             False
         """
-        ext = Path(filename).suffix.lower()  # 拡張子を小文字で取得（大文字小文字を区別しない）
-        return ext in self.SUPPORTED_FILE_TYPES
+        ext = self._file_extension(filename)  # 拡張子を小文字で取得（大文字小文字を区別しない）
+        return ext in self._SUPPORTED_EXT_SET
     
     def get_mime_type(self, filename: str) -> str:
         """ファイルのMIME型を取得
@@ -620,8 +675,7 @@ class VectorStoreHandler:
         Note:
             MIME型はブラウザやAPI通信でファイル種別を識別するために使用
         """
-        ext = Path(filename).suffix.lower()
-        return self.SUPPORTED_FILE_TYPES.get(ext, 'application/octet-stream')
+        return self._SUPPORTED_FILE_TYPES.get(self._file_extension(filename), 'application/octet-stream')
     
     async def process_uploaded_file(self, element) -> Optional[str]:
         """ChainlitのファイルをOpenAIにアップロード処理
@@ -648,122 +702,232 @@ class VectorStoreHandler:
         """
         try:
             filename = element.name
-            file_ext = Path(filename).suffix.lower()
+            file_ext = self._file_extension(filename)
             
             # サポートされているファイル形式かチェック
-            if file_ext not in self.SUPPORTED_FILE_TYPES:
-                print(f"⚠️ サポートされていないファイル形式: {file_ext}")
-                print(f"   サポートされる形式: {', '.join(self.SUPPORTED_FILE_TYPES.keys())}")
+            if file_ext not in self._SUPPORTED_EXT_SET:
+                app_logger.warning(f"⚠️ サポートされていないファイル形式: {file_ext}")
+                app_logger.debug(f"サポートされる形式: {', '.join(self.SUPPORTED_FILE_TYPES.keys())}")
                 return None
             
-            print(f"📤 ファイル処理開始: {filename}")
-            
-            # ファイルの内容を取得
-            file_bytes = None
+            app_logger.info(f"📤 ファイル処理開始: {filename}")
             
-            # pathがある場合（ローカルファイル）
-            if hasattr(element, 'path') and element.path:
-                print(f"   📁 ファイルパス: {element.path}")
-                async with aiofiles.open(element.path, 'rb') as f:
-                    file_bytes = await f.read()
+            max_size = self.MAX_UPLOAD_SIZE
+            max_size_mb = max_size // (1024 * 1024)
             
-            # contentがある場合（アップロードされたファイル）
-            elif hasattr(element, 'content'):
-                print(f"   📦 アップロードされたファイルを処理")
-                file_bytes = element.content
-                if isinstance(file_bytes, str):
-                    import base64
-                    file_bytes = base64.b64decode(file_bytes)
-            
-            # read メソッドがある場合
-            elif hasattr(element, 'read'):
-                print(f"   📖 ファイルを読み込み中")
-                file_bytes = await element.read()
-            
-            else:
-                print(f"❌ ファイルの内容を取得できませんでした")
-                return None
+            def check_size(file_size: int) -> bool:
+                if not file_size:
+                    app_logger.error("❌ ファイルの内容が空です")
+                    return False
+                if file_size > max_size:
+                    app_logger.error(f"❌ ファイルサイズが大きすぎます: {file_size / (1024 * 1024):.2f}MB (最大: {max_size_mb}MB)")
+                    return False
+                app_logger.debug(f"📏 ファイルサイズ: {file_size} bytes ({file_size / 1024:.2f}KB)")
+                return True
             
-            if not file_bytes:
-                print(f"❌ ファイルの内容が空です")
+            # Chainlitが申告するサイズで、読み込み・デコード前に上限超過を弾く
+            declared_size = getattr(element, 'size', None)
+            if declared_size and declared_size > max_size:
+                app_logger.error(f"❌ ファイルサイズが大きすぎます: {declared_size / (1024 * 1024):.2f}MB (最大: {max_size_mb}MB)")
                 return None
             
-            # ファイルサイズチェック（最大512MB）
-            max_size = 512 * 1024 * 1024  # 512MB
-            file_size = len(file_bytes)
-            
-            if file_size > max_size:
-                print(f"❌ ファイルサイズが大きすぎます: {file_size / (1024 * 1024):.2f}MB (最大: 512MB)")
-                return None
+            # pathがある場合（ローカルファイル）: メモリに読み込まずファイルのままアップロード
+            # ファイル要素の属性は1回だけ取得して分岐する
+            path = getattr(element, 'path', None)
+            content = getattr(element, 'content', None)
+            reader = getattr(element, 'read', None)
             
-            print(f"   📏 ファイルサイズ: {file_size:,} bytes ({file_size / 1024:.2f}KB)")
+            if path:
+                app_logger.debug(f"📁 ファイルパス: {path}")
+                file_size = os.path.getsize(path)
+                if not check_size(file_size):
+                    return None
+                file_id = await self.upload_file(
+                    path,
+                    purpose="assistants",
+                    filename=filename,
+                    file_size=file_size
+                )
             
-            # OpenAIにアップロード
-            file_id = await self.upload_file_from_bytes(
-                file_bytes=file_bytes,
-                filename=filename,
-                purpose="assistants"
-            )
+            else:
+                # contentがある場合（アップロードされたファイル）
+                if content is not None:
+                    app_logger.debug("📦 アップロードされたファイルを処理")
+                    file_bytes = content
+                    if isinstance(file_bytes, str):
+                        # デコード後のサイズは元の3/4以下なので、上限超過ならデコードしない
+                        if len(file_bytes) * 3 // 4 > max_size + 2:
+                            app_logger.error(f"❌ ファイルサイズが大きすぎます（デコード前）: {filename}")
+                            return None
+                        file_bytes = base64.b64decode(file_bytes)
+                
+                # read メソッドがある場合
+                elif callable(reader):
+                    app_logger.debug("📖 ファイルを読み込み中")
+                    file_bytes = await reader()
+                
+                else:
+                    app_logger.error("❌ ファイルの内容を取得できませんでした")
+                    return None
+                
+                if not check_size(len(file_bytes) if file_bytes else 0):
+                    return None
+                
+                # OpenAIにアップロード
+                file_id = await self.upload_file_from_bytes(
+                    file_bytes=file_bytes,
+                    filename=filename,
+                    purpose="assistants"
+                )
             
             if file_id:
-                print(f"✅ ファイル処理完了: {filename} -> {file_id}")
+                app_logger.info(f"✅ ファイル処理完了: {filename} -> {file_id}")
                 return file_id
             else:
-                print(f"❌ ファイルアップロード失敗: {filename}")
+                app_logger.error(f"❌ ファイルアップロード失敗: {filename}")
                 return None
                 
         except Exception as e:
-            import traceback
-            print(f"❌ ファイル処理エラー: {e}")
-            print(f"   スタックトレース:\n{traceback.format_exc()}")
+            app_logger.error("❌ ファイル処理エラー", error=str(e), error_type=type(e).__name__)
+            app_logger.debug("STACKTRACE", trace=traceback.format_exc())
             return None
     
-    async def process_uploaded_files(self, files: list) -> tuple[list[str], list[str]]:
+    async def process_uploaded_files(self, files: list, max_concurrency: int = 8) -> tuple[list[str], list[str]]:
         """
         複数のファイルを処理
         
         Args:
             files: ファイルのリスト
+            max_concurrency: 同時にアップロードするファイル数の上限
         
         Returns:
             (成功したファイルIDのリスト, 失敗したファイル名のリスト)
         """
+        # アップロードはネットワーク待ちが主なので並行実行（同時数はセマフォで制限）
+        # セマフォは実行中のイベントループに紐づくようここで作成する
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def _one(file):
+            async with semaphore:
+                return await self.process_uploaded_file(file)
+        
+        results = await asyncio.gather(*(_one(file) for file in files), return_exceptions=True)
+        
+        successful_ids = []
+        failed_files = []
+        for file, result in zip(files, results, strict=True):
+            if isinstance(result, BaseException):
+                if isinstance(result, asyncio.CancelledError):
+                    raise result
+                app_logger.error(f"❌ ファイル処理失敗: {file.name} - {result}")
+                failed_files.append(file.name)
+            elif result:
+                successful_ids.append(result)
+            else:
+                failed_files.append(file.name)
+        
+        return successful_ids, failed_files
+    
+    async def upload_and_add_pipeline(
+        self,
+        vector_store_id: str,
+        files: list,
+        upload_concurrency: int = 6,
+        add_concurrency: int = 6
+    ) -> tuple[list[str], list[str]]:
+        """
+        ファイルのアップロードとベクトルストアへの追加をパイプラインで並行実行
+        アップロードが終わったファイルから順にキュー経由で追加を始めるため、
+        あるファイルのアップロード中に別のファイルの追加が進む
+        追加待ちのファイルはまとめて1つのfile_batchにし、状態確認のポーリングもバッチ単位で行う
+        
+        Args:
+            vector_store_id: 追加先のベクトルストアID
+            files: Chainlitのファイル要素のリスト
+            upload_concurrency: 同時にアップロードするファイル数の上限
+            add_concurrency: 同時に実行するベクトルストアへの追加（バッチ）数の上限
+        
+        Returns:
+            (追加まで成功したファイルIDのリスト, 失敗したファイル名のリスト)
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(upload_concurrency)
         successful_ids = []
         failed_files = []
         
-        for file in files:
+        async def _upload(file):
             try:
-                file_id = await self.process_uploaded_file(file)
-                if file_id:
-                    successful_ids.append(file_id)
-                else:
-                    failed_files.append(file.name)
+                async with semaphore:
+                    file_id = await self.process_uploaded_file(file)
             except Exception as e:
-                print(f"❌ ファイル処理失敗: {file.name} - {e}")
+                app_logger.error(f"❌ ファイル処理失敗: {file.name} - {e}")
+                file_id = None
+            if file_id:
+                await queue.put((file.name, file_id))
+            else:
                 failed_files.append(file.name)
         
+        async def _producer():
+            await asyncio.gather(*(_upload(file) for file in files))
+            # 全アップロード完了後、追加側の各ワーカーに終了を通知
+            for _ in range(add_concurrency):
+                await queue.put(None)
+        
+        async def _consumer():
+            finished = False
+            while not finished:
+                items = [await queue.get()]
+                # 追加待ちの間に溜まったファイルは1つのバッチにまとめる
+                # （ファイルごとにバッチを作って個別にポーリングしない）
+                while not queue.empty():
+                    items.append(queue.get_nowait())
+                sentinels = items.count(None)
+                if sentinels:
+                    finished = True
+                    items = [item for item in items if item is not None]
+                    # 余分に受け取った終了通知は他のワーカーに戻す
+                    for _ in range(sentinels - 1):
+                        queue.put_nowait(None)
+                if not items:
+                    continue
+                
+                file_ids = [file_id for _, file_id in items]
+                if len(file_ids) == 1:
+                    ok = await self.add_file_to_vector_store(vector_store_id, file_ids[0])
+                else:
+                    ok = await self.add_files_to_vector_store(vector_store_id, file_ids)
+                if ok:
+                    successful_ids.extend(file_ids)
+                else:
+                    failed_files.extend(name for name, _ in items)
+        
+        await asyncio.gather(_producer(), *(_consumer() for _ in range(add_concurrency)))
         return successful_ids, failed_files
     
-    async def add_files_to_vector_store(self, vector_store_id: str, file_ids: list[str]) -> bool:
+    async def add_files_to_vector_store(self, vector_store_id: str, file_ids: list[str], max_concurrency: int = 16) -> bool:
         """
         複数のファイルをベクトルストアに追加
+        file_batchesが使えれば1回のバッチ登録で、使えなければ並行して1件ずつ追加する
         
         Args:
             vector_store_id: ベクトルストアID
             file_ids: ファイルIDのリスト
+            max_concurrency: 1件ずつ追加する場合の同時実行数の上限
         
         Returns:
-            成功/失敗
+            全ファイルの追加に成功したか
         """
-        try:
-            for file_id in file_ids:
-                success = await self.add_file_to_vector_store(vector_store_id, file_id)
-                if not success:
-                    print(f"⚠️ ファイル {file_id} のベクトルストアへの追加に失敗")
+        if not file_ids:
             return True
-        except Exception as e:
-            print(f"❌ ファイルのベクトルストアへの追加エラー: {e}")
+        if not self.async_client:
+            app_logger.warning("⚠️ OpenAIクライアントが初期化されていません")
             return False
+        
+        ok = await safe_add_files_to_vector_store(
+            self.async_client, vector_store_id, file_ids, max_concurrency=max_concurrency
+        )
+        self.invalidate_vector_store_info(vector_store_id)  # file_countsが変わるため
+        return ok
     
     async def create_personal_vector_store(self, user_id: str) -> Optional[str]:
         """
@@ -781,12 +945,12 @@ class VectorStoreHandler:
             
             if vs_id:
                 self.personal_vs_id = vs_id
-                print(f"✅ 個人用ベクトルストア作成: {vs_id}")
+                app_logger.info(f"✅ 個人用ベクトルストア作成: {vs_id}")
             
             return vs_id
             
         except Exception as e:
-            print(f"❌ 個人用ベクトルストア作成エラー: {e}")
+            app_logger.error(f"❌ 個人用ベクトルストア作成エラー: {e}")
             return None
     
     async def create_session_vector_store(self, session_id: str) -> Optional[str]:
@@ -805,12 +969,12 @@ class VectorStoreHandler:
             
             if vs_id:
                 self.session_vs_id = vs_id
-                print(f"✅ セッション用ベクトルストア作成: {vs_id}")
+                app_logger.info(f"✅ セッション用ベクトルストア作成: {vs_id}")
             
             return vs_id
             
         except Exception as e:
-            print(f"❌ セッション用ベクトルストア作成エラー: {e}")
+            app_logger.error(f"❌ セッション用ベクトルストア作成エラー: {e}")
             return None
     
     def get_active_vector_stores(self) -> Dict[str, str]:
@@ -910,7 +1074,11 @@ class VectorStoreHandler:
                     app_logger.debug("空リストのため処理スキップ")
                     return None
 
-            from .vector_store_api_helper import safe_retrieve_vector_store
+            # 直近に取得した情報があれば再利用（UIの再描画ごとのAPI呼び出しを省く）
+            cached = self._vs_info_cache.get(vector_store_id)
+            if cached and time.monotonic() - cached[0] < self.vs_info_cache_ttl:
+                return dict(cached[1])
+
             vector_store = await safe_retrieve_vector_store(self.async_client, vector_store_id)
             if not vector_store:
                 return None
@@ -926,14 +1094,26 @@ class VectorStoreHandler:
                 vs_dict["status"] = getattr(vector_store, "status", "completed")
             else:
                 vs_dict["status"] = "completed"
-            return vs_dict
+            self._vs_info_cache[vector_store_id] = (time.monotonic(), vs_dict)
+            return dict(vs_dict)
 
         except Exception as e:
-            import traceback
             app_logger.error("❌ ベクトルストア情報取得エラー", id=str(vector_store_id), error_type=type(e).__name__, error=str(e))
             app_logger.debug("STACKTRACE", trace=traceback.format_exc())
             return None
     
+    def invalidate_vector_store_info(self, vector_store_id: str = None):
+        """
+        キャッシュしたベクトルストア情報を破棄（名前変更・削除・ファイル追加時に呼ぶ）
+        
+        Args:
+            vector_store_id: 対象のベクトルストアID（省略時は全て破棄）
+        """
+        if vector_store_id is None:
+            self._vs_info_cache.clear()
+        else:
+            self._vs_info_cache.pop(vector_store_id, None)
+    
     async def list_vector_store_files(self, vector_store_id: str) -> List[Dict]:
         """
         ベクトルストア内のファイル一覧を取得（エイリアス）
@@ -966,12 +1146,11 @@ class VectorStoreHandler:
         if not files:
             return "ファイルがありません"
         
-        formatted = ""
-        for i, file_info in enumerate(files, 1):
-            formatted += f"{i}. 📄 ID: `{file_info['id']}`\n"
-            formatted += f"   ステータス: {file_info.get('status', 'unknown')}\n\n"
-        
-        return formatted
+        return "".join(
+            f"{i}. 📄 ID: `{file_info['id']}`\n"
+            f"   ステータス: {file_info.get('status', 'unknown')}\n\n"
+            for i, file_info in enumerate(files, 1)
+        )
     
     async def upload_file_to_vector_store(self, vector_store_id: str, file_path: str = None, file_bytes: bytes = None, filename: str = None) -> Optional[str]:
         """
@@ -988,17 +1167,17 @@ class VectorStoreHandler:
         """
         try:
             if not self.async_client:
-                print("⚠️ OpenAIクライアントが初期化されていません")
+                app_logger.warning("⚠️ OpenAIクライアントが初期化されていません")
                 return None
             
             # ベクトルストアの存在確認
             try:
                 vs = await safe_retrieve_vector_store(self.async_client, vector_store_id)
                 if not vs:
-                    print(f"❌ ベクトルストア {vector_store_id} が見つかりません")
+                    app_logger.error(f"❌ ベクトルストア {vector_store_id} が見つかりません")
                     return None
             except Exception as e:
-                print(f"❌ ベクトルストア確認エラー: {e}")
+                app_logger.error(f"❌ ベクトルストア確認エラー: {e}")
                 return None
             
             # ファイルをアップロード
@@ -1008,7 +1187,7 @@ class VectorStoreHandler:
             elif file_bytes and filename:
                 file_id = await self.upload_file_from_bytes(file_bytes, filename, purpose="assistants")
             else:
-                print("❌ ファイルパスまたはファイルデータが必要です")
+                app_logger.error("❌ ファイルパスまたはファイルデータが必要です")
                 return None
             
             if not file_id:
@@ -1017,24 +1196,25 @@ class VectorStoreHandler:
             # ベクトルストアに直接追加
             success = await self.add_file_to_vector_store(vector_store_id, file_id)
             if success:
-                print(f"✅ ファイルをベクトルストアに統合アップロード: {file_id} -> {vector_store_id}")
+                app_logger.info(f"✅ ファイルをベクトルストアに統合アップロード: {file_id} -> {vector_store_id}")
                 return file_id
             else:
                 # 失敗した場合はファイルを削除（クリーンアップ）
                 try:
                     await self.async_client.files.delete(file_id)
-                    print(f"🗑️ 失敗したファイルをクリーンアップ: {file_id}")
+                    app_logger.info(f"🗑️ 失敗したファイルをクリーンアップ: {file_id}")
                 except:
                     pass
                 return None
                 
         except Exception as e:
-            print(f"❌ 統合アップロードエラー: {e}")
+            app_logger.error(f"❌ 統合アップロードエラー: {e}")
             return None
     
-    async def process_uploaded_file(self, element, vector_store_id: str = None) -> Optional[str]:
+    async def process_uploaded_file_to_vector_store(self, element, vector_store_id: str = None) -> Optional[str]:
         """
         Chainlitのファイルエレメントを処理してベクトルストアにアップロード
+        （process_uploaded_fileと同名だと上書きしてしまうため別名で定義）
         
         Args:
             element: Chainlitのファイルエレメント
@@ -1045,19 +1225,20 @@ class VectorStoreHandler:
         """
         try:
             if not vector_store_id:
-                print("❌ ベクトルストアIDが指定されていません")
+                app_logger.error("❌ ベクトルストアIDが指定されていません")
                 return None
             
             # ファイル名とパスを取得
-            filename = element.name if hasattr(element, 'name') else 'unknown'
-            file_path = element.path if hasattr(element, 'path') else None
+            filename = getattr(element, 'name', None) or 'unknown'
+            file_path = getattr(element, 'path', None)
+            content = getattr(element, 'content', None)
             
             # サポートされているファイルか確認
             if not self.is_supported_file(filename):
-                print(f"⚠️ サポートされていないファイル形式: {filename}")
+                app_logger.warning(f"⚠️ サポートされていないファイル形式: {filename}")
                 return None
             
-            print(f"📤 ファイル処理開始: {filename}")
+            app_logger.info(f"📤 ファイル処理開始: {filename}")
             
             # ファイルを読み込み
             if file_path and os.path.exists(file_path):
@@ -1066,30 +1247,43 @@ class VectorStoreHandler:
                     vector_store_id=vector_store_id,
                     file_path=file_path
                 )
-            elif hasattr(element, 'content'):
+            elif content is not None:
                 # バイトデータからアップロード
                 return await self.upload_file_to_vector_store(
                     vector_store_id=vector_store_id,
-                    file_bytes=element.content,
+                    file_bytes=content,
                     filename=filename
                 )
             else:
-                print(f"❌ ファイルの読み込みに失敗: {filename}")
+                app_logger.error(f"❌ ファイルの読み込みに失敗: {filename}")
                 return None
                 
         except Exception as e:
-            print(f"❌ ファイル処理エラー: {e}")
+            app_logger.error(f"❌ ファイル処理エラー: {e}")
             return None
     
     async def cleanup_session_vector_store(self):
-        """セッション用ベクトルストアをクリーンアップ（3層目）"""
+        """
+        セッション用ベクトルストアをクリーンアップ（3層目）
+        削除の完了は待たず、バックグラウンドタスクとして実行する
+        """
         if self.session_vs_id:
-            try:
-                await self.delete_vector_store(self.session_vs_id)
-                self.session_vs_id = None
-                print("✅ セッション用ベクトルストアをクリーンアップしました")
-            except Exception as e:
-                print(f"⚠️ セッション用ベクトルストアのクリーンアップに失敗: {e}")
+            vs_id = self.session_vs_id
+            self.session_vs_id = None
+            task = asyncio.create_task(self.delete_vector_store(vs_id))
+            # 実行中のタスクがGCされないよう参照を保持する
+            self._background_tasks.add(task)
+            task.add_done_callback(self._on_session_cleanup_done)
+    
+    def _on_session_cleanup_done(self, task: asyncio.Task):
+        """セッション用ベクトルストア削除タスクの完了時処理"""
+        self._background_tasks.discard(task)
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            app_logger.warning(f"⚠️ セッション用ベクトルストアのクリーンアップに失敗: {task.exception()}")
+        elif task.result():
+            app_logger.info("✅ セッション用ベクトルストアをクリーンアップしました")
     
     def set_layer_vector_store(self, layer: str, vs_id: str):
         """
@@ -1106,7 +1300,7 @@ class VectorStoreHandler:
         elif layer == "session":
             self.session_vs_id = vs_id
         else:
-            print(f"⚠️ 不明な階層: {layer}")
+            app_logger.warning(f"⚠️ 不明な階層: {layer}")
     
     def get_layer_vector_store(self, layer: str) -> Optional[str]:
         """
@@ -1139,7 +1333,7 @@ class VectorStoreHandler:
         # 個人VSをセッションから取得
         if "personal_vs_id" in session_data and session_data["personal_vs_id"]:
             self.personal_vs_id = session_data["personal_vs_id"]
-            print(f"✅ 個人ベクトルストアを設定: {self.personal_vs_id}")
+            app_logger.info(f"✅ 個人ベクトルストアを設定: {self.personal_vs_id}")
         
         # セッションVSを取得（複数のキーを確認）
         session_vs_id = (
@@ -1149,7 +1343,7 @@ class VectorStoreHandler:
         )
         if session_vs_id:
             self.session_vs_id = session_vs_id
-            print(f"✅ セッションベクトルストアを設定: {self.session_vs_id}")
+            app_logger.info(f"✅ セッションベクトルストアを設定: {self.session_vs_id}")
     
     async def get_or_create_layer_store(self, layer: str, identifier: str = None) -> Optional[str]:
         """
@@ -1179,7 +1373,7 @@ class VectorStoreHandler:
                     self.personal_vs_id = vs_id  # 互換性のため
                 return vs_id
             else:
-                print("⚠️ 個人VSの作成にはユーザーIDが必要です")
+                app_logger.warning("⚠️ 個人VSの作成にはユーザーIDが必要です")
                 return None
         
         elif layer == "session":
@@ -1196,7 +1390,7 @@ class VectorStoreHandler:
                     self.session_vs_id = vs_id  # 互換性のため
                 return vs_id
             else:
-                print("⚠️ セッションVSの作成にはセッションIDが必要です")
+                app_logger.warning("⚠️ セッションVSの作成にはセッションIDが必要です")
                 return None
         
         return None
@@ -1229,7 +1423,7 @@ class VectorStoreHandler:
             # APIヘルパーを使用してベクトルストアを作成
             vs_api = get_vector_store_api(self.async_client)
             if not vs_api:
-                print("❌ ベクトルストアAPIが利用できません")
+                app_logger.error("❌ ベクトルストアAPIが利用できません")
                 return None
             
             vector_store = await vs_api.create(
@@ -1240,11 +1434,11 @@ class VectorStoreHandler:
             # 所有者情報をキャッシュ
             self._ownership_cache[vector_store.id] = user_id
             
-            print(f"✅ 個人用ベクトルストア作成（所有者付き）: {vector_store.id}")
+            app_logger.info(f"✅ 個人用ベクトルストア作成（所有者付き）: {vector_store.id}")
             return vector_store.id
             
         except Exception as e:
-            print(f"❌ 個人用ベクトルストア作成エラー: {e}")
+            app_logger.error(f"❌ 個人用ベクトルストア作成エラー: {e}")
             return None
     
     async def create_session_vector_store_with_auto_delete(self, thread_id: str) -> Optional[str]:
@@ -1272,7 +1466,7 @@ class VectorStoreHandler:
             # APIヘルパーを使用してベクトルストアを作成
             vs_api = get_vector_store_api(self.async_client)
             if not vs_api:
-                print("❌ ベクトルストアAPIが利用できません")
+                app_logger.error("❌ ベクトルストアAPIが利用できません")
                 return None
             
             vector_store = await vs_api.create(
@@ -1288,11 +1482,11 @@ class VectorStoreHandler:
                 "auto_delete_at": datetime.now() + timedelta(hours=self.auto_delete_hours)
             }
             
-            print(f"✅ セッション用ベクトルストア作成（自動削除付き）: {vector_store.id}")
+            app_logger.info(f"✅ セッション用ベクトルストア作成（自動削除付き）: {vector_store.id}")
             return vector_store.id
             
         except Exception as e:
-            print(f"❌ セッション用ベクトルストア作成エラー: {e}")
+            app_logger.error(f"❌ セッション用ベクトルストア作成エラー: {e}")
             return None
     
     async def check_ownership(self, vs_id: str, user_id: str) -> bool:
@@ -1327,7 +1521,7 @@ class VectorStoreHandler:
             return owner_id == user_id
             
         except Exception as e:
-            print(f"❌ 所有権確認エラー: {e}")
+            app_logger.error(f"❌ 所有権確認エラー: {e}")
             return False
     
     async def cleanup_expired_session_stores(self):
@@ -1343,20 +1537,20 @@ class VectorStoreHandler:
                 if cache_data.get("auto_delete_at") and cache_data["auto_delete_at"] < current_time:
                     expired_stores.append((cache_key, cache_data["vs_id"]))
             
-            # 削除処理
-            for cache_key, vs_id in expired_stores:
-                try:
-                    await self.delete_vector_store(vs_id)
+            # 削除処理（並行実行）
+            results = await self.delete_vector_stores([vs_id for _, vs_id in expired_stores])
+            for (cache_key, vs_id), ok in zip(expired_stores, results, strict=True):
+                if ok:
                     del self._session_vs_cache[cache_key]
-                    print(f"🗑️ 期限切れセッションVSを自動削除: {vs_id}")
-                except Exception as e:
-                    print(f"⚠️ セッションVS削除失敗: {vs_id} - {e}")
+                    app_logger.info(f"🗑️ 期限切れセッションVSを自動削除: {vs_id}")
+                else:
+                    app_logger.warning(f"⚠️ セッションVS削除失敗: {vs_id}")
             
             if expired_stores:
-                print(f"✅ {len(expired_stores)}個の期限切れセッションVSを削除しました")
+                app_logger.info(f"✅ {len(expired_stores)}個の期限切れセッションVSを削除しました")
                 
         except Exception as e:
-            print(f"❌ 自動削除処理エラー: {e}")
+            app_logger.error(f"❌ 自動削除処理エラー: {e}")
     
     def get_enabled_vector_store_ids(self, enabled_layers: Dict[str, bool] = None) -> List[str]:
         """
@@ -1420,7 +1614,7 @@ class VectorStoreHandler:
             return None
             
         except Exception as e:
-            print(f"❌ DBからのベクトルストアID取得エラー: {e}")
+            app_logger.error(f"❌ DBからのベクトルストアID取得エラー: {e}")
             return None
     
     async def set_user_vector_store_in_db(self, user_id: str, vs_id: str) -> bool:
@@ -1450,7 +1644,7 @@ class VectorStoreHandler:
             return False
             
         except Exception as e:
-            print(f"❌ DBへのベクトルストアID保存エラー: {e}")
+            app_logger.error(f"❌ DBへのベクトルストアID保存エラー: {e}")
             return False
     
     def get_all_active_vector_store_ids(self) -> List[str]:
@@ -1487,7 +1681,7 @@ class VectorStoreHandler:
         """
         try:
             if not hasattr(element, 'path') or not hasattr(element, 'name'):
-                print(f"❌ 無効なファイル要素: {element}")
+                app_logger.error(f"❌ 無効なファイル要素: {element}")
                 return None
             
             # 一時保存ディレクトリを作成
@@ -1495,7 +1689,6 @@ class VectorStoreHandler:
             upload_dir.mkdir(exist_ok=True)
             
             # ファイル名の安全化
-            import re
             safe_name = re.sub(r'[^a-zA-Z0-9._-]', '_', element.name)
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             final_name = f"{timestamp}_{safe_name}"
@@ -1504,17 +1697,17 @@ class VectorStoreHandler:
             final_path = upload_dir / final_name
             shutil.copy2(element.path, final_path)
             
-            print(f"✅ ファイル保存完了: {final_path}")
+            app_logger.info(f"✅ ファイル保存完了: {final_path}")
             
             # アクティブなベクトルストアに追加
-            print(f"🔧 [DEBUG] _add_file_to_active_vector_stores呼び出し開始")
+            app_logger.debug("_add_file_to_active_vector_stores呼び出し開始")
             await self._add_file_to_active_vector_stores(str(final_path), element.name)
-            print(f"🔧 [DEBUG] _add_file_to_active_vector_stores呼び出し完了")
+            app_logger.debug("_add_file_to_active_vector_stores呼び出し完了")
             
             return str(final_path)
             
         except Exception as e:
-            print(f"❌ ファイル保存エラー: {e}")
+            app_logger.error(f"❌ ファイル保存エラー: {e}")
             return None
     
     async def _add_file_to_active_vector_stores(self, file_path: str, original_name: str):
@@ -1526,14 +1719,14 @@ class VectorStoreHandler:
             original_name: 元のファイル名
         """
         try:
-            print(f"🔧 [DEBUG] _add_file_to_active_vector_stores開始: {file_path}")
+            app_logger.debug(f"_add_file_to_active_vector_stores開始: {file_path}")
             # 現在アクティブなベクトルストアIDを取得
             active_ids = self.get_active_vector_store_ids()
-            print(f"🔧 [DEBUG] アクティブベクトルストアID数: {len(active_ids)}")
+            app_logger.debug(f"アクティブベクトルストアID数: {len(active_ids)}")
             
             if not active_ids:
-                print("⚠️ アクティブなベクトルストアが設定されていません")
-                print("🔧 セッション用ベクトルストアを自動作成します...")
+                app_logger.warning("⚠️ アクティブなベクトルストアが設定されていません")
+                app_logger.debug("🔧 セッション用ベクトルストアを自動作成します...")
                 
                 # チャット用ベクトルストアを自動作成（自動削除機能付き）
                 try:
@@ -1544,10 +1737,10 @@ class VectorStoreHandler:
                 except:
                     thread_id = "default_session"  # フォールバック
                 
-                print(f"🔧 ファイルアップロード用チャットベクトルストア作成: {thread_id[:8]}...")
+                app_logger.debug(f"🔧 ファイルアップロード用チャットベクトルストア作成: {thread_id[:8]}...")
                 vs_id = await self.create_session_vector_store_with_auto_delete(thread_id)
                 if vs_id:
-                    print(f"✅ チャット用ベクトルストア作成（ファイルアップロード時）: {vs_id}")
+                    app_logger.info(f"✅ チャット用ベクトルストア作成（ファイルアップロード時）: {vs_id}")
                     active_ids = [vs_id]
                     
                     # ベクトルストアIDをチャット（thread）に保存
@@ -1556,7 +1749,6 @@ class VectorStoreHandler:
                     # データベースのスレッドテーブルにベクトルストアIDを保存（チャット削除時の自動削除用）
                     try:
                         # 現在のChainlitコンテキストから実際のthread_idを取得
-                        import chainlit as cl
                         actual_thread_id = None
                         try:
                             if hasattr(cl.context, 'session') and hasattr(cl.context.session, 'thread_id'):
@@ -1568,7 +1760,7 @@ class VectorStoreHandler:
                         if not actual_thread_id:
                             actual_thread_id = thread_id
                             
-                        print(f"🔧 [DEBUG] 保存対象thread_id: セッション={thread_id[:8]}, 実際={actual_thread_id[:8] if actual_thread_id else 'None'}")
+                        app_logger.debug(f"保存対象thread_id: セッション={thread_id[:8]}, 実際={actual_thread_id[:8] if actual_thread_id else 'None'}")
                         
                         # 直接SQLiteデータベースに更新（循環インポート回避）
                         import aiosqlite
@@ -1584,13 +1776,13 @@ class VectorStoreHandler:
                             # 更新されたレコード数を確認
                             cursor = await db.execute("SELECT changes()")
                             changes = await cursor.fetchone()
-                            print(f"🔧 [DEBUG] データベース更新件数: {changes[0] if changes else 0}件")
+                            app_logger.debug(f"データベース更新件数: {changes[0] if changes else 0}件")
                             
-                        print(f"✅ スレッドベクトルストアID保存: actual_thread={actual_thread_id[:8]}... vs_id={vs_id}")
+                        app_logger.info(f"✅ スレッドベクトルストアID保存: actual_thread={actual_thread_id[:8]}... vs_id={vs_id}")
                     except Exception as db_error:
-                        print(f"⚠️ スレッドベクトルストアID保存失敗: {db_error}")
+                        app_logger.warning(f"⚠️ スレッドベクトルストアID保存失敗: {db_error}")
                 else:
-                    print("❌ ベクトルストア作成に失敗しました")
+                    app_logger.error("❌ ベクトルストア作成に失敗しました")
                     return
             
             # ファイルをOpenAI Files APIにアップロード
@@ -1600,23 +1792,30 @@ class VectorStoreHandler:
                     purpose="assistants"
                 )
             
-            print(f"✅ OpenAI Filesにアップロード: {file_obj.id}")
+            app_logger.info(f"✅ OpenAI Filesにアップロード: {file_obj.id}")
             
-            # 各アクティブベクトルストアに追加
+            # 各アクティブベクトルストアに追加（ファイルAPIはループの外で1回だけ取得）
+            vs_files_api = get_vector_store_files_api(self.async_client) if self._has_responses_vs else None
             for vs_id in active_ids:
                 try:
-                    await self.async_client.vector_stores.files.create(
-                        vector_store_id=vs_id,
-                        file_id=file_obj.id
-                    )
-                    print(f"✅ ベクトルストア {vs_id[:8]}... にファイル追加: {original_name}")
+                    if vs_files_api is not None:
+                        await vs_files_api.create(
+                            vector_store_id=vs_id,
+                            file_id=file_obj.id
+                        )
+                        self.invalidate_vector_store_info(vs_id)
+                    elif not await self.add_file_to_vector_store(vs_id, file_obj.id):
+                        # Beta APIのみのSDKではAPIヘルパー経由で追加
+                        app_logger.error(f"❌ ベクトルストア {vs_id[:8]}... へのファイル追加に失敗: {original_name}")
+                        continue
+                    app_logger.info(f"✅ ベクトルストア {vs_id[:8]}... にファイル追加: {original_name}")
                     
                 except Exception as vs_error:
-                    print(f"❌ ベクトルストア {vs_id[:8]}... へのファイル追加エラー: {vs_error}")
+                    app_logger.error(f"❌ ベクトルストア {vs_id[:8]}... へのファイル追加エラー: {vs_error}")
                     continue
             
         except Exception as e:
-            print(f"❌ ベクトルストアへのファイル追加エラー: {e}")
+            app_logger.error(f"❌ ベクトルストアへのファイル追加エラー: {e}")
     
     def get_active_vector_store_ids(self) -> List[str]:
         """
@@ -1663,7 +1862,7 @@ class VectorStoreHandler:
             return vector_store_ids
             
         except Exception as e:
-            print(f"❌ アクティブベクトルストア取得エラー: {e}")
+            app_logger.error(f"❌ アクティブベクトルストア取得エラー: {e}")
             return []
 
 